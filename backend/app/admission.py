@@ -0,0 +1,196 @@
+from collections import deque
+from contextvars import Context, ContextVar, copy_context
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+import asyncio
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.metrics import query_labels
+
+# Admission control in front of Supabase: a global and a per-user limit on
+# concurrent queries, with a bounded, prioritised wait queue. Everything runs
+# on the event loop thread, so the bookkeeping needs no locks.
+
+READ, WRITE, HEAVY = 0, 1, 2
+
+# RPCs that only read, admitted with the same priority as selects
+READ_RPCS = frozenset({"cards_in_viewport", "card_version_chains"})
+
+_admission_user: ContextVar[Optional[str]] = ContextVar("admission_user", default=None)
+
+def bind_user(user_id: str) -> None:
+    """Charge the current request's queries to the user's concurrency limit"""
+    _admission_user.set(user_id)
+
+def unbound_context() -> Context:
+    """Copy of the current context with no user bound, for background tasks
+
+    Tasks copy the context they are created in, so work done on behalf of
+    every user (write buffer flushes) would otherwise be charged to whichever
+    user happened to start it.
+    """
+    context = copy_context()
+    context.run(_admission_user.set, None)
+    return context
+
+class AdmissionRejected(HTTPException):
+    """Raised when a query is shed instead of being sent to Supabase"""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+_Waiter = Tuple["asyncio.Future[None]", Optional[str], int]
+
+class AdmissionController:
+    """Concurrency limiter with a bounded queue, a deadline and priorities
+
+    Waiting reads are granted before writes, and writes before heavy
+    operations, which additionally have their own, smaller limit.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        per_user_concurrency: int = 8,
+        max_heavy: int = 4,
+        max_queue: int = 256,
+        queue_timeout: float = 5,
+        retry_after: int = 1,
+        heavy_operations: Iterable[str] = ()
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_user_concurrency = per_user_concurrency
+        self.max_heavy = max_heavy
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.heavy_operations = frozenset(heavy_operations)
+        self.active = 0
+        self.active_heavy = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._active_by_user: Dict[str, int] = {}
+        self._waiters: List[Deque[_Waiter]] = [deque(), deque(), deque()]
+
+    def priority(self, query: Any) -> int:
+        name, operation = query_labels(query)
+        if operation == "select" or name in READ_RPCS:
+            return READ
+        if name in self.heavy_operations:
+            return HEAVY
+        return WRITE
+
+    def _can_admit(self, user_id: Optional[str], priority: int) -> bool:
+        if self.active >= self.max_concurrency:
+            return False
+        if priority == HEAVY and self.active_heavy >= self.max_heavy:
+            return False
+        return user_id is None or self._active_by_user.get(user_id, 0) < self.per_user_concurrency
+
+    def _admit(self, user_id: Optional[str], priority: int) -> None:
+        self.active += 1
+        self.admitted += 1
+        if priority == HEAVY:
+            self.active_heavy += 1
+        if user_id is not None:
+            self._active_by_user[user_id] = self._active_by_user.get(user_id, 0) + 1
+
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters)
+
+    async def acquire(self, priority: int, user_id: Optional[str] = None) -> None:
+        """Wait for a slot, or raise AdmissionRejected when the queue is full or the deadline passes"""
+        # Only wait behind queued work of the same or a higher priority
+        ahead = any(self._waiters[level] for level in range(priority + 1))
+        if not ahead and self._can_admit(user_id, priority):
+            self._admit(user_id, priority)
+            return
+
+        if self.queued() >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("Server is busy, please retry", self.retry_after)
+
+        waiter: _Waiter = (asyncio.get_running_loop().create_future(), user_id, priority)
+        self._waiters[priority].append(waiter)
+        # The waiters ahead may only be held back by their own user's limit
+        self._grant()
+        try:
+            await asyncio.wait_for(waiter[0], self.queue_timeout)
+        except BaseException as e:
+            if waiter[0].done() and not waiter[0].cancelled():
+                # Granted just as the wait ended; hand the slot back
+                self.release(priority, user_id)
+            else:
+                self._waiters[priority].remove(waiter)
+                self._grant()
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise AdmissionRejected("Timed out waiting for a database slot", self.retry_after)
+            raise
+
+    def release(self, priority: int, user_id: Optional[str] = None) -> None:
+        self.active -= 1
+        if priority == HEAVY:
+            self.active_heavy -= 1
+        if user_id is not None:
+            remaining = self._active_by_user[user_id] - 1
+            if remaining:
+                self._active_by_user[user_id] = remaining
+            else:
+                del self._active_by_user[user_id]
+        self._grant()
+
+    def _grant(self) -> None:
+        # A waiter blocked by its own user's limit does not hold up the others
+        for waiters in self._waiters:
+            for waiter in list(waiters):
+                if self.active >= self.max_concurrency:
+                    return
+                future, user_id, priority = waiter
+                # A timed out or cancelled waiter is removed by its acquire()
+                if not future.done() and self._can_admit(user_id, priority):
+                    waiters.remove(waiter)
+                    self._admit(user_id, priority)
+                    future.set_result(None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "active_heavy": self.active_heavy,
+            "queued": self.queued(),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+class _Slot:
+    def __init__(self, controller: AdmissionController, priority: int):
+        self.controller = controller
+        self.priority = priority
+        self.user_id = _admission_user.get()
+
+    async def __aenter__(self) -> None:
+        await self.controller.acquire(self.priority, self.user_id)
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.controller.release(self.priority, self.user_id)
+
+def admit(query: Any) -> _Slot:
+    """Async context manager holding an admission slot for one query"""
+    return _Slot(admission_controller, admission_controller.priority(query))
+
+admission_controller = AdmissionController(
+    max_concurrency=settings.admission_max_concurrency,
+    per_user_concurrency=settings.admission_per_user_concurrency,
+    max_heavy=settings.admission_max_heavy,
+    max_queue=settings.admission_max_queue,
+    queue_timeout=settings.admission_queue_timeout_seconds,
+    retry_after=settings.admission_retry_after_seconds,
+    heavy_operations=settings.admission_heavy_operations
+)
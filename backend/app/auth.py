@@ -1,18 +1,68 @@
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
+from jose.exceptions import JWTError, ExpiredSignatureError
 from datetime import datetime, timedelta
-from typing import Optional
-from supabase import Client
+from collections import OrderedDict
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+import asyncio
+import time
 
+if TYPE_CHECKING:
+    from supabase import Client
+
+from app.admission import bind_user
 from app.config import settings
-from app.database import get_supabase
+from app.database import get_supabase, query_executor
 from app.models import TokenPayload, UserLogin, UserRegister, Token
 
 security = HTTPBearer()
 
+class TokenCache:
+    """Bounded LRU cache of verified tokens, each entry expiring at the token's exp"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, token: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            user_id, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user_id
+
+    def set(self, token: str, user_id: str, expires_at: float) -> None:
+        if self.max_size <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[token] = (user_id, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+token_cache = TokenCache(settings.token_cache_size)
+
 class AuthService:
-    def __init__(self, supabase: Client):
+    def __init__(self, supabase: "Client"):
         self.supabase = supabase
 
     async def register_user(self, user_data: UserRegister) -> Token:
@@ -135,29 +185,69 @@ class AuthService:
                 detail=f"Token refresh failed: {str(e)}"
             )
 
-    def verify_token(self, token: str) -> Optional[str]:
+    async def verify_token(self, token: str) -> Optional[str]:
         """Verify JWT token and return user ID"""
+        user_id = token_cache.get(token)
+        if user_id:
+            return user_id
+
         try:
-            # Supabase JWT verification
-            user_response = self.supabase.auth.get_user(token)
+            payload = self._decode_token(token)
+        except ExpiredSignatureError:
+            return None
+        except JWTError:
+            # Tokens we cannot verify locally (e.g. rotated or asymmetric keys)
+            # are checked against Supabase Auth when the fallback is enabled
+            if not settings.jwt_remote_fallback:
+                return None
+            return await self._verify_token_remote(token)
+
+        if not payload.sub:
+            return None
+
+        token_cache.set(token, payload.sub, payload.exp)
+        return payload.sub
+
+    def _decode_token(self, token: str) -> TokenPayload:
+        """Decode and validate a JWT locally with the configured secret"""
+        # jose.jwt loads the cryptography backend; import it on first use
+        from jose import jwt
+        
+        claims = jwt.decode(
+            token,
+            settings.jwt_secret_key,
+            algorithms=[settings.jwt_algorithm],
+            audience=settings.jwt_audience,
+            options={"verify_aud": bool(settings.jwt_audience), "require_exp": True},
+        )
+        return TokenPayload(**claims)
+
+    async def _verify_token_remote(self, token: str) -> Optional[str]:
+        """Verify JWT token with a round trip to Supabase Auth"""
+        try:
+            # The SDK call is blocking; keep it off the event loop
+            loop = asyncio.get_running_loop()
+            user_response = await loop.run_in_executor(query_executor, self.supabase.auth.get_user, token)
             
-            if not user_response.user:
+            if not user_response or not user_response.user:
                 return None
-                
-            return user_response.user.id
+
+            from jose import jwt
+            
+            user_id = user_response.user.id
+            exp = jwt.get_unverified_claims(token).get("exp")
+            if exp:
+                token_cache.set(token, user_id, exp)
+
+            return user_id
             
         except Exception:
             return None
 
-# Dependency to get current user from token
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    supabase: Client = Depends(get_supabase)
-) -> str:
-    """Get current authenticated user ID from JWT token"""
-    
+async def _authenticate(credentials: HTTPAuthorizationCredentials, supabase: "Client") -> str:
+    """Resolve the user ID for bearer credentials or raise 401"""
     auth_service = AuthService(supabase)
-    user_id = auth_service.verify_token(credentials.credentials)
+    user_id = await auth_service.verify_token(credentials.credentials)
     
     if not user_id:
         raise HTTPException(
@@ -166,31 +256,30 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    bind_user(user_id)
     return user_id
 
+# Dependency to get current user from token
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    supabase: "Client" = Depends(get_supabase)
+) -> str:
+    """Get current authenticated user ID from JWT token"""
+    return await _authenticate(credentials, supabase)
+
 # Dependency to get current user and token
 async def get_current_user_with_token(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ) -> tuple[str, str]:
     """Get current authenticated user ID and token"""
-    
-    auth_service = AuthService(supabase)
-    user_id = auth_service.verify_token(credentials.credentials)
-    
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
+    user_id = await _authenticate(credentials, supabase)
     return user_id, credentials.credentials
 
 # Optional dependency for protected routes
 async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ) -> Optional[str]:
     """Get current user ID if authenticated, otherwise None"""
     
@@ -198,4 +287,7 @@ async def get_current_user_optional(
         return None
         
     auth_service = AuthService(supabase)
-    return auth_service.verify_token(credentials.credentials)
\ No newline at end of file
+    user_id = await auth_service.verify_token(credentials.credentials)
+    if user_id:
+        bind_user(user_id)
+    return user_id
\ No newline at end of file
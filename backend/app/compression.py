@@ -0,0 +1,205 @@
+from typing import Any, List, Optional
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.config import settings
+from app.metrics import http_response_bytes
+
+# zstd and brotli are optional; without them responses fall back to gzip
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + self._compressor.flush() if flush else out
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else out
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+def create_encoder(encoding: str) -> Any:
+    """Incremental encoder for a Content-Encoding, at the configured level"""
+    if encoding == "zstd":
+        return _ZstdEncoder(settings.compression_zstd_level)
+    if encoding == "br":
+        return _BrotliEncoder(settings.compression_brotli_quality)
+    return _GzipEncoder(settings.compression_gzip_level)
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Encode a whole body in one pass"""
+    encoded = create_encoder(encoding).finish(body)
+    http_response_bytes.inc(encoding, "identity", amount=len(body))
+    http_response_bytes.inc(encoding, "encoded", amount=len(encoded))
+    return encoded
+
+def available_encodings() -> List[str]:
+    """Supported Content-Encodings, in server preference order"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+def negotiate_encoding(accept_encoding: str, encodings: List[str]) -> Optional[str]:
+    """Pick the encoding with the highest q-value in Accept-Encoding, ties going to server preference"""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.strip()] = q
+
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def response_encoding(accept_encoding: str, size: int) -> Optional[str]:
+    """Encoding to apply to a body of `size` bytes, or None to send it as is"""
+    if not settings.compression_enabled or size < settings.compression_min_size:
+        return None
+    return negotiate_encoding(accept_encoding, available_encodings())
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses above a size threshold
+
+    Whole bodies are compressed in one pass. Streamed bodies (NDJSON) are
+    compressed incrementally and flushed per chunk so lines still arrive as
+    they are produced.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingSender(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+class _CompressingSender:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.encoder = None
+        self.passthrough = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _should_skip(self, headers: MutableHeaders) -> bool:
+        content_type = headers.get("content-type", "")
+        return (
+            "content-encoding" in headers
+            or self.start_message["status"] in (204, 304)
+            or content_type.startswith("text/event-stream")
+        )
+
+    def _set_encoded_headers(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # The encoded body differs byte-for-byte, so its validator is only weak
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+
+    async def send(self, message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if self._should_skip(headers) or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self._set_encoded_headers(headers)
+            if not more_body:
+                body = compress(body, self.encoding)
+                headers["Content-Length"] = str(len(body))
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            self.encoder = create_encoder(self.encoding)
+            del headers["Content-Length"]
+            await self._send(self.start_message)
+
+        if more_body:
+            body = self._encode(body, final=False)
+            if body:
+                await self._send({"type": "http.response.body", "body": body, "more_body": True})
+        else:
+            await self._send({"type": "http.response.body", "body": self._encode(body, final=True)})
+
+    def _encode(self, data: bytes, final: bool) -> bytes:
+        self.bytes_in += len(data)
+        out = self.encoder.finish(data) if final else self.encoder.compress(data, flush=True)
+        self.bytes_out += len(out)
+        if final:
+            http_response_bytes.inc(self.encoding, "identity", amount=self.bytes_in)
+            http_response_bytes.inc(self.encoding, "encoded", amount=self.bytes_out)
+        return out
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import os
 
 class Settings(BaseSettings):
@@ -12,11 +12,51 @@ class Settings(BaseSettings):
     jwt_secret_key: str
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    jwt_audience: Optional[str] = "authenticated"
+    jwt_remote_fallback: bool = True
+    token_cache_size: int = 1024
+    
+    # Database
+    db_max_concurrency: int = 32
+    db_pool_max_connections: int = 32
+    db_pool_max_keepalive: int = 32
+    db_pool_keepalive_expiry_seconds: float = 30
+    db_http2: bool = True
+    db_connect_timeout_seconds: float = 5
+    db_read_timeout_seconds: float = 30
+    db_pool_timeout_seconds: float = 10
+    admission_max_concurrency: int = 32
+    admission_per_user_concurrency: int = 8
+    admission_max_heavy: int = 4
+    admission_max_queue: int = 256
+    admission_queue_timeout_seconds: float = 5
+    admission_retry_after_seconds: int = 1
+    admission_heavy_operations: List[str] = ["duplicate_trip", "apply_canvas_batch", "bulk_update_cards"]
+    ownership_cache_ttl_seconds: float = 60
+    ownership_cache_size: int = 10000
+    snapshot_cache_ttl_seconds: float = 30
+    snapshot_cache_size: int = 256
+    stream_page_size: int = 500
+    sync_safety_window_seconds: float = 10
+    write_buffer_flush_interval_ms: int = 250
+    write_buffer_max_pending: int = 500
+    write_buffer_max_retry_delay_ms: int = 5000
+    ws_max_queue: int = 256
+    card_version_snapshot_interval: int = 20
+    card_version_cache_size: int = 1024
+    connection_graph_ttl_seconds: float = 300
+    connection_graph_cache_size: int = 256
     
     # API
     api_v1_str: str = "/api/v1"
     project_name: str = "WeScape Backend"
     debug: bool = True
+    metrics_enabled: bool = True
+    compression_enabled: bool = True
+    compression_min_size: int = 1024
+    compression_gzip_level: int = 4
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
     
     # CORS
     backend_cors_origins: List[str] = ["http://localhost:5173", "http://localhost:3000"]
@@ -1,16 +1,153 @@
-from supabase import create_client, Client
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Tuple
+
+from app.admission import admit
 from app.config import settings
+from app.metrics import observe_query
+
+if TYPE_CHECKING:
+    import httpx
+    from supabase import Client
+
+class SupabaseClients:
+    """The worker's Supabase clients, each on its own pooled HTTP transport
+
+    Clients are built on first use, so every uvicorn worker builds its own
+    pool after forking and importing the app stays cheap; the app lifespan
+    closes them.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Tuple["Client", "httpx.Client"]] = {}
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def _keys(self) -> Dict[str, str]:
+        return {
+            "anon": settings.supabase_anon_key,
+            "admin": settings.supabase_service_role_key
+        }
+
+    def _create(self, key: str) -> Tuple["Client", "httpx.Client"]:
+        # The SDK takes a few hundred milliseconds to import; defer it to here
+        import httpx
+        from supabase import ClientOptions, create_client
+        
+        # PostgREST sets its base URL and auth headers on the httpx client it
+        # is given, so the anon and admin clients cannot share one transport
+        http_client = httpx.Client(
+            http2=settings.db_http2,
+            limits=httpx.Limits(
+                max_connections=settings.db_pool_max_connections,
+                max_keepalive_connections=settings.db_pool_max_keepalive,
+                keepalive_expiry=settings.db_pool_keepalive_expiry_seconds
+            ),
+            timeout=httpx.Timeout(
+                settings.db_read_timeout_seconds,
+                connect=settings.db_connect_timeout_seconds,
+                pool=settings.db_pool_timeout_seconds
+            ),
+            follow_redirects=True
+        )
+        client = create_client(settings.supabase_url, key, options=ClientOptions(httpx_client=http_client))
+        return client, http_client
+
+    def get(self, name: str) -> "Client":
+        entry = self._clients.get(name)
+        if entry is None:
+            with self._lock:
+                entry = self._clients.get(name)
+                if entry is None:
+                    entry = self._create(self._keys()[name])
+                    self._clients[name] = entry
+        return entry[0]
+
+    def close(self) -> None:
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for _, http_client in clients.values():
+            http_client.close()
+
+    def _connections(self, http_client: "httpx.Client") -> List[Any]:
+        pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+        return list(getattr(pool, "connections", []))
+
+    def stats(self) -> Dict[str, int]:
+        connections = [
+            connection
+            for _, http_client in list(self._clients.values())
+            for connection in self._connections(http_client)
+        ]
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "clients": len(self._clients),
+            "max_connections": settings.db_pool_max_connections * len(self._clients),
+            "connections": len(connections),
+            "connections_in_use": len(connections) - idle,
+            "connections_idle": idle,
+            "queries_in_flight": self.in_flight,
+            # Queries waiting on a free executor thread, i.e. a saturated pool
+            "queries_waiting": max(0, self.in_flight - settings.db_max_concurrency)
+        }
+
+supabase_clients = SupabaseClients()
+
+# Bounded pool the blocking PostgREST calls are offloaded to, so concurrent
+# requests on one worker overlap their I/O instead of stalling the event loop
+query_executor = ThreadPoolExecutor(
+    max_workers=settings.db_max_concurrency,
+    thread_name_prefix="supabase-query"
+)
+
+async def execute(query: Any) -> Any:
+    """Execute a Supabase query builder off the event loop, timing the call
+
+    Raises AdmissionRejected (503) when the query is shed by admission control.
+    """
+    loop = asyncio.get_running_loop()
+    async with admit(query):
+        start = time.perf_counter()
+        supabase_clients.in_flight += 1
+        try:
+            response = await loop.run_in_executor(query_executor, query.execute)
+        except Exception:
+            observe_query(query, time.perf_counter() - start, failed=True)
+            raise
+        finally:
+            supabase_clients.in_flight -= 1
+    observe_query(query, time.perf_counter() - start, failed=False)
+    return response
 
-# Initialize Supabase client
-supabase: Client = create_client(settings.supabase_url, settings.supabase_anon_key)
+async def iter_rows(build_query: Callable[[], Any], page_size: int) -> AsyncIterator[Dict[str, Any]]:
+    """Page through a query ordered by (created_at, id) using keyset pagination
 
-# Service role client for admin operations
-supabase_admin: Client = create_client(settings.supabase_url, settings.supabase_service_role_key)
+    build_query must return a fresh, filtered select builder for each page.
+    """
+    last = None
+    while True:
+        query = build_query()
+        if last:
+            created_at, row_id = last
+            query = query.or_(
+                f'created_at.gt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.gt.{row_id})'
+            )
+        response = await execute(query.order("created_at").order("id").limit(page_size))
+        
+        for row in response.data:
+            yield row
+        
+        if len(response.data) < page_size:
+            return
+        last = (response.data[-1]["created_at"], response.data[-1]["id"])
 
-def get_supabase() -> Client:
+def get_supabase() -> "Client":
     """Dependency to get Supabase client"""
-    return supabase
+    return supabase_clients.get("anon")
 
-def get_supabase_admin() -> Client:
+def get_supabase_admin() -> "Client":
     """Dependency to get Supabase admin client"""
-    return supabase_admin
\ No newline at end of file
+    return supabase_clients.get("admin")
@@ -1,17 +1,42 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import os
 
+from app.admission import admission_controller
+from app.compression import CompressionMiddleware
 from app.config import settings
-from app.routers import auth, trips, cards, connections
+from app.database import supabase_clients
+from app.metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, registry
+from app.routers import auth, trips, cards, connections, realtime
+from app.auth import token_cache
+from app.services.ownership_cache import card_trip_cache, trip_ownership_cache
+from app.services.snapshot_cache import canvas_snapshot_cache
+from app.services.write_buffer import position_write_buffer
+from app.services.canvas_hub import canvas_hub
+from app.services.card_versions import version_head_cache
+from app.services.connection_graph import connection_graph_cache
+from app.services.single_flight import read_flights
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Supabase clients are built on first use, so the worker starts serving
+    # without waiting for the SDK import
+    position_write_buffer.start()
+    yield
+    # Flush buffered drag positions before the worker exits, then close the
+    # pooled connections they were flushed through
+    await position_write_buffer.stop()
+    supabase_clients.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.project_name,
     version="1.0.0",
     description="WeScape Backend API for trip planning and management",
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -23,11 +48,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
+
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    
+    registry.register_stats("token_cache", token_cache.stats)
+    registry.register_stats("ownership_cache", trip_ownership_cache.stats)
+    registry.register_stats("card_trip_cache", card_trip_cache.stats)
+    registry.register_stats("snapshot_cache", canvas_snapshot_cache.stats)
+    registry.register_stats("version_head_cache", version_head_cache.stats)
+    registry.register_stats("connection_graph_cache", connection_graph_cache.stats)
+    registry.register_stats("position_write_buffer", position_write_buffer.stats)
+    registry.register_stats("canvas_hub", canvas_hub.stats)
+    registry.register_stats("supabase_pool", supabase_clients.stats)
+    registry.register_stats("admission", admission_controller.stats)
+    registry.register_stats("single_flight", read_flights.stats)
+    
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # Include routers
 app.include_router(auth.router, prefix=settings.api_v1_str)
 app.include_router(trips.router, prefix=settings.api_v1_str)
 app.include_router(cards.router, prefix=settings.api_v1_str)
 app.include_router(connections.router, prefix=settings.api_v1_str)
+app.include_router(realtime.router, prefix=settings.api_v1_str)
 
 # Health check endpoint
 @app.get("/")
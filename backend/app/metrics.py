@@ -0,0 +1,197 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import time
+
+# Minimal Prometheus instrumentation. Observations are a few dict lookups on
+# the event loop thread; formatting only happens when /metrics is scraped.
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Gauge(Counter):
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + ("+Inf" if bound == float("inf") else repr(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._stats: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """Expose an existing stats() dict as {prefix}_{key} gauges"""
+        self._stats.append((prefix, stats))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats in self._stats:
+            for key, value in stats().items():
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status code",
+    ("method", "route", "status")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled"
+))
+http_response_bytes = registry.register(Counter(
+    "http_response_bytes_total",
+    "Response bytes fed to (identity) and produced by (encoded) compression",
+    ("encoding", "stage")
+))
+supabase_query_duration = registry.register(Histogram(
+    "supabase_query_duration_seconds",
+    "Supabase (PostgREST) call latency by table or RPC and operation",
+    ("table", "operation")
+))
+supabase_query_errors = registry.register(Counter(
+    "supabase_query_errors_total",
+    "Supabase calls that raised, by table or RPC and operation",
+    ("table", "operation")
+))
+supabase_queries_per_request = registry.register(Histogram(
+    "supabase_queries_per_request",
+    "Supabase calls made while handling one HTTP request",
+    ("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21)
+))
+
+# Per-request count of Supabase calls, set by MetricsMiddleware
+_request_queries: ContextVar[Optional[List[int]]] = ContextVar("request_queries", default=None)
+
+_OPERATIONS = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+def query_labels(query: Any) -> Tuple[str, str]:
+    """(table, operation) of a postgrest request builder"""
+    path = getattr(query, "path", "") or ""
+    method = getattr(query, "http_method", "")
+    method = getattr(method, "value", method)
+    if path.startswith("/rpc/"):
+        return path[len("/rpc/"):], "rpc"
+    operation = _OPERATIONS.get(method, str(method).lower() or "unknown")
+    if operation == "insert" and "resolution=" in getattr(query, "headers", {}).get("prefer", ""):
+        operation = "upsert"
+    return path.lstrip("/") or "unknown", operation
+
+def observe_query(query: Any, seconds: float, failed: bool) -> None:
+    table, operation = query_labels(query)
+    supabase_query_duration.observe(seconds, table, operation)
+    if failed:
+        supabase_query_errors.inc(table, operation)
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        queries = [0]
+        token = _request_queries.set(queries)
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            _request_queries.reset(token)
+            
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(elapsed, scope["method"], route, str(status_code))
+            supabase_queries_per_request.observe(queries[0], route)
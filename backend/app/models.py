@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import Optional, List, Dict, Any, Union
 from datetime import datetime, date
 from enum import Enum
 
@@ -19,6 +19,14 @@ class NodeTypeEnum(str, Enum):
     dayDivider = "dayDivider"
     nestedCanvas = "nestedCanvas"
 
+class BatchOperationEnum(str, Enum):
+    card_create = "card.create"
+    card_update = "card.update"
+    card_delete = "card.delete"
+    connection_create = "connection.create"
+    connection_update = "connection.update"
+    connection_delete = "connection.delete"
+
 class SubscriptionTierEnum(str, Enum):
     free = "free"
     premium = "premium"
@@ -96,6 +104,10 @@ class Trip(TripBase, TimestampMixin):
     class Config:
         from_attributes = True
 
+class TripPage(BaseModel):
+    items: List[Trip]
+    next_cursor: Optional[str] = None
+
 # Card Models  
 class CardBase(BaseModel):
     type: NodeTypeEnum
@@ -114,6 +126,15 @@ class CardUpdate(BaseModel):
     position: Optional[Dict[str, float]] = None
     style: Optional[Dict[str, Any]] = None
 
+class CardPositionUpdate(BaseModel):
+    position: Dict[str, float]
+
+class CardBulkUpdateItem(CardUpdate):
+    id: str
+
+class CardBulkUpdate(BaseModel):
+    cards: List[CardBulkUpdateItem] = Field(..., min_length=1, max_length=1000)
+
 class Card(CardBase, TimestampMixin):
     id: str
     trip_id: str
@@ -121,6 +142,27 @@ class Card(CardBase, TimestampMixin):
     class Config:
         from_attributes = True
 
+class CardVersion(BaseModel):
+    version_number: int
+    kind: str
+    created_by: Optional[str] = None
+    created_at: datetime
+    ai_generated: bool = False
+
+class CardVersionDetail(BaseModel):
+    card_id: str
+    version_number: int
+    # None for versions recorded before title and style were versioned
+    title: Optional[str] = None
+    content: Dict[str, Any] = {}
+    style: Optional[Dict[str, Any]] = None
+
+class NestedCanvas(BaseModel):
+    card_id: str
+    path: List[str] = []
+    nodes: List[Dict[str, Any]] = []
+    edges: List[Dict[str, Any]] = []
+
 # Connection Models
 class ConnectionBase(BaseModel):
     type: str = "default"
@@ -142,10 +184,59 @@ class Connection(ConnectionBase):
     from_card_id: str
     to_card_id: str
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+# Batch Models
+class BatchOperation(BaseModel):
+    op: BatchOperationEnum
+    id: Optional[str] = None  # Target of update/delete: a real id or an earlier ref
+    ref: Optional[str] = None  # Client temporary id for a created record
+    data: Dict[str, Any] = {}
+
+class CanvasBatch(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=1000)
+
+class BatchResult(BaseModel):
+    index: int
+    op: BatchOperationEnum
+    ref: Optional[str] = None
+    id: str
+    record: Union[Card, Connection]
+
+# Connection Graph Models
+class ItineraryOrder(BaseModel):
+    order: List[str] = []
+    unordered: List[str] = []  # Cards on, or only reachable through, a cycle
+    cycle: Optional[List[str]] = None
+
+class GraphCycle(BaseModel):
+    has_cycle: bool
+    cycle: Optional[List[str]] = None
+
+class CardReachability(BaseModel):
+    from_card_id: str
+    card_ids: List[str] = []
+
+class CardPath(BaseModel):
+    from_card_id: str
+    to_card_id: str
+    path: Optional[List[str]] = None
+
+# Sync Models
+class Tombstone(BaseModel):
+    id: str
+    record_type: str
+    deleted_at: datetime
+
+class TripChanges(BaseModel):
+    cards: List[Card] = []
+    connections: List[Connection] = []
+    deleted: List[Tombstone] = []
+    cursor: str
+
 # Authentication Models
 class UserLogin(BaseModel):
     email: str
@@ -175,4 +266,9 @@ class ResponseModel(BaseModel):
 class ErrorResponse(BaseModel):
     success: bool = False
     message: str
-    error: Optional[str] = None
\ No newline at end of file
+    error: Optional[str] = None
+
+# List adapters: validate a whole result set of database rows in one call
+TripList = TypeAdapter(List[Trip])
+CardList = TypeAdapter(List[Card])
+ConnectionList = TypeAdapter(List[Connection])
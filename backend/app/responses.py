@@ -0,0 +1,109 @@
+from typing import Any, AsyncIterator, Tuple
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic_core import from_json, to_json
+
+from app.compression import compress, response_encoding
+from app.services.snapshot_cache import CanvasSnapshot
+
+# MessagePack is optional; without it clients asking for it get JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered in one pass by pydantic-core's serializer
+
+    Models, datetimes and nested containers are encoded natively, so routers
+    can return service results without FastAPI's response_model validation
+    and jsonable_encoder passes.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+def success_response(
+    message: str = "Success", data: Any = None, status_code: int = status.HTTP_200_OK
+) -> FastJSONResponse:
+    """Build the ResponseModel envelope without re-validating data"""
+    return FastJSONResponse(
+        {"success": True, "message": message, "data": data}, status_code=status_code
+    )
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def wants_msgpack(request: Request) -> bool:
+    """Whether the client asked for MessagePack via Accept and it can be encoded"""
+    accept = request.headers.get("accept", "")
+    return msgpack is not None and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+def _msgpack_body(snapshot: CanvasSnapshot, message: str) -> bytes:
+    if snapshot.msgpack_body is None:
+        snapshot.msgpack_body = msgpack.packb(from_json(snapshot.body))
+    # Same envelope as the JSON body: a three-entry map around the cached data
+    return (
+        b"\x83"
+        + msgpack.packb("success") + msgpack.packb(True)
+        + msgpack.packb("message") + msgpack.packb(message)
+        + msgpack.packb("data") + snapshot.msgpack_body
+    )
+
+def snapshot_response(request: Request, snapshot: CanvasSnapshot, message: str) -> Response:
+    """Serve a cached canvas snapshot wrapped in the ResponseModel envelope, or 304
+
+    The envelope is JSON, or MessagePack when requested with Accept.
+    """
+    use_msgpack = wants_msgpack(request)
+    etag = snapshot.etag[:-1] + '-msgpack"' if use_msgpack else snapshot.etag
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept, Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if use_msgpack:
+        media_type = MSGPACK_MEDIA_TYPES[0]
+        body = _msgpack_body(snapshot, message)
+    else:
+        media_type = "application/json"
+        body = b'{"success":true,"message":' + to_json(message) + b',"data":' + snapshot.body + b'}'
+
+    # Compress here rather than in the middleware so the encoded body is
+    # cached with the snapshot and reused until the trip changes
+    encoding = response_encoding(request.headers.get("accept-encoding", ""), len(body))
+    if encoding is not None:
+        key = (media_type, encoding)
+        if key not in snapshot.encoded:
+            snapshot.encoded[key] = compress(body, encoding)
+        body = snapshot.encoded[key]
+        headers["Content-Encoding"] = encoding
+        headers["ETag"] = "W/" + etag
+
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def wants_ndjson(request: Request) -> bool:
+    """Whether the client opted into the streaming NDJSON mode via Accept"""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+async def _ndjson_lines(records: AsyncIterator[Tuple[str, Any]]) -> AsyncIterator[bytes]:
+    try:
+        async for record, data in records:
+            yield to_json({"record": record, "data": data}) + b"\n"
+    except Exception as e:
+        # Headers are already sent, so failures are reported in-band
+        yield to_json({"record": "error", "message": str(e)}) + b"\n"
+
+def ndjson_response(records: AsyncIterator[Tuple[str, Any]]) -> StreamingResponse:
+    """Stream ("record", data) pairs as one JSON object per line"""
+    return StreamingResponse(_ndjson_lines(records), media_type=NDJSON_MEDIA_TYPE)
@@ -1,5 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 from app.database import get_supabase
 from app.auth import AuthService
@@ -10,7 +13,7 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 @router.post("/register", response_model=ResponseModel)
 async def register(
     user_data: UserRegister,
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """Register a new user"""
     try:
@@ -43,7 +46,7 @@ async def register(
 @router.post("/login", response_model=ResponseModel)
 async def login(
     user_data: UserLogin,
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """Login user"""
     auth_service = AuthService(supabase)
@@ -58,7 +61,7 @@ async def login(
 @router.post("/refresh", response_model=ResponseModel)
 async def refresh_token(
     refresh_token: str,
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """Refresh access token"""
     auth_service = AuthService(supabase)
@@ -72,7 +75,7 @@ async def refresh_token(
 
 @router.post("/logout", response_model=ResponseModel)
 async def logout(
-    supabase: Client = Depends(get_supabase)
+    supabase: "Client" = Depends(get_supabase)
 ):
     """Logout user (client-side token removal mainly)"""
     # Supabase handles logout on client side mainly
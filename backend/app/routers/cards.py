@@ -1,20 +1,34 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 from app.database import get_supabase, get_supabase_admin
 from app.auth import get_current_user
+from app.responses import ndjson_response, snapshot_response, success_response, wants_ndjson
 from app.services.card_service import CardService
-from app.models import Card, CardCreate, CardUpdate, ResponseModel
+from app.models import Card, CardCreate, CardUpdate, CardBulkUpdate, CardPositionUpdate, ResponseModel
 
 router = APIRouter(prefix="/trips", tags=["Cards"])
 
+def _parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    """Parse an "x0,y0,x1,y1" viewport"""
+    try:
+        x0, y0, x1, y1 = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="bbox must be four comma-separated numbers: x0,y0,x1,y1"
+        )
+    return x0, y0, x1, y1
+
 @router.post("/{trip_id}/cards", response_model=ResponseModel)
 async def create_card(
     trip_id: str,
     card_data: CardCreate,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Create a new card in a trip"""
     # Ensure trip_id in URL matches card_data
@@ -23,8 +37,7 @@ async def create_card(
     service = CardService(supabase_admin, current_user)
     card = await service.create_card(card_data)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Card created successfully",
         data=card
     )
@@ -32,48 +45,157 @@ async def create_card(
 @router.get("/{trip_id}/cards", response_model=ResponseModel)
 async def get_trip_cards(
     trip_id: str,
+    request: Request,
+    bbox: Optional[str] = Query(None, description="Only cards positioned inside x0,y0,x1,y1"),
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
-    """Get all cards for a trip"""
+    """Get all cards for a trip (streamed as NDJSON with Accept: application/x-ndjson)"""
     service = CardService(supabase_admin, current_user)
-    cards = await service.get_trip_cards(trip_id)
     
-    return ResponseModel(
-        success=True,
-        message="Cards retrieved successfully",
+    if bbox is not None:
+        cards = await service.get_trip_cards_in_viewport(trip_id, _parse_bbox(bbox))
+        
+        return success_response(
+            message="Cards retrieved successfully",
+            data=cards
+        )
+    
+    if wants_ndjson(request):
+        cards = await service.stream_trip_cards(trip_id)
+        return ndjson_response(("card", card) async for card in cards)
+    
+    snapshot = await service.get_trip_cards_snapshot(trip_id)
+    
+    return snapshot_response(request, snapshot, "Cards retrieved successfully")
+
+@router.put("/{trip_id}/cards/bulk-update", response_model=ResponseModel)
+async def bulk_update_cards(
+    trip_id: str,
+    bulk_data: CardBulkUpdate,
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Bulk update multiple cards of a trip (useful for position updates)"""
+    service = CardService(supabase_admin, current_user)
+    cards = await service.bulk_update_cards(trip_id, bulk_data.cards)
+    
+    return success_response(
+        message="Cards updated successfully",
         data=cards
     )
 
+@router.put("/{trip_id}/cards/{card_id}/position", response_model=ResponseModel, status_code=status.HTTP_202_ACCEPTED)
+async def buffer_card_position(
+    trip_id: str,
+    card_id: str,
+    position_data: CardPositionUpdate,
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Queue a card position update (for drags); writes are coalesced and batched"""
+    service = CardService(supabase_admin, current_user)
+    await service.buffer_card_position(trip_id, card_id, position_data.position)
+    
+    return success_response(
+        message="Card position accepted",
+        data={"id": card_id, "position": position_data.position},
+        status_code=status.HTTP_202_ACCEPTED
+    )
+
 @router.get("/cards/{card_id}", response_model=ResponseModel)
 async def get_card(
     card_id: str,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Get a specific card"""
     service = CardService(supabase_admin, current_user)
     card = await service.get_card_by_id(card_id)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Card retrieved successfully",
         data=card
     )
 
+@router.get("/cards/{card_id}/canvas", response_model=ResponseModel)
+async def expand_nested_canvas(
+    card_id: str,
+    path: Optional[str] = Query(None, description="Comma-separated child nestedCanvas node ids to descend into"),
+    depth: int = Query(0, ge=0, description="Nested canvas levels to include below the expanded one"),
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Get the child nodes and edges of one nested canvas"""
+    service = CardService(supabase_admin, current_user)
+    canvas = await service.get_nested_canvas(card_id, path.split(",") if path else [], depth)
+    
+    return success_response(
+        message="Nested canvas retrieved successfully",
+        data=canvas
+    )
+
+@router.get("/cards/{card_id}/versions", response_model=ResponseModel)
+async def list_card_versions(
+    card_id: str,
+    limit: int = Query(50, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """List the version history of a card, newest first"""
+    service = CardService(supabase_admin, current_user)
+    versions = await service.list_card_versions(card_id, limit, offset)
+    
+    return success_response(
+        message="Card versions retrieved successfully",
+        data=versions
+    )
+
+@router.get("/cards/{card_id}/versions/{version_number}", response_model=ResponseModel)
+async def get_card_version(
+    card_id: str,
+    version_number: int,
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Get the title, content and style of a card version"""
+    service = CardService(supabase_admin, current_user)
+    version = await service.get_card_version(card_id, version_number)
+    
+    return success_response(
+        message="Card version retrieved successfully",
+        data=version
+    )
+
+@router.post("/cards/{card_id}/versions/{version_number}/restore", response_model=ResponseModel)
+async def restore_card_version(
+    card_id: str,
+    version_number: int,
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Restore a card to a previous version"""
+    service = CardService(supabase_admin, current_user)
+    card = await service.restore_card_version(card_id, version_number)
+    
+    return success_response(
+        message="Card version restored successfully",
+        data=card
+    )
+
 @router.put("/cards/{card_id}", response_model=ResponseModel)
 async def update_card(
     card_id: str,
     card_data: CardUpdate,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Update a card"""
     service = CardService(supabase_admin, current_user)
     card = await service.update_card(card_id, card_data)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Card updated successfully",
         data=card
     )
@@ -82,29 +204,12 @@ async def update_card(
 async def delete_card(
     card_id: str,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Delete a card"""
     service = CardService(supabase_admin, current_user)
     await service.delete_card(card_id)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Card deleted successfully"
-    )
-
-@router.put("/cards/bulk-update", response_model=ResponseModel)
-async def bulk_update_cards(
-    updates: List[dict],
-    current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
-):
-    """Bulk update multiple cards (useful for position updates)"""
-    service = CardService(supabase_admin, current_user)
-    cards = await service.bulk_update_cards(updates)
-    
-    return ResponseModel(
-        success=True,
-        message="Cards updated successfully",
-        data=cards
     )
\ No newline at end of file
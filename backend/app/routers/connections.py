@@ -1,9 +1,12 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client
+from typing import TYPE_CHECKING, List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 from app.database import get_supabase, get_supabase_admin
 from app.auth import get_current_user
+from app.responses import ndjson_response, snapshot_response, success_response, wants_ndjson
 from app.services.connection_service import ConnectionService
 from app.models import Connection, ConnectionCreate, ConnectionUpdate, ResponseModel
 
@@ -14,7 +17,7 @@ async def create_connection(
     trip_id: str,
     connection_data: ConnectionCreate,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Create a new connection in a trip"""
     # Ensure trip_id in URL matches connection_data
@@ -23,8 +26,7 @@ async def create_connection(
     service = ConnectionService(supabase_admin, current_user)
     connection = await service.create_connection(connection_data)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Connection created successfully",
         data=connection
     )
@@ -32,31 +34,95 @@ async def create_connection(
 @router.get("/{trip_id}/connections", response_model=ResponseModel)
 async def get_trip_connections(
     trip_id: str,
+    request: Request,
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Get all connections for a trip (streamed as NDJSON with Accept: application/x-ndjson)"""
+    service = ConnectionService(supabase_admin, current_user)
+    
+    if wants_ndjson(request):
+        connections = await service.stream_trip_connections(trip_id)
+        return ndjson_response(("connection", connection) async for connection in connections)
+    
+    snapshot = await service.get_trip_connections_snapshot(trip_id)
+    
+    return snapshot_response(request, snapshot, "Connections retrieved successfully")
+
+@router.get("/{trip_id}/graph/order", response_model=ResponseModel)
+async def get_itinerary_order(
+    trip_id: str,
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Get the connected cards of a trip in itinerary (topological) order"""
+    service = ConnectionService(supabase_admin, current_user)
+    order = await service.get_itinerary_order(trip_id)
+    
+    return success_response(
+        message="Itinerary order retrieved successfully",
+        data=order
+    )
+
+@router.get("/{trip_id}/graph/cycle", response_model=ResponseModel)
+async def find_cycle(
+    trip_id: str,
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Check the trip's connections for a cycle"""
+    service = ConnectionService(supabase_admin, current_user)
+    cycle = await service.find_cycle(trip_id)
+    
+    return success_response(
+        message="Cycle check completed successfully",
+        data=cycle
+    )
+
+@router.get("/{trip_id}/graph/reachable", response_model=ResponseModel)
+async def get_reachable_cards(
+    trip_id: str,
+    from_card_id: str = Query(..., alias="from"),
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Get the cards reachable from a card by following connections"""
+    service = ConnectionService(supabase_admin, current_user)
+    reachability = await service.get_reachable_cards(trip_id, from_card_id)
+    
+    return success_response(
+        message="Reachable cards retrieved successfully",
+        data=reachability
+    )
+
+@router.get("/{trip_id}/graph/path", response_model=ResponseModel)
+async def get_shortest_path(
+    trip_id: str,
+    from_card_id: str = Query(..., alias="from"),
+    to_card_id: str = Query(..., alias="to"),
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
-    """Get all connections for a trip"""
+    """Get the shortest path between two cards (path is null when there is none)"""
     service = ConnectionService(supabase_admin, current_user)
-    connections = await service.get_trip_connections(trip_id)
+    path = await service.get_shortest_path(trip_id, from_card_id, to_card_id)
     
-    return ResponseModel(
-        success=True,
-        message="Connections retrieved successfully",
-        data=connections
+    return success_response(
+        message="Shortest path retrieved successfully",
+        data=path
     )
 
 @router.get("/connections/{connection_id}", response_model=ResponseModel)
 async def get_connection(
     connection_id: str,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Get a specific connection"""
     service = ConnectionService(supabase_admin, current_user)
     connection = await service.get_connection_by_id(connection_id)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Connection retrieved successfully",
         data=connection
     )
@@ -66,14 +132,13 @@ async def update_connection(
     connection_id: str,
     connection_data: ConnectionUpdate,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Update a connection"""
     service = ConnectionService(supabase_admin, current_user)
     connection = await service.update_connection(connection_id, connection_data)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Connection updated successfully",
         data=connection
     )
@@ -82,13 +147,12 @@ async def update_connection(
 async def delete_connection(
     connection_id: str,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Delete a connection"""
     service = ConnectionService(supabase_admin, current_user)
     await service.delete_connection(connection_id)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Connection deleted successfully"
     )
\ No newline at end of file
@@ -0,0 +1,66 @@
+from typing import TYPE_CHECKING, Optional
+import anyio
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, status
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+from app.database import get_supabase, get_supabase_admin
+from app.auth import AuthService
+from app.services.canvas_hub import CanvasSubscriber, canvas_hub
+from app.services.ownership_cache import verify_trip_ownership
+
+router = APIRouter(prefix="/ws", tags=["Realtime"])
+
+def _bearer_token(websocket: WebSocket, token: Optional[str]) -> Optional[str]:
+    """Browsers cannot set headers on WebSockets, so ?token= is accepted too"""
+    if token:
+        return token
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials
+    return None
+
+async def _send_messages(websocket: WebSocket, subscriber: CanvasSubscriber) -> None:
+    try:
+        while True:
+            message = await subscriber.queue.get()
+            await websocket.send_text(message)
+    except Exception:
+        # The receive loop notices the closed socket and ends the session
+        return
+
+async def _receive_until_closed(websocket: WebSocket) -> None:
+    # Client messages are ignored; receiving is how disconnects are noticed
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+@router.websocket("/trips/{trip_id}")
+async def trip_canvas_session(
+    websocket: WebSocket,
+    trip_id: str,
+    token: Optional[str] = Query(None),
+    supabase: "Client" = Depends(get_supabase),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Push every successful mutation of a trip's canvas to connected sessions"""
+    bearer = _bearer_token(websocket, token)
+    user_id = await AuthService(supabase).verify_token(bearer) if bearer else None
+
+    if not user_id or not await verify_trip_ownership(supabase_admin, user_id, trip_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscriber = canvas_hub.subscribe(trip_id, user_id)
+
+    try:
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(_send_messages, websocket, subscriber)
+            await _receive_until_closed(websocket)
+            task_group.cancel_scope.cancel()
+    finally:
+        canvas_hub.unsubscribe(trip_id, subscriber)
@@ -1,11 +1,15 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from supabase import Client
+from typing import TYPE_CHECKING, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 from app.database import get_supabase, get_supabase_admin
 from app.auth import get_current_user
+from app.responses import ndjson_response, snapshot_response, success_response, wants_ndjson
 from app.services.trip_service import TripService
-from app.models import Trip, TripCreate, TripUpdate, ResponseModel
+from app.services.batch_service import BatchService
+from app.models import Trip, TripCreate, TripUpdate, CanvasBatch, ResponseModel
 
 router = APIRouter(prefix="/trips", tags=["Trips"])
 
@@ -13,14 +17,13 @@ router = APIRouter(prefix="/trips", tags=["Trips"])
 async def create_trip(
     trip_data: TripCreate,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Create a new trip"""
     service = TripService(supabase_admin, current_user)
     trip = await service.create_trip(trip_data)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Trip created successfully",
         data=trip
     )
@@ -29,15 +32,27 @@ async def create_trip(
 async def get_user_trips(
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(
+        None,
+        description="Keyset pagination cursor; pass an empty value for the first page"
+    ),
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
-    """Get all trips for the current user"""
+    """Get all trips for the current user (offset paging, or keyset paging with cursor)"""
     service = TripService(supabase_admin, current_user)
+    
+    if cursor is not None:
+        page = await service.get_user_trips_page(limit, cursor)
+        
+        return success_response(
+            message="Trips retrieved successfully",
+            data=page
+        )
+    
     trips = await service.get_user_trips(limit, offset)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Trips retrieved successfully",
         data=trips
     )
@@ -46,14 +61,13 @@ async def get_user_trips(
 async def get_trip(
     trip_id: str,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Get a specific trip"""
     service = TripService(supabase_admin, current_user)
     trip = await service.get_trip_by_id(trip_id)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Trip retrieved successfully",
         data=trip
     )
@@ -61,17 +75,57 @@ async def get_trip(
 @router.get("/{trip_id}/full", response_model=ResponseModel)
 async def get_trip_full_data(
     trip_id: str,
+    request: Request,
+    depth: Optional[int] = Query(
+        None, ge=0, description="Nested canvas levels to include; deeper canvases are returned as stubs"
+    ),
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Get trip with all cards and connections (streamed as NDJSON with Accept: application/x-ndjson)"""
+    service = TripService(supabase_admin, current_user)
+    
+    if depth is not None:
+        snapshot = await service.get_trip_canvas_snapshot(trip_id, depth)
+        return snapshot_response(request, snapshot, "Trip data retrieved successfully")
+    
+    if wants_ndjson(request):
+        return ndjson_response(await service.stream_trip_full_data(trip_id))
+    
+    snapshot = await service.get_trip_full_snapshot(trip_id)
+    
+    return snapshot_response(request, snapshot, "Trip data retrieved successfully")
+
+@router.get("/{trip_id}/changes", response_model=ResponseModel)
+async def get_trip_changes(
+    trip_id: str,
+    since: Optional[str] = Query(None, description="Cursor returned by the previous sync"),
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
-    """Get trip with all cards and connections"""
+    """Get cards and connections changed since a cursor, with tombstones for deletes"""
     service = TripService(supabase_admin, current_user)
-    data = await service.get_trip_full_data(trip_id)
+    changes = await service.get_trip_changes(trip_id, since)
+    
+    return success_response(
+        message="Trip changes retrieved successfully",
+        data=changes
+    )
+
+@router.post("/{trip_id}/batch", response_model=ResponseModel)
+async def apply_canvas_batch(
+    trip_id: str,
+    batch: CanvasBatch,
+    current_user: str = Depends(get_current_user),
+    supabase_admin: "Client" = Depends(get_supabase_admin)
+):
+    """Apply an ordered batch of card and connection operations atomically"""
+    service = BatchService(supabase_admin, current_user)
+    results = await service.apply_batch(trip_id, batch.operations)
     
-    return ResponseModel(
-        success=True,
-        message="Trip data retrieved successfully",
-        data=data
+    return success_response(
+        message="Batch applied successfully",
+        data=results
     )
 
 @router.put("/{trip_id}", response_model=ResponseModel)
@@ -79,14 +133,13 @@ async def update_trip(
     trip_id: str,
     trip_data: TripUpdate,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Update a trip"""
     service = TripService(supabase_admin, current_user)
     trip = await service.update_trip(trip_id, trip_data)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Trip updated successfully",
         data=trip
     )
@@ -95,14 +148,13 @@ async def update_trip(
 async def delete_trip(
     trip_id: str,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Delete a trip"""
     service = TripService(supabase_admin, current_user)
     await service.delete_trip(trip_id)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Trip deleted successfully"
     )
 
@@ -111,14 +163,13 @@ async def duplicate_trip(
     trip_id: str,
     new_title: str = None,
     current_user: str = Depends(get_current_user),
-    supabase_admin: Client = Depends(get_supabase_admin)
+    supabase_admin: "Client" = Depends(get_supabase_admin)
 ):
     """Duplicate a trip"""
     service = TripService(supabase_admin, current_user)
     trip = await service.duplicate_trip(trip_id, new_title)
     
-    return ResponseModel(
-        success=True,
+    return success_response(
         message="Trip duplicated successfully",
         data=trip
     )
\ No newline at end of file
@@ -0,0 +1,176 @@
+from typing import TYPE_CHECKING, Any, Dict, List
+import uuid
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+from app.database import execute
+from app.services.ownership_cache import card_trip_cache, verify_trip_ownership
+from app.services.snapshot_cache import canvas_snapshot_cache
+from app.services.write_buffer import position_write_buffer
+from app.services.canvas_hub import canvas_hub
+from app.services.connection_graph import connection_graph_cache
+from app.services.canvas_tree import has_collapsed_canvas
+from app.services.card_versions import VERSIONED_FIELDS, CardVersionStore, version_head_cache
+from app.models import (
+    BatchOperation, BatchOperationEnum, BatchResult, Card, CardBase, CardUpdate,
+    Connection, ConnectionBase, ConnectionUpdate
+)
+
+CREATE_OPS = {BatchOperationEnum.card_create, BatchOperationEnum.connection_create}
+
+class BatchService:
+    def __init__(self, supabase: "Client", user_id: str):
+        self.supabase = supabase
+        self.user_id = user_id
+
+    def _prepare(self, operations: List[BatchOperation]) -> List[Dict[str, Any]]:
+        """Validate each operation, assign ids to creates and resolve temporary ids"""
+        refs: Dict[str, str] = {}
+        resolve = lambda value: refs.get(value, value)
+        payload = []
+        
+        for index, operation in enumerate(operations):
+            op = operation.op
+            
+            try:
+                if op == BatchOperationEnum.card_create:
+                    data = CardBase.model_validate(operation.data).model_dump(mode="json")
+                elif op == BatchOperationEnum.card_update:
+                    data = CardUpdate.model_validate(operation.data).model_dump(mode="json", exclude_none=True)
+                elif op == BatchOperationEnum.connection_create:
+                    data = ConnectionBase.model_validate(operation.data).model_dump(mode="json")
+                    data["from_card_id"] = resolve(str(operation.data["from_card_id"]))
+                    data["to_card_id"] = resolve(str(operation.data["to_card_id"]))
+                elif op == BatchOperationEnum.connection_update:
+                    data = ConnectionUpdate.model_validate(operation.data).model_dump(mode="json", exclude_none=True)
+                else:
+                    data = {}
+            except (ValidationError, KeyError) as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Operation {index}: invalid data: {str(e)}"
+                )
+            
+            if op in CREATE_OPS:
+                record_id = str(operation.data.get("id") or uuid.uuid4())
+                if operation.ref is not None:
+                    if operation.ref in refs:
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Operation {index}: duplicate ref {operation.ref}"
+                        )
+                    refs[operation.ref] = record_id
+            elif operation.id is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Operation {index}: id is required for {op.value}"
+                )
+            else:
+                record_id = resolve(operation.id)
+            
+            if op in (BatchOperationEnum.card_update, BatchOperationEnum.connection_update) and not data:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Operation {index}: no valid fields to update"
+                )
+            
+            if has_collapsed_canvas(data.get("content") or {}):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Operation {index}: expand collapsed nested canvases before saving content"
+                )
+            
+            payload.append({"op": op.value, "id": record_id, "data": data})
+        
+        return payload
+
+    async def apply_batch(self, trip_id: str, operations: List[BatchOperation]) -> List[BatchResult]:
+        """Apply card and connection operations in order, in one transaction"""
+        try:
+            # One ownership check for the whole batch
+            if not await verify_trip_ownership(self.supabase, self.user_id, trip_id):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Access denied: Trip not found or not owned by user"
+                )
+            
+            payload = self._prepare(operations)
+            
+            response = await execute(
+                self.supabase.rpc(
+                    "apply_canvas_batch",
+                    {"p_trip_id": trip_id, "p_operations": payload}
+                )
+            )
+            
+            results = []
+            for index, (operation, row) in enumerate(zip(operations, response.data)):
+                is_card = operation.op.value.startswith("card.")
+                results.append(BatchResult(
+                    index=index,
+                    op=operation.op,
+                    ref=operation.ref,
+                    id=row["id"],
+                    record=Card(**row) if is_card else Connection(**row)
+                ))
+            
+            self._apply_side_effects(trip_id, payload, results)
+            await CardVersionStore(self.supabase).record_quietly(
+                [
+                    result.record for result, item in zip(results, payload)
+                    if item["op"] in ("card.create", "card.update")
+                    and any(field in item["data"] for field in VERSIONED_FIELDS)
+                ],
+                self.user_id
+            )
+            
+            return results
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            if "not found" in str(e).lower():
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Batch rolled back: {str(e)}"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to apply batch: {str(e)}"
+            )
+
+    def _apply_side_effects(self, trip_id: str, payload: List[Dict[str, Any]], results: List[BatchResult]) -> None:
+        """Keep caches, buffered drags and live sessions in step with the committed batch"""
+        canvas_snapshot_cache.invalidate_trip(trip_id)
+        
+        for item, result in zip(payload, results):
+            op, record = item["op"], result.record
+            
+            if op == "card.create":
+                canvas_hub.publish(trip_id, "card.created", record)
+            elif op == "card.update":
+                if "position" in item["data"]:
+                    position_write_buffer.discard(record.id)
+                canvas_hub.publish(
+                    trip_id,
+                    "card.updated",
+                    {"id": record.id, **item["data"], "updated_at": record.updated_at}
+                )
+            elif op == "card.delete":
+                position_write_buffer.discard(record.id)
+                version_head_cache.discard(record.id)
+                card_trip_cache.discard(record.id)
+                connection_graph_cache.remove_card(trip_id, record.id)
+                canvas_hub.publish(trip_id, "card.deleted", {"id": record.id})
+            elif op == "connection.create":
+                connection_graph_cache.add_connection(trip_id, record.id, record.from_card_id, record.to_card_id)
+                canvas_hub.publish(trip_id, "connection.created", record)
+            elif op == "connection.update":
+                canvas_hub.publish(trip_id, "connection.updated", {"id": record.id, **item["data"]})
+            else:
+                connection_graph_cache.remove_connection(trip_id, record.id)
+                canvas_hub.publish(trip_id, "connection.deleted", {"id": record.id})
+
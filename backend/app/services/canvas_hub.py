@@ -0,0 +1,69 @@
+from collections import defaultdict
+from typing import Any, Dict, Set
+import asyncio
+
+from pydantic_core import to_json
+
+from app.config import settings
+
+# Sent instead of the backlog to a subscriber that fell too far behind; the
+# client catches up through GET /trips/{trip_id}/changes
+RESYNC_MESSAGE = to_json({"op": "resync"}).decode()
+
+class CanvasSubscriber:
+    """One connected session: a bounded outbox drained by its WebSocket"""
+
+    def __init__(self, user_id: str, max_queue: int = 256):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def offer(self, message: str) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow consumer: replace the backlog with a single resync marker
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_MESSAGE)
+
+class CanvasHub:
+    """In-process fan-out of canvas mutations to the sessions of each trip"""
+
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self.published = 0
+        self._subscribers: Dict[str, Set[CanvasSubscriber]] = defaultdict(set)
+
+    def subscribe(self, trip_id: str, user_id: str) -> CanvasSubscriber:
+        subscriber = CanvasSubscriber(user_id, self.max_queue)
+        self._subscribers[trip_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, trip_id: str, subscriber: CanvasSubscriber) -> None:
+        subscribers = self._subscribers.get(trip_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[trip_id]
+
+    def publish(self, trip_id: str, op: str, data: Any = None) -> None:
+        """Send {"op", "data"} to every session of the trip, serialized once"""
+        subscribers = self._subscribers.get(trip_id)
+        if not subscribers:
+            return
+        message = to_json({"op": op, "data": data}).decode()
+        for subscriber in subscribers:
+            subscriber.offer(message)
+        self.published += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "trips": len(self._subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published
+        }
+
+canvas_hub = CanvasHub(max_queue=settings.ws_max_queue)
@@ -0,0 +1,59 @@
+from typing import Any, Dict, List, Optional
+
+from app.models import NodeTypeEnum
+
+# A nestedCanvas card keeps its sub-graph in content as React Flow
+# "childNodes" / "childEdges"; a child nestedCanvas node nests the same way
+# in its "data"
+CHILD_KEYS = ("childNodes", "childEdges")
+
+def _is_nested_canvas(node: Any) -> bool:
+    return isinstance(node, dict) and node.get("type") == NodeTypeEnum.nestedCanvas.value
+
+def collapse_canvas(content: Dict[str, Any], depth: int) -> Dict[str, Any]:
+    """Copy of a nested canvas' content keeping `depth` levels of children
+
+    Canvases below that depth become stubs: their children are dropped and
+    replaced by "childCount" and "collapsed": true.
+    """
+    children = content.get("childNodes")
+    if not isinstance(children, list):
+        return content
+    
+    if depth <= 0:
+        stub = {k: v for k, v in content.items() if k not in CHILD_KEYS}
+        stub["childCount"] = len(children)
+        stub["collapsed"] = True
+        return stub
+    
+    return {
+        **content,
+        "childNodes": [
+            {**node, "data": collapse_canvas(node["data"], depth - 1)}
+            if _is_nested_canvas(node) and isinstance(node.get("data"), dict) else node
+            for node in children
+        ]
+    }
+
+def find_nested_canvas(content: Dict[str, Any], path: List[str]) -> Optional[Dict[str, Any]]:
+    """Follow child nestedCanvas node ids down from a card's content"""
+    for node_id in path:
+        children = content.get("childNodes")
+        node = next(
+            (node for node in children or [] if _is_nested_canvas(node) and node.get("id") == node_id),
+            None
+        )
+        if node is None or not isinstance(node.get("data"), dict):
+            return None
+        content = node["data"]
+    return content
+
+def has_collapsed_canvas(content: Dict[str, Any]) -> bool:
+    """True if content still holds stubs, which must never be written back"""
+    if content.get("collapsed") is True and "childNodes" not in content:
+        return True
+    return any(
+        has_collapsed_canvas(node["data"])
+        for node in content.get("childNodes") or []
+        if _is_nested_canvas(node) and isinstance(node.get("data"), dict)
+    )
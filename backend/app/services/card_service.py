@@ -1,28 +1,33 @@
-from typing import List, Optional
-from supabase import Client
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
 from fastapi import HTTPException, status
 
-from app.models import Card, CardCreate, CardUpdate
+if TYPE_CHECKING:
+    from supabase import Client
+
+from app.config import settings
+from app.admission import AdmissionRejected
+from app.database import execute, iter_rows
+from app.services.ownership_cache import card_trip_cache, verify_card_in_trip, verify_trip_ownership
+from app.services.snapshot_cache import CanvasSnapshot, canvas_snapshot_cache
+from app.services.write_buffer import position_write_buffer
+from app.services.canvas_hub import canvas_hub
+from app.services.connection_graph import connection_graph_cache
+from app.services.card_versions import VERSIONED_FIELDS, CardVersionStore, version_head_cache
+from app.services.canvas_tree import collapse_canvas, find_nested_canvas, has_collapsed_canvas
+from app.services.single_flight import read_flights
+from app.models import (
+    Card, CardList, CardCreate, CardUpdate, CardBulkUpdateItem, CardVersion,
+    CardVersionDetail, NestedCanvas, NodeTypeEnum
+)
 
 class CardService:
-    def __init__(self, supabase: Client, user_id: str):
+    def __init__(self, supabase: "Client", user_id: str):
         self.supabase = supabase
         self.user_id = user_id
 
     async def _verify_trip_ownership(self, trip_id: str) -> bool:
         """Verify that the trip belongs to the current user"""
-        try:
-            response = (
-                self.supabase.table("trips")
-                .select("id")
-                .eq("id", trip_id)
-                .eq("user_id", self.user_id)
-                .single()
-                .execute()
-            )
-            return response.data is not None
-        except:
-            return False
+        return await verify_trip_ownership(self.supabase, self.user_id, trip_id)
 
     async def create_card(self, card_data: CardCreate) -> Card:
         """Create a new card"""
@@ -38,7 +43,7 @@ class CardService:
             card_dict = card_data.model_dump()
             
             # Create card in Supabase
-            response = self.supabase.table("cards").insert(card_dict).execute()
+            response = await execute(self.supabase.table("cards").insert(card_dict))
             
             if not response.data:
                 raise HTTPException(
@@ -46,7 +51,12 @@ class CardService:
                     detail="Failed to create card"
                 )
             
-            return Card(**response.data[0])
+            card = Card(**response.data[0])
+            canvas_snapshot_cache.invalidate_trip(card.trip_id)
+            canvas_hub.publish(card.trip_id, "card.created", card)
+            await CardVersionStore(self.supabase).record_quietly([card], self.user_id)
+            
+            return card
             
         except HTTPException:
             raise
@@ -58,6 +68,11 @@ class CardService:
 
     async def get_trip_cards(self, trip_id: str) -> List[Card]:
         """Get all cards for a specific trip"""
+        return await read_flights.do(
+            (trip_id, "trip_cards", self.user_id), lambda: self._fetch_trip_cards(trip_id)
+        )
+
+    async def _fetch_trip_cards(self, trip_id: str) -> List[Card]:
         try:
             # Verify trip ownership
             if not await self._verify_trip_ownership(trip_id):
@@ -66,15 +81,17 @@ class CardService:
                     detail="Access denied: Trip not found or not owned by user"
                 )
             
-            response = (
+            response = await execute(
                 self.supabase.table("cards")
                 .select("*")
                 .eq("trip_id", trip_id)
                 .order("created_at")
-                .execute()
             )
             
-            return [Card(**card) for card in response.data]
+            cards = CardList.validate_python(response.data)
+            position_write_buffer.apply(cards)
+            
+            return cards
             
         except HTTPException:
             raise
@@ -84,17 +101,108 @@ class CardService:
                 detail=f"Failed to fetch cards: {str(e)}"
             )
 
+    @staticmethod
+    def _in_box(position: Dict[str, float], bbox: Tuple[float, float, float, float]) -> bool:
+        x0, y0, x1, y1 = bbox
+        return (
+            min(x0, x1) <= position.get("x", 0) <= max(x0, x1)
+            and min(y0, y1) <= position.get("y", 0) <= max(y0, y1)
+        )
+
+    async def get_trip_cards_in_viewport(
+        self, trip_id: str, bbox: Tuple[float, float, float, float]
+    ) -> List[Card]:
+        """Get the cards of a trip whose position lies inside a bounding box"""
+        try:
+            if not await self._verify_trip_ownership(trip_id):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Access denied: Trip not found or not owned by user"
+                )
+            
+            x0, y0, x1, y1 = bbox
+            
+            # Served by the (trip_id, card_point(position)) GiST index
+            response = await execute(
+                self.supabase.rpc(
+                    "cards_in_viewport",
+                    {"p_trip_id": trip_id, "p_x0": x0, "p_y0": y0, "p_x1": x1, "p_y1": y1}
+                )
+            )
+            
+            cards = CardList.validate_python(response.data)
+            position_write_buffer.apply(cards)
+            
+            # Buffered drags may have moved a card out of the box, or into it
+            # from a position the database still has outside
+            returned = {card.id for card in cards}
+            moved_in = [
+                card_id for card_id, position in position_write_buffer.trip_positions(trip_id).items()
+                if card_id not in returned and self._in_box(position, bbox)
+            ]
+            if moved_in:
+                response = await execute(
+                    self.supabase.table("cards")
+                    .select("*")
+                    .eq("trip_id", trip_id)
+                    .in_("id", moved_in)
+                )
+                extra = CardList.validate_python(response.data)
+                position_write_buffer.apply(extra)
+                cards.extend(extra)
+            
+            return [card for card in cards if self._in_box(card.position, bbox)]
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to fetch cards: {str(e)}"
+            )
+
+    async def get_trip_cards_snapshot(self, trip_id: str) -> CanvasSnapshot:
+        """Get the serialized cards of a trip from the snapshot cache"""
+        if not await self._verify_trip_ownership(trip_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Trip not found or not owned by user"
+            )
+        
+        return await canvas_snapshot_cache.get_or_build(
+            trip_id, "cards", lambda: self.get_trip_cards(trip_id)
+        )
+
+    async def stream_trip_cards(self, trip_id: str) -> AsyncIterator[Card]:
+        """Verify ownership, then return an iterator paging through the trip's cards"""
+        if not await self._verify_trip_ownership(trip_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Trip not found or not owned by user"
+            )
+        
+        return self._iter_trip_cards(trip_id)
+
+    async def _iter_trip_cards(self, trip_id: str) -> AsyncIterator[Card]:
+        rows = iter_rows(
+            lambda: self.supabase.table("cards").select("*").eq("trip_id", trip_id),
+            settings.stream_page_size
+        )
+        async for row in rows:
+            card = Card(**row)
+            position_write_buffer.apply([card])
+            yield card
+
     async def get_card_by_id(self, card_id: str) -> Card:
         """Get a specific card by ID"""
         try:
             # Get card with trip info to verify ownership
-            response = (
+            response = await execute(
                 self.supabase.table("cards")
                 .select("*, trips!inner(user_id)")
                 .eq("id", card_id)
                 .eq("trips.user_id", self.user_id)
                 .single()
-                .execute()
             )
             
             if not response.data:
@@ -105,7 +213,10 @@ class CardService:
             
             # Clean the data (remove the trips join data)
             card_data = {k: v for k, v in response.data.items() if k != 'trips'}
-            return Card(**card_data)
+            card = Card(**card_data)
+            position_write_buffer.apply([card])
+            
+            return card
             
         except HTTPException:
             raise
@@ -115,6 +226,32 @@ class CardService:
                 detail=f"Failed to fetch card: {str(e)}"
             )
 
+    async def get_nested_canvas(self, card_id: str, path: List[str], depth: int = 0) -> NestedCanvas:
+        """Expand a nested canvas of a card, `depth` levels below its own children"""
+        card = await self.get_card_by_id(card_id)
+        
+        if card.type != NodeTypeEnum.nestedCanvas:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Card is not a nested canvas"
+            )
+        
+        content = find_nested_canvas(card.content, path)
+        if content is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Nested canvas not found"
+            )
+        
+        content = collapse_canvas(content, depth + 1)
+        
+        return NestedCanvas(
+            card_id=card_id,
+            path=path,
+            nodes=content.get("childNodes") or [],
+            edges=content.get("childEdges") or []
+        )
+
     async def update_card(self, card_id: str, card_data: CardUpdate) -> Card:
         """Update a card"""
         try:
@@ -127,13 +264,25 @@ class CardService:
                     detail="No valid fields to update"
                 )
             
+            if has_collapsed_canvas(update_dict.get("content", {})):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Expand collapsed nested canvases before saving content"
+                )
+            
+            # A direct position write supersedes any buffered drag position
+            superseded = position_write_buffer.take([card_id] if "position" in update_dict else [])
+            
             # Update with ownership verification via RLS
-            response = (
-                self.supabase.table("cards")
-                .update(update_dict)
-                .eq("id", card_id)
-                .execute()
-            )
+            try:
+                response = await execute(
+                    self.supabase.table("cards")
+                    .update(update_dict)
+                    .eq("id", card_id)
+                )
+            except BaseException:
+                position_write_buffer.restore(superseded)
+                raise
             
             if not response.data:
                 raise HTTPException(
@@ -141,7 +290,18 @@ class CardService:
                     detail="Card not found or access denied"
                 )
             
-            return Card(**response.data[0])
+            card = Card(**response.data[0])
+            canvas_snapshot_cache.invalidate_trip(card.trip_id)
+            canvas_hub.publish(
+                card.trip_id,
+                "card.updated",
+                {"id": card.id, **update_dict, "updated_at": card.updated_at}
+            )
+            
+            if any(field in update_dict for field in VERSIONED_FIELDS):
+                await CardVersionStore(self.supabase).record_quietly([card], self.user_id)
+            
+            return card
             
         except HTTPException:
             raise
@@ -154,12 +314,15 @@ class CardService:
     async def delete_card(self, card_id: str) -> bool:
         """Delete a card"""
         try:
+            position_write_buffer.discard(card_id)
+            version_head_cache.discard(card_id)
+            card_trip_cache.discard(card_id)
+            
             # Delete with ownership verification via RLS
-            response = (
+            response = await execute(
                 self.supabase.table("cards")
                 .delete()
                 .eq("id", card_id)
-                .execute()
             )
             
             if not response.data:
@@ -168,6 +331,11 @@ class CardService:
                     detail="Card not found or access denied"
                 )
             
+            trip_id = response.data[0]["trip_id"]
+            canvas_snapshot_cache.invalidate_trip(trip_id)
+            canvas_hub.publish(trip_id, "card.deleted", {"id": card_id})
+            connection_graph_cache.remove_card(trip_id, card_id)
+            
             return True
             
         except HTTPException:
@@ -178,24 +346,144 @@ class CardService:
                 detail=f"Failed to delete card: {str(e)}"
             )
 
-    async def bulk_update_cards(self, updates: List[dict]) -> List[Card]:
-        """Bulk update multiple cards (for position updates)"""
+    async def buffer_card_position(self, trip_id: str, card_id: str, position: Dict[str, float]) -> None:
+        """Accept a drag position update into the coalescing write buffer"""
+        if not await self._verify_trip_ownership(trip_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Trip not found or not owned by user"
+            )
+        
+        # Buffered positions are overlaid on reads before they reach the
+        # database, so the card must be checked against the trip up front
+        if not await verify_card_in_trip(self.supabase, trip_id, card_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Card not found in trip"
+            )
+        
+        # Written later by bulk_update_card_positions, scoped to this trip
+        position_write_buffer.add(trip_id, card_id, position)
+        canvas_snapshot_cache.invalidate_trip(trip_id)
+        canvas_hub.publish(trip_id, "card.moved", {"id": card_id, "position": position})
+
+    async def bulk_update_cards(self, trip_id: str, updates: List[CardBulkUpdateItem]) -> List[Card]:
+        """Bulk update multiple cards of a trip in a single statement"""
         try:
-            updated_cards = []
+            # Verify trip ownership once for the whole batch
+            if not await self._verify_trip_ownership(trip_id):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Access denied: Trip not found or not owned by user"
+                )
             
+            # Merge repeated updates for the same card, later fields win
+            rows = {}
             for update in updates:
-                card_id = update.get("id")
-                card_data = CardUpdate(**{k: v for k, v in update.items() if k != "id"})
-                
-                updated_card = await self.update_card(card_id, card_data)
-                updated_cards.append(updated_card)
+                fields = {k: v for k, v in update.model_dump(exclude_unset=True).items() if v is not None}
+                rows.setdefault(update.id, {}).update(fields)
+            
+            if any(set(row) == {"id"} for row in rows.values()):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="No valid fields to update"
+                )
+            
+            if any(has_collapsed_canvas(row.get("content", {})) for row in rows.values()):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Expand collapsed nested canvases before saving content"
+                )
+            
+            payload = list(rows.values())
+            
+            # The batch supersedes buffered drags of its cards; taken before
+            # the write so a flush cannot land after it, restored on failure
+            superseded = position_write_buffer.take(row["id"] for row in payload if "position" in row)
+            
+            # Position-only batches (drags, auto-arrange) skip the generic merge
+            if all(set(row) == {"id", "position"} for row in payload):
+                query = self.supabase.rpc(
+                    "bulk_update_card_positions",
+                    {"p_trip_id": trip_id, "p_positions": payload}
+                )
+            else:
+                query = self.supabase.rpc(
+                    "bulk_update_cards",
+                    {"p_trip_id": trip_id, "p_updates": payload}
+                )
+            
+            try:
+                response = await execute(query)
+            except BaseException:
+                position_write_buffer.restore(superseded)
+                raise
             
-            return updated_cards
+            canvas_snapshot_cache.invalidate_trip(trip_id)
+            canvas_hub.publish(trip_id, "cards.updated", payload)
+            
+            cards = CardList.validate_python(response.data)
+            await CardVersionStore(self.supabase).record_quietly(
+                [card for card in cards if any(field in rows[card.id] for field in VERSIONED_FIELDS)],
+                self.user_id
+            )
+            
+            return cards
             
         except HTTPException:
             raise
         except Exception as e:
+            if "not found" in str(e).lower():
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Card not found or access denied"
+                )
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to bulk update cards: {str(e)}"
-            )
\ No newline at end of file
+            )
+
+    async def list_card_versions(self, card_id: str, limit: int = 50, offset: int = 0) -> List[CardVersion]:
+        """List the versions of a card, newest first"""
+        await self.get_card_by_id(card_id)
+        
+        try:
+            return await CardVersionStore(self.supabase).list_versions(card_id, limit, offset)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to fetch card versions: {str(e)}"
+            )
+
+    async def get_card_version(self, card_id: str, version_number: int) -> CardVersionDetail:
+        """Rebuild the title, content and style of a card version"""
+        await self.get_card_by_id(card_id)
+        
+        try:
+            document = await CardVersionStore(self.supabase).get_document(card_id, version_number)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to fetch card version: {str(e)}"
+            )
+        
+        if document is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Card version not found"
+            )
+        
+        return CardVersionDetail(card_id=card_id, version_number=version_number, **document)
+
+    async def restore_card_version(self, card_id: str, version_number: int) -> Card:
+        """Restore a card to a previous version, recorded as a new version"""
+        version = await self.get_card_version(card_id, version_number)
+        
+        return await self.update_card(
+            card_id,
+            CardUpdate(title=version.title, content=version.content, style=version.style)
+        )
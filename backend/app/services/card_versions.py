@@ -0,0 +1,221 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import logging
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+from app.config import settings
+from app.database import execute
+from app.services.json_patch import apply_patch, make_patch
+from app.models import Card, CardVersion
+
+logger = logging.getLogger(__name__)
+
+# Versioned fields; position changes are drags and do not make a version
+VERSIONED_FIELDS = ("title", "content", "style")
+
+@dataclass
+class VersionHead:
+    """Latest version of a card, kept so the next delta needs no reads"""
+    version_number: int
+    snapshot_version: int
+    document: Dict[str, Any]
+
+class VersionHeadCache:
+    """LRU of card_id -> VersionHead
+
+    A head that is stale because another worker wrote a newer version is
+    detected by the unique (card_id, version_number) index on insert.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, VersionHead]" = OrderedDict()
+
+    def get(self, card_id: str) -> Optional[VersionHead]:
+        head = self._entries.get(card_id)
+        if head is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(card_id)
+        self.hits += 1
+        return head
+
+    def set(self, card_id: str, head: VersionHead) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[card_id] = head
+        self._entries.move_to_end(card_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, card_id: str) -> None:
+        self._entries.pop(card_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+version_head_cache = VersionHeadCache(max_size=settings.card_version_cache_size)
+
+def version_document(card: Card) -> Dict[str, Any]:
+    return card.model_dump(include=set(VERSIONED_FIELDS), mode="json")
+
+def snapshot_document(content: Any) -> Dict[str, Any]:
+    """Versioned document held by a snapshot row
+
+    Rows written before delta compression (or inserted by hand) hold the
+    card's raw content instead of {title, content, style}; they become a
+    document with only the content, so title and style stay unknown.
+    """
+    if isinstance(content, dict) and "title" in content and set(content) <= set(VERSIONED_FIELDS):
+        return content
+    return {"content": content if isinstance(content, dict) else {"value": content}}
+
+class CardVersionStore:
+    """Delta-compressed card history in card_versions
+
+    Every snapshot_interval-th version is a full snapshot and the rest are
+    JSON Patches against the previous version, so rebuilding any version
+    reads one row plus one range of at most snapshot_interval rows.
+    Callers are responsible for checking card ownership.
+    """
+
+    def __init__(self, supabase: "Client", snapshot_interval: int = settings.card_version_snapshot_interval):
+        self.supabase = supabase
+        self.snapshot_interval = max(snapshot_interval, 1)
+
+    async def record(self, card: Card, user_id: str) -> Optional[int]:
+        """Write a version if the versioned fields changed; returns its number"""
+        return (await self.record_many([card], user_id)).get(card.id)
+
+    async def record_many(self, cards: List[Card], user_id: str) -> Dict[str, int]:
+        """Write a version of every card whose versioned fields changed with one
+        insert; returns the new version number by card id"""
+        try:
+            return await self._record_many(cards, user_id)
+        except Exception as e:
+            if "duplicate key" not in str(e) and "23505" not in str(e):
+                raise
+            # Another worker wrote the next version of a card first; rebuild the heads
+            for card in cards:
+                version_head_cache.discard(card.id)
+            return await self._record_many(cards, user_id)
+
+    async def record_quietly(self, cards: List[Card], user_id: str) -> None:
+        """record_many() for writes that must not fail because their history could not be written"""
+        if not cards:
+            return
+        try:
+            await self.record_many(cards, user_id)
+        except Exception as e:
+            logger.warning("Failed to record versions of cards %s: %s", ", ".join(card.id for card in cards), e)
+
+    async def _record_many(self, cards: List[Card], user_id: str) -> Dict[str, int]:
+        # The last document given for a card wins
+        documents = {card.id: version_document(card) for card in cards}
+        heads = {card_id: version_head_cache.get(card_id) for card_id in documents}
+        missing = [card_id for card_id, head in heads.items() if head is None]
+        if missing:
+            heads.update(await self._load_heads(missing))
+        
+        rows, new_heads = [], {}
+        for card_id, document in documents.items():
+            head = heads.get(card_id)
+            if head is None:
+                version_number, snapshot_version = 1, 1
+            elif head.document == document:
+                continue
+            else:
+                version_number = head.version_number + 1
+                snapshot_version = head.snapshot_version
+                if version_number - snapshot_version >= self.snapshot_interval:
+                    snapshot_version = version_number
+            
+            is_snapshot = snapshot_version == version_number
+            rows.append({
+                "card_id": card_id,
+                "version_number": version_number,
+                "snapshot_version": snapshot_version,
+                "kind": "snapshot" if is_snapshot else "delta",
+                "content": document if is_snapshot else make_patch(head.document, document),
+                "created_by": user_id
+            })
+            new_heads[card_id] = VersionHead(version_number, snapshot_version, document)
+        
+        if rows:
+            await execute(self.supabase.table("card_versions").insert(rows))
+        
+        for card_id, head in new_heads.items():
+            version_head_cache.set(card_id, head)
+        return {card_id: head.version_number for card_id, head in new_heads.items()}
+
+    async def _load_heads(self, card_ids: List[str]) -> Dict[str, VersionHead]:
+        # One read returns, per card, the rows from its latest snapshot to its head
+        response = await execute(
+            self.supabase.rpc("card_version_chains", {"p_card_ids": card_ids})
+        )
+        
+        chains: Dict[str, List[Dict[str, Any]]] = {}
+        for row in response.data or []:
+            chains.setdefault(row["card_id"], []).append(row)
+        
+        heads = {}
+        for card_id, rows in chains.items():
+            head = rows[-1]
+            document = self._replay(card_id, rows, head["version_number"])
+            heads[card_id] = VersionHead(head["version_number"], head["snapshot_version"], document)
+        return heads
+
+    async def _rebuild(self, card_id: str, snapshot_version: int, version_number: int) -> Dict[str, Any]:
+        response = await execute(
+            self.supabase.table("card_versions")
+            .select("version_number, kind, content")
+            .eq("card_id", card_id)
+            .gte("version_number", snapshot_version)
+            .lte("version_number", version_number)
+            .order("version_number")
+        )
+        return self._replay(card_id, response.data or [], version_number)
+
+    @staticmethod
+    def _replay(card_id: str, rows: List[Dict[str, Any]], version_number: int) -> Dict[str, Any]:
+        """Apply a snapshot row and the delta rows after it, in version order"""
+        if not rows or rows[0]["kind"] != "snapshot" or rows[-1]["version_number"] != version_number:
+            raise ValueError(f"Version history of card {card_id} is incomplete")
+        
+        document = snapshot_document(rows[0]["content"])
+        for row in rows[1:]:
+            document = apply_patch(document, row["content"])
+        return document
+
+    async def get_document(self, card_id: str, version_number: int) -> Optional[Dict[str, Any]]:
+        """Rebuild the versioned fields of one version"""
+        head = version_head_cache.get(card_id)
+        if head is not None and head.version_number == version_number:
+            return head.document
+        
+        response = await execute(
+            self.supabase.table("card_versions")
+            .select("snapshot_version")
+            .eq("card_id", card_id)
+            .eq("version_number", version_number)
+            .limit(1)
+        )
+        if not response.data:
+            return None
+        
+        return await self._rebuild(card_id, response.data[0]["snapshot_version"], version_number)
+
+    async def list_versions(self, card_id: str, limit: int = 50, offset: int = 0) -> List[CardVersion]:
+        response = await execute(
+            self.supabase.table("card_versions")
+            .select("version_number, kind, created_by, created_at, ai_generated")
+            .eq("card_id", card_id)
+            .order("version_number", desc=True)
+            .range(offset, offset + limit - 1)
+        )
+        return [CardVersion(**row) for row in response.data]
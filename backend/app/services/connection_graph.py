@@ -0,0 +1,212 @@
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import time
+
+from app.config import settings
+from app.services.snapshot_cache import Generations
+
+class TripGraph:
+    """Adjacency index of a trip's connections (from_card_id -> to_card_id)
+
+    Only cards that take part in at least one connection are nodes. Every
+    query is a single O(V + E) pass; parallel connections between the same
+    pair of cards count once.
+    """
+
+    def __init__(self, edges: Iterable[Tuple[str, str, str]] = ()):
+        self.expires_at = 0.0
+        self._edges: Dict[str, Tuple[str, str]] = {}
+        # card_id -> {neighbour_id: parallel connection count}, in insertion order
+        self._out: Dict[str, Dict[str, int]] = {}
+        self._in: Dict[str, Dict[str, int]] = {}
+        for connection_id, from_card_id, to_card_id in edges:
+            self.add_edge(connection_id, from_card_id, to_card_id)
+
+    @staticmethod
+    def _link(index: Dict[str, Dict[str, int]], a: str, b: str, delta: int) -> None:
+        neighbours = index.setdefault(a, {})
+        count = neighbours.get(b, 0) + delta
+        if count > 0:
+            neighbours[b] = count
+        else:
+            neighbours.pop(b, None)
+
+    def _drop_if_isolated(self, card_id: str) -> None:
+        if not self._out.get(card_id) and not self._in.get(card_id):
+            self._out.pop(card_id, None)
+            self._in.pop(card_id, None)
+
+    def add_edge(self, connection_id: str, from_card_id: str, to_card_id: str) -> None:
+        if connection_id in self._edges:
+            return
+        self._edges[connection_id] = (from_card_id, to_card_id)
+        self._link(self._out, from_card_id, to_card_id, 1)
+        self._link(self._in, to_card_id, from_card_id, 1)
+        self._out.setdefault(to_card_id, {})
+        self._in.setdefault(from_card_id, {})
+
+    def remove_edge(self, connection_id: str) -> None:
+        edge = self._edges.pop(connection_id, None)
+        if edge is None:
+            return
+        from_card_id, to_card_id = edge
+        self._link(self._out, from_card_id, to_card_id, -1)
+        self._link(self._in, to_card_id, from_card_id, -1)
+        self._drop_if_isolated(from_card_id)
+        self._drop_if_isolated(to_card_id)
+
+    def remove_card(self, card_id: str) -> None:
+        """Drop a deleted card's connections (the database cascades the same way)"""
+        for connection_id in [
+            connection_id for connection_id, edge in self._edges.items() if card_id in edge
+        ]:
+            self.remove_edge(connection_id)
+
+    @property
+    def card_ids(self) -> List[str]:
+        return list(self._out)
+
+    def topological_order(self) -> Tuple[List[str], List[str]]:
+        """Kahn's algorithm; returns (ordered cards, cards left on or behind a cycle)"""
+        in_degree = {card_id: len(sources) for card_id, sources in self._in.items()}
+        ready = deque(card_id for card_id in self._out if in_degree[card_id] == 0)
+        order = []
+        while ready:
+            card_id = ready.popleft()
+            order.append(card_id)
+            for target in self._out[card_id]:
+                in_degree[target] -= 1
+                if in_degree[target] == 0:
+                    ready.append(target)
+        
+        ordered = set(order)
+        return order, [card_id for card_id in self._out if card_id not in ordered]
+
+    def find_cycle(self) -> Optional[List[str]]:
+        """One directed cycle as [a, b, ..., a], or None"""
+        state: Dict[str, int] = {}  # 1 = on the DFS stack, 2 = done
+        for root in self._out:
+            if root in state:
+                continue
+            stack = [(root, iter(self._out[root]))]
+            path = [root]
+            state[root] = 1
+            while stack:
+                card_id, targets = stack[-1]
+                target = next(targets, None)
+                if target is None:
+                    stack.pop()
+                    path.pop()
+                    state[card_id] = 2
+                elif state.get(target) == 1:
+                    return path[path.index(target):] + [target]
+                elif target not in state:
+                    state[target] = 1
+                    path.append(target)
+                    stack.append((target, iter(self._out[target])))
+        return None
+
+    def reachable(self, card_id: str) -> List[str]:
+        """Cards reachable from card_id, in breadth-first order"""
+        seen: Set[str] = {card_id}
+        queue = deque([card_id])
+        result = []
+        while queue:
+            for target in self._out.get(queue.popleft(), ()):
+                if target not in seen:
+                    seen.add(target)
+                    result.append(target)
+                    queue.append(target)
+        return result
+
+    def shortest_path(self, from_card_id: str, to_card_id: str) -> Optional[List[str]]:
+        """Fewest-connections path as a list of card ids, or None"""
+        if from_card_id == to_card_id:
+            return [from_card_id]
+        previous: Dict[str, str] = {from_card_id: from_card_id}
+        queue = deque([from_card_id])
+        while queue:
+            card_id = queue.popleft()
+            for target in self._out.get(card_id, ()):
+                if target in previous:
+                    continue
+                previous[target] = card_id
+                if target == to_card_id:
+                    path = [target]
+                    while path[-1] != from_card_id:
+                        path.append(previous[path[-1]])
+                    return path[::-1]
+                queue.append(target)
+        return None
+
+class ConnectionGraphCache:
+    """Per-trip TripGraph, built once from the database and then kept up to
+    date by the services on every connection create / delete
+
+    The TTL bounds staleness for writes made by other workers.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_size: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._graphs: "OrderedDict[str, TripGraph]" = OrderedDict()
+        self._generations = Generations()
+
+    def get(self, trip_id: str) -> Optional[TripGraph]:
+        graph = self._graphs.get(trip_id)
+        if graph is None or graph.expires_at <= time.monotonic():
+            self._graphs.pop(trip_id, None)
+            self.misses += 1
+            return None
+        self._graphs.move_to_end(trip_id)
+        self.hits += 1
+        return graph
+
+    def generation(self, trip_id: str) -> int:
+        return self._generations.get(trip_id)
+
+    def put(self, trip_id: str, graph: TripGraph, generation: int) -> TripGraph:
+        graph.expires_at = time.monotonic() + self.ttl_seconds
+        # A mutation during the build may be missing from the fetched edges
+        if self.ttl_seconds > 0 and self.max_size > 0 and generation == self.generation(trip_id):
+            self._graphs[trip_id] = graph
+            self._graphs.move_to_end(trip_id)
+            while len(self._graphs) > self.max_size:
+                self._graphs.popitem(last=False)
+        return graph
+
+    def _touch(self, trip_id: str) -> Optional[TripGraph]:
+        self._generations.bump(trip_id)
+        return self._graphs.get(trip_id)
+
+    def add_connection(self, trip_id: str, connection_id: str, from_card_id: str, to_card_id: str) -> None:
+        graph = self._touch(trip_id)
+        if graph is not None:
+            graph.add_edge(connection_id, from_card_id, to_card_id)
+
+    def remove_connection(self, trip_id: str, connection_id: str) -> None:
+        graph = self._touch(trip_id)
+        if graph is not None:
+            graph.remove_edge(connection_id)
+
+    def remove_card(self, trip_id: str, card_id: str) -> None:
+        graph = self._touch(trip_id)
+        if graph is not None:
+            graph.remove_card(card_id)
+
+    def invalidate_trip(self, trip_id: str) -> None:
+        self._touch(trip_id)
+        self._graphs.pop(trip_id, None)
+
+    def clear(self) -> None:
+        self._graphs.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._graphs)}
+
+connection_graph_cache = ConnectionGraphCache(
+    ttl_seconds=settings.connection_graph_ttl_seconds,
+    max_size=settings.connection_graph_cache_size
+)
@@ -1,28 +1,28 @@
-from typing import List
-from supabase import Client
+from typing import TYPE_CHECKING, AsyncIterator, List
 from fastapi import HTTPException, status
 
-from app.models import Connection, ConnectionCreate, ConnectionUpdate
+if TYPE_CHECKING:
+    from supabase import Client
+
+from app.config import settings
+from app.database import execute, iter_rows
+from app.services.ownership_cache import verify_trip_ownership
+from app.services.snapshot_cache import CanvasSnapshot, canvas_snapshot_cache
+from app.services.canvas_hub import canvas_hub
+from app.services.connection_graph import TripGraph, connection_graph_cache
+from app.models import (
+    Connection, ConnectionList, ConnectionCreate, ConnectionUpdate,
+    ItineraryOrder, GraphCycle, CardReachability, CardPath
+)
 
 class ConnectionService:
-    def __init__(self, supabase: Client, user_id: str):
+    def __init__(self, supabase: "Client", user_id: str):
         self.supabase = supabase
         self.user_id = user_id
 
     async def _verify_trip_ownership(self, trip_id: str) -> bool:
         """Verify that the trip belongs to the current user"""
-        try:
-            response = (
-                self.supabase.table("trips")
-                .select("id")
-                .eq("id", trip_id)
-                .eq("user_id", self.user_id)
-                .single()
-                .execute()
-            )
-            return response.data is not None
-        except:
-            return False
+        return await verify_trip_ownership(self.supabase, self.user_id, trip_id)
 
     async def create_connection(self, connection_data: ConnectionCreate) -> Connection:
         """Create a new connection"""
@@ -38,7 +38,7 @@ class ConnectionService:
             connection_dict = connection_data.model_dump()
             
             # Create connection in Supabase (trigger will validate card ownership)
-            response = self.supabase.table("connections").insert(connection_dict).execute()
+            response = await execute(self.supabase.table("connections").insert(connection_dict))
             
             if not response.data:
                 raise HTTPException(
@@ -46,7 +46,14 @@ class ConnectionService:
                     detail="Failed to create connection"
                 )
             
-            return Connection(**response.data[0])
+            connection = Connection(**response.data[0])
+            canvas_snapshot_cache.invalidate_trip(connection.trip_id)
+            canvas_hub.publish(connection.trip_id, "connection.created", connection)
+            connection_graph_cache.add_connection(
+                connection.trip_id, connection.id, connection.from_card_id, connection.to_card_id
+            )
+            
+            return connection
             
         except HTTPException:
             raise
@@ -66,15 +73,14 @@ class ConnectionService:
                     detail="Access denied: Trip not found or not owned by user"
                 )
             
-            response = (
+            response = await execute(
                 self.supabase.table("connections")
                 .select("*")
                 .eq("trip_id", trip_id)
                 .order("created_at")
-                .execute()
             )
             
-            return [Connection(**conn) for conn in response.data]
+            return ConnectionList.validate_python(response.data)
             
         except HTTPException:
             raise
@@ -84,17 +90,46 @@ class ConnectionService:
                 detail=f"Failed to fetch connections: {str(e)}"
             )
 
+    async def get_trip_connections_snapshot(self, trip_id: str) -> CanvasSnapshot:
+        """Get the serialized connections of a trip from the snapshot cache"""
+        if not await self._verify_trip_ownership(trip_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Trip not found or not owned by user"
+            )
+        
+        return await canvas_snapshot_cache.get_or_build(
+            trip_id, "connections", lambda: self.get_trip_connections(trip_id)
+        )
+
+    async def stream_trip_connections(self, trip_id: str) -> AsyncIterator[Connection]:
+        """Verify ownership, then return an iterator paging through the trip's connections"""
+        if not await self._verify_trip_ownership(trip_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Trip not found or not owned by user"
+            )
+        
+        return self._iter_trip_connections(trip_id)
+
+    async def _iter_trip_connections(self, trip_id: str) -> AsyncIterator[Connection]:
+        rows = iter_rows(
+            lambda: self.supabase.table("connections").select("*").eq("trip_id", trip_id),
+            settings.stream_page_size
+        )
+        async for row in rows:
+            yield Connection(**row)
+
     async def get_connection_by_id(self, connection_id: str) -> Connection:
         """Get a specific connection by ID"""
         try:
             # Get connection with trip info to verify ownership
-            response = (
+            response = await execute(
                 self.supabase.table("connections")
                 .select("*, trips!inner(user_id)")
                 .eq("id", connection_id)
                 .eq("trips.user_id", self.user_id)
                 .single()
-                .execute()
             )
             
             if not response.data:
@@ -128,11 +163,10 @@ class ConnectionService:
                 )
             
             # Update with ownership verification via RLS
-            response = (
+            response = await execute(
                 self.supabase.table("connections")
                 .update(update_dict)
                 .eq("id", connection_id)
-                .execute()
             )
             
             if not response.data:
@@ -141,7 +175,11 @@ class ConnectionService:
                     detail="Connection not found or access denied"
                 )
             
-            return Connection(**response.data[0])
+            connection = Connection(**response.data[0])
+            canvas_snapshot_cache.invalidate_trip(connection.trip_id)
+            canvas_hub.publish(connection.trip_id, "connection.updated", {"id": connection.id, **update_dict})
+            
+            return connection
             
         except HTTPException:
             raise
@@ -155,11 +193,10 @@ class ConnectionService:
         """Delete a connection"""
         try:
             # Delete with ownership verification via RLS
-            response = (
+            response = await execute(
                 self.supabase.table("connections")
                 .delete()
                 .eq("id", connection_id)
-                .execute()
             )
             
             if not response.data:
@@ -168,6 +205,11 @@ class ConnectionService:
                     detail="Connection not found or access denied"
                 )
             
+            trip_id = response.data[0]["trip_id"]
+            canvas_snapshot_cache.invalidate_trip(trip_id)
+            canvas_hub.publish(trip_id, "connection.deleted", {"id": connection_id})
+            connection_graph_cache.remove_connection(trip_id, connection_id)
+            
             return True
             
         except HTTPException:
@@ -176,4 +218,72 @@ class ConnectionService:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to delete connection: {str(e)}"
-            )
\ No newline at end of file
+            )
+
+    async def get_trip_graph(self, trip_id: str) -> TripGraph:
+        """Get the trip's connection graph, building it on first use"""
+        try:
+            if not await self._verify_trip_ownership(trip_id):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Access denied: Trip not found or not owned by user"
+                )
+            
+            graph = connection_graph_cache.get(trip_id)
+            if graph is not None:
+                return graph
+            
+            generation = connection_graph_cache.generation(trip_id)
+            response = await execute(
+                self.supabase.table("connections")
+                .select("id, from_card_id, to_card_id")
+                .eq("trip_id", trip_id)
+                .order("created_at")
+            )
+            
+            graph = TripGraph(
+                (row["id"], row["from_card_id"], row["to_card_id"]) for row in response.data
+            )
+            return connection_graph_cache.put(trip_id, graph, generation)
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to load connection graph: {str(e)}"
+            )
+
+    async def get_itinerary_order(self, trip_id: str) -> ItineraryOrder:
+        """Topological order of the connected cards of a trip"""
+        graph = await self.get_trip_graph(trip_id)
+        order, unordered = graph.topological_order()
+        
+        return ItineraryOrder(
+            order=order,
+            unordered=unordered,
+            cycle=graph.find_cycle() if unordered else None
+        )
+
+    async def find_cycle(self, trip_id: str) -> GraphCycle:
+        """Find one cycle in the trip's connections, if any"""
+        graph = await self.get_trip_graph(trip_id)
+        cycle = graph.find_cycle()
+        
+        return GraphCycle(has_cycle=cycle is not None, cycle=cycle)
+
+    async def get_reachable_cards(self, trip_id: str, from_card_id: str) -> CardReachability:
+        """Cards reachable by following connections from a card"""
+        graph = await self.get_trip_graph(trip_id)
+        
+        return CardReachability(from_card_id=from_card_id, card_ids=graph.reachable(from_card_id))
+
+    async def get_shortest_path(self, trip_id: str, from_card_id: str, to_card_id: str) -> CardPath:
+        """Path with the fewest connections between two cards"""
+        graph = await self.get_trip_graph(trip_id)
+        
+        return CardPath(
+            from_card_id=from_card_id,
+            to_card_id=to_card_id,
+            path=graph.shortest_path(from_card_id, to_card_id)
+        )
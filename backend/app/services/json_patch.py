@@ -0,0 +1,65 @@
+from typing import Any, Dict, List
+import copy
+
+# Minimal RFC 6902 JSON Patch: diff produces add / remove / replace only;
+# lists of different lengths are replaced whole
+
+def _escape(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+def make_patch(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """Operations turning `old` into `new`"""
+    if type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+    
+    if isinstance(old, dict):
+        ops = []
+        for key, value in old.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in new:
+                ops.append({"op": "remove", "path": child})
+            elif value != new[key]:
+                ops.extend(make_patch(value, new[key], child))
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": value})
+        return ops
+    
+    if isinstance(old, list) and len(old) == len(new):
+        ops = []
+        for index, (a, b) in enumerate(zip(old, new)):
+            if a != b:
+                ops.extend(make_patch(a, b, f"{path}/{index}"))
+        return ops
+    
+    return [] if old == new else [{"op": "replace", "path": path, "value": new}]
+
+def apply_patch(document: Any, ops: List[Dict[str, Any]]) -> Any:
+    """Copy of `document` with the operations applied"""
+    document = copy.deepcopy(document)
+    for op in ops:
+        if op["path"] == "":
+            document = copy.deepcopy(op["value"])
+            continue
+        
+        *parents, last = [_unescape(token) for token in op["path"].split("/")[1:]]
+        target = document
+        for token in parents:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        
+        if isinstance(target, list):
+            if op["op"] == "add":
+                index = len(target) if last == "-" else int(last)
+                target.insert(index, copy.deepcopy(op["value"]))
+            elif op["op"] == "remove":
+                del target[int(last)]
+            else:
+                target[int(last)] = copy.deepcopy(op["value"])
+        elif op["op"] == "remove":
+            del target[last]
+        else:
+            target[last] = copy.deepcopy(op["value"])
+    return document
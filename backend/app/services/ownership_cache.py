@@ -0,0 +1,155 @@
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+import time
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+from app.admission import AdmissionRejected
+from app.config import settings
+from app.database import execute
+
+class TripOwnershipCache:
+    """TTL cache of confirmed (user_id, trip_id) ownership checks
+
+    Only positive results are cached, so a trip created on another worker is
+    never denied; entries are dropped when a trip is deleted.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, max_size: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+    def get(self, user_id: str, trip_id: str) -> bool:
+        key = (user_id, trip_id)
+        expires_at = self._entries.get(key)
+        if expires_at is None or expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return False
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def set(self, user_id: str, trip_id: str) -> None:
+        if self.ttl_seconds <= 0 or self.max_size <= 0:
+            return
+        key = (user_id, trip_id)
+        self._entries[key] = time.monotonic() + self.ttl_seconds
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate_trip(self, trip_id: str) -> None:
+        """Forget every cached owner of a trip (delete or ownership change)"""
+        for key in [key for key in self._entries if key[1] == trip_id]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+trip_ownership_cache = TripOwnershipCache(
+    ttl_seconds=settings.ownership_cache_ttl_seconds,
+    max_size=settings.ownership_cache_size
+)
+
+class CardTripCache:
+    """TTL cache of confirmed card_id -> trip_id memberships
+
+    A card never moves between trips, so only deletes make an entry stale;
+    callers that write by card id are scoped to the trip in the database too.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, max_size: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def get(self, card_id: str) -> Optional[str]:
+        entry = self._entries.get(card_id)
+        if entry is None or entry[1] <= time.monotonic():
+            self._entries.pop(card_id, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(card_id)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, card_id: str, trip_id: str) -> None:
+        if self.ttl_seconds <= 0 or self.max_size <= 0:
+            return
+        self._entries[card_id] = (trip_id, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(card_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, card_id: str) -> None:
+        self._entries.pop(card_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+card_trip_cache = CardTripCache(
+    ttl_seconds=settings.ownership_cache_ttl_seconds,
+    max_size=settings.ownership_cache_size
+)
+
+async def verify_trip_ownership(supabase: "Client", user_id: str, trip_id: str) -> bool:
+    """Verify that the trip belongs to the user, consulting the shared cache first"""
+    if trip_ownership_cache.get(user_id, trip_id):
+        return True
+
+    try:
+        response = await execute(
+            supabase.table("trips")
+            .select("id")
+            .eq("id", trip_id)
+            .eq("user_id", user_id)
+            .single()
+        )
+    except AdmissionRejected:
+        raise
+    except Exception:
+        return False
+
+    if response.data is None:
+        return False
+
+    trip_ownership_cache.set(user_id, trip_id)
+    return True
+
+
+async def verify_card_in_trip(supabase: "Client", trip_id: str, card_id: str) -> bool:
+    """Verify that a card belongs to a trip, consulting the shared cache first"""
+    cached = card_trip_cache.get(card_id)
+    if cached is not None:
+        return cached == trip_id
+
+    try:
+        response = await execute(
+            supabase.table("cards")
+            .select("trip_id")
+            .eq("id", card_id)
+            .limit(1)
+        )
+    except AdmissionRejected:
+        raise
+    except Exception:
+        return False
+
+    if not response.data:
+        return False
+
+    card_trip_cache.set(card_id, response.data[0]["trip_id"])
+    return response.data[0]["trip_id"] == trip_id
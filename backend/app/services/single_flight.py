@@ -0,0 +1,47 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+
+class SingleFlight:
+    """Share one in-flight call, and its result or error, between identical concurrent reads
+
+    Keys are tuples scoped by the caller, e.g. (trip_id, "trip_full", user_id),
+    so only reads that would run the same query for the same user are joined.
+    Writes call forget() with a key prefix so later reads do not join a
+    flight that started before the write. Results are shared objects: callers
+    must copy before mutating them.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.joined = 0
+        self._in_flight: Dict[Tuple[Hashable, ...], "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: Tuple[Hashable, ...], fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._in_flight.get(key)
+        if future is None:
+            self.calls += 1
+            # A separate task, so a cancelled caller does not fail the others;
+            # keys include the user, so it stays charged to the caller's limit
+            future = asyncio.ensure_future(fn())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.joined += 1
+        return await asyncio.shield(future)
+
+    def forget(self, prefix: Tuple[Hashable, ...]) -> None:
+        """Start a new flight for the next read of every key beginning with prefix"""
+        for key in [key for key in self._in_flight if key[:len(prefix)] == prefix]:
+            del self._in_flight[key]
+
+    def _finish(self, key: Tuple[Hashable, ...], future: "asyncio.Future[Any]") -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        # Mark the error retrieved even if every caller has gone away
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "joined": self.joined, "in_flight": len(self._in_flight)}
+
+read_flights = SingleFlight()
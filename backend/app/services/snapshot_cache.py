@@ -0,0 +1,124 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import hashlib
+import time
+
+from pydantic_core import to_json
+
+from app.config import settings
+from app.services.single_flight import read_flights
+
+@dataclass
+class CanvasSnapshot:
+    """Serialized payload of a canvas read together with its strong ETag"""
+    body: bytes
+    etag: str
+    expires_at: float
+    # MessagePack encoding of the same data, built on first request
+    msgpack_body: Optional[bytes] = None
+    # Compressed response bodies by (media type, Content-Encoding); a snapshot
+    # kind is only served by one route, so the envelope message is fixed
+    encoded: Dict[Tuple[str, str], bytes] = field(default_factory=dict)
+
+class Generations:
+    """Per-trip mutation counters, bounded to the most recently mutated trips
+
+    A build records generation() before reading and only caches its result
+    if the generation is unchanged afterwards. Values are never reused, and
+    forgotten trips report a floor raised past every evicted value, so an
+    eviction can only make a build skip caching, never cache stale data.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._counter = 0
+        self._floor = 0
+        self._values: "OrderedDict[str, int]" = OrderedDict()
+
+    def get(self, trip_id: str) -> int:
+        return self._values.get(trip_id, self._floor)
+
+    def bump(self, trip_id: str) -> None:
+        self._counter += 1
+        self._values[trip_id] = self._counter
+        self._values.move_to_end(trip_id)
+        while len(self._values) > self.max_size:
+            _, evicted = self._values.popitem(last=False)
+            self._floor = max(self._floor, evicted)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+class CanvasSnapshotCache:
+    """Per-trip cache of serialized canvas reads ("full", "cards", "connections")
+
+    Mutations in the services call invalidate_trip(), which also detaches
+    in-flight reads of the trip from later callers; the TTL bounds staleness
+    for writes made by other workers.
+    """
+
+    def __init__(self, ttl_seconds: float = 30, max_size: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], CanvasSnapshot]" = OrderedDict()
+        self._generations = Generations()
+
+    def get(self, trip_id: str, kind: str) -> Optional[CanvasSnapshot]:
+        key = (trip_id, kind)
+        snapshot = self._entries.get(key)
+        if snapshot is None or snapshot.expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return snapshot
+
+    def generation(self, trip_id: str) -> int:
+        return self._generations.get(trip_id)
+
+    def put(self, trip_id: str, kind: str, data: Any, generation: int) -> CanvasSnapshot:
+        body = to_json(data)
+        snapshot = CanvasSnapshot(
+            body=body,
+            etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+            expires_at=time.monotonic() + self.ttl_seconds
+        )
+        # Skip caching if the trip was mutated while this snapshot was built
+        if self.ttl_seconds > 0 and self.max_size > 0 and generation == self.generation(trip_id):
+            key = (trip_id, kind)
+            self._entries[key] = snapshot
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    async def get_or_build(
+        self, trip_id: str, kind: str, build: Callable[[], Awaitable[Any]]
+    ) -> CanvasSnapshot:
+        snapshot = self.get(trip_id, kind)
+        if snapshot is not None:
+            return snapshot
+        generation = self.generation(trip_id)
+        return self.put(trip_id, kind, await build(), generation)
+
+    def invalidate_trip(self, trip_id: str) -> None:
+        self._generations.bump(trip_id)
+        # Reads already in flight may predate the mutation
+        read_flights.forget((trip_id,))
+        for key in [key for key in self._entries if key[0] == trip_id]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+canvas_snapshot_cache = CanvasSnapshotCache(
+    ttl_seconds=settings.snapshot_cache_ttl_seconds,
+    max_size=settings.snapshot_cache_size
+)
@@ -1,12 +1,30 @@
-from typing import List, Optional
-from supabase import Client, create_client
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional, Tuple, Union
+from datetime import datetime, timedelta, timezone
+import asyncio
+import uuid
 from fastapi import HTTPException, status
 
-from app.models import Trip, TripCreate, TripUpdate, Card, Connection
+if TYPE_CHECKING:
+    from supabase import Client
+
+from app.admission import AdmissionRejected
+from app.database import execute, iter_rows
+from app.services.ownership_cache import trip_ownership_cache, verify_trip_ownership
+from app.services.snapshot_cache import CanvasSnapshot, canvas_snapshot_cache
+from app.services.cursors import encode_cursor, decode_cursor
+from app.services.write_buffer import position_write_buffer
+from app.services.canvas_hub import canvas_hub
+from app.services.canvas_tree import collapse_canvas
+from app.services.connection_graph import connection_graph_cache
+from app.services.single_flight import read_flights
+from app.models import (
+    Trip, TripList, TripCreate, TripUpdate, TripPage, Card, CardList,
+    Connection, ConnectionList, Tombstone, TripChanges, NodeTypeEnum
+)
 from app.config import settings
 
 class TripService:
-    def __init__(self, supabase: Client, user_id: str):
+    def __init__(self, supabase: "Client", user_id: str):
         self.supabase = supabase
         self.user_id = user_id
 
@@ -18,7 +36,7 @@ class TripService:
             trip_dict["user_id"] = self.user_id
             
             # Create trip in Supabase using service role (bypasses RLS)
-            response = self.supabase.table("trips").insert(trip_dict).execute()
+            response = await execute(self.supabase.table("trips").insert(trip_dict))
             
             if not response.data:
                 raise HTTPException(
@@ -26,8 +44,13 @@ class TripService:
                     detail="Failed to create trip"
                 )
             
-            return Trip(**response.data[0])
+            trip = Trip(**response.data[0])
+            trip_ownership_cache.set(self.user_id, trip.id)
+            
+            return trip
             
+        except AdmissionRejected:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -37,17 +60,76 @@ class TripService:
     async def get_user_trips(self, limit: int = 50, offset: int = 0) -> List[Trip]:
         """Get all trips for the current user"""
         try:
-            response = (
+            response = await execute(
                 self.supabase.table("trips")
                 .select("*")
                 .eq("user_id", self.user_id)
                 .order("updated_at", desc=True)
                 .range(offset, offset + limit - 1)
-                .execute()
             )
             
-            return [Trip(**trip) for trip in response.data]
+            return TripList.validate_python(response.data)
+            
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to fetch trips: {str(e)}"
+            )
+
+    async def get_user_trips_page(self, limit: int = 50, cursor: Optional[str] = None) -> TripPage:
+        """Get a page of the current user's trips using keyset pagination
+
+        Pages follow (updated_at DESC, id). updated_at changes on every edit,
+        so a trip edited while a client is paging moves to the front of the
+        list: it can be missed by the remaining pages or be seen twice.
+        """
+        try:
+            query = (
+                self.supabase.table("trips")
+                .select("*")
+                .eq("user_id", self.user_id)
+            )
+            
+            if cursor:
+                # The cursor is client input interpolated into the filter, so
+                # only a timestamp and a UUID are accepted
+                try:
+                    updated_at, trip_id = decode_cursor(cursor)
+                    updated_at = datetime.fromisoformat(updated_at).isoformat()
+                    trip_id = str(uuid.UUID(trip_id))
+                except (ValueError, TypeError, AttributeError):
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Invalid pagination cursor"
+                    )
+                # Rows after (updated_at, id) in (updated_at DESC, id ASC) order
+                query = query.or_(
+                    f'updated_at.lt."{updated_at}",'
+                    f'and(updated_at.eq."{updated_at}",id.gt.{trip_id})'
+                )
+            
+            # One extra row tells us whether another page exists
+            response = await execute(
+                query
+                .order("updated_at", desc=True)
+                .order("id")
+                .limit(limit + 1)
+            )
+            
+            rows = response.data[:limit]
+            next_cursor = None
+            if len(response.data) > limit:
+                next_cursor = encode_cursor(rows[-1]["updated_at"], rows[-1]["id"])
+            
+            return TripPage(
+                items=TripList.validate_python(rows),
+                next_cursor=next_cursor
+            )
             
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -57,13 +139,12 @@ class TripService:
     async def get_trip_by_id(self, trip_id: str) -> Trip:
         """Get a specific trip by ID"""
         try:
-            response = (
+            response = await execute(
                 self.supabase.table("trips")
                 .select("*")
                 .eq("id", trip_id)
                 .eq("user_id", self.user_id)
                 .single()
-                .execute()
             )
             
             if not response.data:
@@ -72,8 +153,12 @@ class TripService:
                     detail="Trip not found"
                 )
             
+            trip_ownership_cache.set(self.user_id, trip_id)
+            
             return Trip(**response.data)
             
+        except AdmissionRejected:
+            raise
         except Exception as e:
             if "not found" in str(e).lower():
                 raise HTTPException(
@@ -97,12 +182,11 @@ class TripService:
                     detail="No valid fields to update"
                 )
             
-            response = (
+            response = await execute(
                 self.supabase.table("trips")
                 .update(update_dict)
                 .eq("id", trip_id)
                 .eq("user_id", self.user_id)
-                .execute()
             )
             
             if not response.data:
@@ -111,8 +195,13 @@ class TripService:
                     detail="Trip not found"
                 )
             
+            canvas_snapshot_cache.invalidate_trip(trip_id)
+            canvas_hub.publish(trip_id, "trip.updated", {"id": trip_id, **update_dict})
+            
             return Trip(**response.data[0])
             
+        except AdmissionRejected:
+            raise
         except Exception as e:
             if "not found" in str(e).lower():
                 raise HTTPException(
@@ -127,12 +216,11 @@ class TripService:
     async def delete_trip(self, trip_id: str) -> bool:
         """Delete a trip"""
         try:
-            response = (
+            response = await execute(
                 self.supabase.table("trips")
                 .delete()
                 .eq("id", trip_id)
                 .eq("user_id", self.user_id)
-                .execute()
             )
             
             if not response.data:
@@ -141,8 +229,15 @@ class TripService:
                     detail="Trip not found"
                 )
             
+            trip_ownership_cache.invalidate_trip(trip_id)
+            canvas_snapshot_cache.invalidate_trip(trip_id)
+            connection_graph_cache.invalidate_trip(trip_id)
+            canvas_hub.publish(trip_id, "trip.deleted", {"id": trip_id})
+            
             return True
             
+        except AdmissionRejected:
+            raise
         except Exception as e:
             if "not found" in str(e).lower():
                 raise HTTPException(
@@ -156,32 +251,48 @@ class TripService:
 
     async def get_trip_full_data(self, trip_id: str) -> dict:
         """Get trip with all related cards and connections"""
+        return await read_flights.do(
+            (trip_id, "trip_full", self.user_id), lambda: self._fetch_trip_full_data(trip_id)
+        )
+
+    async def _fetch_trip_full_data(self, trip_id: str) -> dict:
         try:
-            # Verify trip ownership
-            trip = await self.get_trip_by_id(trip_id)
-            
-            # Get cards
-            cards_response = (
-                self.supabase.table("cards")
-                .select("*")
-                .eq("trip_id", trip_id)
-                .order("created_at")
-                .execute()
+            # One embedded select: ownership check, trip, cards and connections
+            # in a single round trip. The FK hints keep PostgREST from treating
+            # connections as a trips<->cards junction table.
+            response = await execute(
+                self.supabase.table("trips")
+                .select(
+                    "*, "
+                    "cards:cards!cards_trip_id_fkey(*), "
+                    "connections:connections!connections_trip_id_fkey(*)"
+                )
+                .eq("id", trip_id)
+                .eq("user_id", self.user_id)
+                .order("created_at", foreign_table="cards")
+                .order("created_at", foreign_table="connections")
+                .limit(1)
             )
             
-            # Get connections  
-            connections_response = (
-                self.supabase.table("connections")
-                .select("*")
-                .eq("trip_id", trip_id)
-                .order("created_at")
-                .execute()
-            )
+            if not response.data:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Trip not found"
+                )
+            
+            trip_ownership_cache.set(self.user_id, trip_id)
+            
+            trip_data = dict(response.data[0])
+            cards = trip_data.pop("cards", None) or []
+            connections = trip_data.pop("connections", None) or []
+            
+            cards = CardList.validate_python(cards)
+            position_write_buffer.apply(cards)
             
             return {
-                "trip": trip,
-                "cards": [Card(**card) for card in cards_response.data],
-                "connections": [Connection(**conn) for conn in connections_response.data]
+                "trip": Trip(**trip_data),
+                "cards": cards,
+                "connections": ConnectionList.validate_python(connections)
             }
             
         except HTTPException:
@@ -192,37 +303,178 @@ class TripService:
                 detail=f"Failed to fetch trip data: {str(e)}"
             )
 
+    async def get_trip_full_snapshot(self, trip_id: str) -> CanvasSnapshot:
+        """Get the serialized trip, cards and connections from the snapshot cache"""
+        if not await verify_trip_ownership(self.supabase, self.user_id, trip_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Trip not found"
+            )
+        
+        return await canvas_snapshot_cache.get_or_build(
+            trip_id, "full", lambda: self.get_trip_full_data(trip_id)
+        )
+
+    async def get_trip_canvas_snapshot(self, trip_id: str, depth: int) -> CanvasSnapshot:
+        """Like get_trip_full_snapshot, with nested canvases collapsed below `depth`"""
+        if not await verify_trip_ownership(self.supabase, self.user_id, trip_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Trip not found"
+            )
+        
+        async def build() -> dict:
+            data = await self.get_trip_full_data(trip_id)
+            # The fetched cards may be shared with concurrent readers; copy before collapsing
+            cards = [
+                card.model_copy(update={"content": collapse_canvas(card.content, depth)})
+                if card.type == NodeTypeEnum.nestedCanvas else card
+                for card in data["cards"]
+            ]
+            return {**data, "cards": cards}
+        
+        return await canvas_snapshot_cache.get_or_build(trip_id, f"full:depth={depth}", build)
+
+    async def stream_trip_full_data(self, trip_id: str) -> AsyncIterator[Tuple[str, Union[Trip, Card, Connection]]]:
+        """Fetch the trip, then return an iterator of ("trip" | "card" | "connection", record)"""
+        trip = await self.get_trip_by_id(trip_id)
+        return self._iter_trip_full_data(trip)
+
+    async def _iter_trip_full_data(self, trip: Trip) -> AsyncIterator[Tuple[str, Union[Trip, Card, Connection]]]:
+        yield "trip", trip
+        
+        cards = iter_rows(
+            lambda: self.supabase.table("cards").select("*").eq("trip_id", trip.id),
+            settings.stream_page_size
+        )
+        async for row in cards:
+            card = Card(**row)
+            position_write_buffer.apply([card])
+            yield "card", card
+        
+        connections = iter_rows(
+            lambda: self.supabase.table("connections").select("*").eq("trip_id", trip.id),
+            settings.stream_page_size
+        )
+        async for row in connections:
+            yield "connection", Connection(**row)
+
+    async def get_trip_changes(self, trip_id: str, since: Optional[str] = None) -> TripChanges:
+        """Get cards and connections created, updated or deleted after a sync cursor"""
+        try:
+            if not await verify_trip_ownership(self.supabase, self.user_id, trip_id):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Trip not found"
+                )
+            
+            since_at = None
+            if since:
+                try:
+                    since_at = datetime.fromisoformat(decode_cursor(since)[0])
+                except (ValueError, IndexError, TypeError):
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Invalid sync cursor"
+                    )
+            
+            cards_query = self.supabase.table("cards").select("*").eq("trip_id", trip_id)
+            connections_query = self.supabase.table("connections").select("*").eq("trip_id", trip_id)
+            
+            # Without a cursor this is a bootstrap: current rows, no tombstones.
+            # updated_at is stamped when a transaction starts, not when it
+            # commits, so a slow write can land behind the cursor: re-read a
+            # safety window before it. Clients apply changes by id, so the
+            # rows repeated from the window are harmless.
+            if since_at:
+                read_from = (since_at - timedelta(seconds=settings.sync_safety_window_seconds)).isoformat()
+                cards_query = cards_query.gte("updated_at", read_from)
+                connections_query = connections_query.gte("updated_at", read_from)
+            
+            queries = [
+                execute(cards_query.order("updated_at")),
+                execute(connections_query.order("updated_at"))
+            ]
+            if since_at:
+                queries.append(execute(
+                    self.supabase.table("tombstones")
+                    .select("id, record_type, deleted_at")
+                    .eq("trip_id", trip_id)
+                    .gte("deleted_at", read_from)
+                    .order("deleted_at")
+                ))
+            
+            responses = await asyncio.gather(*queries)
+            
+            cards = CardList.validate_python(responses[0].data)
+            position_write_buffer.apply(cards)
+            connections = ConnectionList.validate_python(responses[1].data)
+            live_ids = {card.id for card in cards} | {conn.id for conn in connections}
+            # A record that exists now was re-created after its deletion
+            deleted = [
+                Tombstone(**row) for row in (responses[2].data if since_at else [])
+                if row["id"] not in live_ids
+            ]
+            
+            # The next cursor is the newest change seen; the next sync reads
+            # from the safety window before it
+            seen = [card.updated_at for card in cards]
+            seen += [conn.updated_at or conn.created_at for conn in connections]
+            seen += [tombstone.deleted_at for tombstone in deleted]
+            cursor_at = max(seen, default=since_at or datetime.fromtimestamp(0, timezone.utc))
+            
+            return TripChanges(
+                cards=cards,
+                connections=connections,
+                deleted=deleted,
+                cursor=encode_cursor(cursor_at.isoformat())
+            )
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to fetch trip changes: {str(e)}"
+            )
+
     async def duplicate_trip(self, trip_id: str, new_title: Optional[str] = None) -> Trip:
         """Duplicate a trip with all its cards and connections"""
         try:
-            # Get original trip data
-            original_data = await self.get_trip_full_data(trip_id)
-            original_trip = original_data["trip"]
-            
-            # Create new trip
-            new_trip_data = TripCreate(
-                title=new_title or f"{original_trip.title} (Copy)",
-                description=original_trip.description,
-                destination=original_trip.destination,
-                start_date=original_trip.start_date,
-                end_date=original_trip.end_date,
-                budget=original_trip.budget,
-                currency=original_trip.currency,
-                visibility=original_trip.visibility,
-                settings=original_trip.settings,
-                metadata=original_trip.metadata
+            # Deep copy runs in one database function (and transaction), see
+            # sql/08_create_duplicate_trip_function.sql
+            response = await execute(
+                self.supabase.rpc(
+                    "duplicate_trip",
+                    {
+                        "p_trip_id": trip_id,
+                        "p_user_id": self.user_id,
+                        "p_new_title": new_title
+                    }
+                )
             )
             
-            new_trip = await self.create_trip(new_trip_data)
+            trip_data = response.data[0] if isinstance(response.data, list) else response.data
+            
+            if not trip_data:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Failed to duplicate trip"
+                )
             
-            # TODO: Copy cards and connections in a transaction
-            # This would require implementing card and connection services
+            new_trip = Trip(**trip_data)
+            trip_ownership_cache.set(self.user_id, new_trip.id)
             
             return new_trip
             
         except HTTPException:
             raise
         except Exception as e:
+            if "not found" in str(e).lower():
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Trip not found"
+                )
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to duplicate trip: {str(e)}"
@@ -0,0 +1,234 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import logging
+
+from app.admission import unbound_context
+from app.config import settings
+from app.database import execute, get_supabase_admin
+from app.services.snapshot_cache import canvas_snapshot_cache
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE raised by bulk_update_card_positions when a card is not in the trip
+CARD_NOT_FOUND = "P0002"
+
+class PositionWriteBuffer:
+    """Coalescing buffer for card position updates sent while dragging
+
+    Only the latest position per card is kept. Pending positions are written
+    with one bulk_update_card_positions call per trip, every flush interval or
+    as soon as the buffer fills, and once more on shutdown. Failed writes stay
+    buffered and are retried with exponential backoff.
+    """
+
+    def __init__(self, flush_interval: float = 0.25, max_pending: int = 500, max_retry_delay: float = 5):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retry_delay = max_retry_delay
+        self.flushed_writes = 0
+        self.coalesced_writes = 0
+        self.dropped_writes = 0
+        self.failed_flushes = 0
+        self._pending: Dict[str, Tuple[str, Dict[str, float]]] = {}
+        self._inflight: Dict[str, Tuple[str, Dict[str, float]]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+
+    def add(self, trip_id: str, card_id: str, position: Dict[str, float]) -> None:
+        if card_id in self._pending:
+            self.coalesced_writes += 1
+        self._pending[card_id] = (trip_id, position)
+        if len(self._pending) >= self.max_pending and self._flush_task is None and self._may_flush():
+            # The flush writes every user's positions; do not charge it to this one
+            self._flush_task = unbound_context().run(asyncio.ensure_future, self.flush())
+            self._flush_task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: asyncio.Task) -> None:
+        self._flush_task = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Position write buffer flush failed", exc_info=task.exception())
+
+    def get_position(self, card_id: str, trip_id: str) -> Optional[Dict[str, float]]:
+        """Latest buffered position for a card of the trip that is not yet in the database"""
+        entry = self._pending.get(card_id) or self._inflight.get(card_id)
+        return entry[1] if entry and entry[0] == trip_id else None
+
+    def trip_positions(self, trip_id: str) -> Dict[str, Dict[str, float]]:
+        """Buffered positions of a trip's cards, by card id"""
+        positions = {
+            card_id: position for card_id, (card_trip_id, position) in self._inflight.items()
+            if card_trip_id == trip_id
+        }
+        positions.update(
+            (card_id, position) for card_id, (card_trip_id, position) in self._pending.items()
+            if card_trip_id == trip_id
+        )
+        return positions
+
+    def apply(self, cards: Iterable) -> None:
+        """Overlay buffered positions onto cards read from the database"""
+        if not self._pending and not self._inflight:
+            return
+        for card in cards:
+            position = self.get_position(card.id, card.trip_id)
+            if position is not None:
+                card.position = position
+
+    def discard(self, card_id: str) -> None:
+        """Drop a buffered position superseded by a direct update or delete"""
+        self._pending.pop(card_id, None)
+        # A flush in progress skips cards no longer in the in-flight set
+        self._inflight.pop(card_id, None)
+
+    def take(self, card_ids: Iterable[str]) -> Dict[str, Tuple[str, Dict[str, float]]]:
+        """Remove and return buffered positions about to be superseded by a direct write"""
+        taken = {}
+        for card_id in card_ids:
+            entry = self._pending.pop(card_id, None) or self._inflight.get(card_id)
+            self._inflight.pop(card_id, None)
+            if entry is not None:
+                taken[card_id] = entry
+        return taken
+
+    def restore(self, taken: Dict[str, Tuple[str, Dict[str, float]]]) -> None:
+        """Put back positions taken for a direct write that failed, unless newer ones arrived"""
+        for card_id, entry in taken.items():
+            self._pending.setdefault(card_id, entry)
+
+    def _may_flush(self) -> bool:
+        return asyncio.get_running_loop().time() >= self._retry_at
+
+    def _back_off(self) -> None:
+        self.failed_flushes += 1
+        self._retry_delay = min(max(self._retry_delay * 2, self.flush_interval), self.max_retry_delay)
+        self._retry_at = asyncio.get_running_loop().time() + self._retry_delay
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._inflight, self._pending = self._pending, {}
+
+            by_trip = defaultdict(list)
+            for card_id, (trip_id, _) in self._inflight.items():
+                by_trip[trip_id].append(card_id)
+
+            try:
+                for trip_id, card_ids in by_trip.items():
+                    positions = [
+                        {"id": card_id, "position": self._inflight[card_id][1]}
+                        for card_id in card_ids
+                        if card_id in self._inflight
+                    ]
+                    if positions and not await self._write(trip_id, positions):
+                        if self._retry_delay:
+                            break
+                        continue
+                    for card_id in card_ids:
+                        self._inflight.pop(card_id, None)
+                    canvas_snapshot_cache.invalidate_trip(trip_id)
+            finally:
+                # Whatever was not written (failed, backed off or cancelled)
+                # goes back to the buffer, unless a newer position arrived
+                for card_id, entry in self._inflight.items():
+                    self._pending.setdefault(card_id, entry)
+                self._inflight = {}
+
+    async def _write(self, trip_id: str, positions: List[Dict[str, Any]]) -> bool:
+        """Write one trip's positions; False leaves them to be retried"""
+        supabase = get_supabase_admin()
+        try:
+            await execute(supabase.rpc(
+                "bulk_update_card_positions",
+                {"p_trip_id": trip_id, "p_positions": positions}
+            ))
+        except Exception as e:
+            if getattr(e, "code", None) != CARD_NOT_FOUND:
+                # Transient (timeout, shed by admission control, connection
+                # error): keep the positions and retry after a backoff
+                self._back_off()
+                logger.warning(
+                    "Position flush for trip %s failed, retrying in %.2fs: %s", trip_id, self._retry_delay, e
+                )
+                return False
+            await self._drop_missing(trip_id, positions)
+            return False
+
+        self.flushed_writes += len(positions)
+        self._retry_delay = 0.0
+        return True
+
+    async def _drop_missing(self, trip_id: str, positions: List[Dict[str, Any]]) -> None:
+        # The batch is all-or-nothing; find the cards deleted since they were
+        # buffered with one query and drop only those, the rest are retried
+        ids = [position["id"] for position in positions]
+        try:
+            response = await execute(
+                get_supabase_admin().table("cards")
+                .select("id")
+                .eq("trip_id", trip_id)
+                .in_("id", ids)
+            )
+        except Exception as e:
+            self._back_off()
+            logger.warning("Position flush for trip %s failed, retrying in %.2fs: %s", trip_id, self._retry_delay, e)
+            return
+
+        existing = {row["id"] for row in response.data}
+        missing = [card_id for card_id in ids if card_id not in existing]
+        for card_id in missing:
+            logger.warning("Dropping buffered position for missing card %s", card_id)
+            self._inflight.pop(card_id, None)
+            self.dropped_writes += 1
+        if missing:
+            # Reads of the trip overlaid the dropped positions
+            canvas_snapshot_cache.invalidate_trip(trip_id)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if not self._may_flush():
+                continue
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Position write buffer flush failed")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write everything still pending"""
+        # A cancelled flush puts its unwritten positions back into the buffer
+        for task in (self._task, self._flush_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._flush_task = None
+        await self.flush()
+        if self._pending:
+            logger.error("Dropping %d buffered positions that could not be written on shutdown", len(self._pending))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "flushed_writes": self.flushed_writes,
+            "coalesced_writes": self.coalesced_writes,
+            "dropped_writes": self.dropped_writes,
+            "failed_flushes": self.failed_flushes
+        }
+
+position_write_buffer = PositionWriteBuffer(
+    flush_interval=settings.write_buffer_flush_interval_ms / 1000,
+    max_pending=settings.write_buffer_max_pending,
+    max_retry_delay=settings.write_buffer_max_retry_delay_ms / 1000
+)
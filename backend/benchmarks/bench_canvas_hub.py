@@ -0,0 +1,62 @@
+"""Fan-out throughput of the in-process canvas hub.
+
+Publishes card updates to one trip with N subscribed sessions, each drained
+by a consumer task standing in for its WebSocket, and reports published
+messages/s and delivered messages/s per subscriber count.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_canvas_hub --messages 20000 --subscribers 1 10 100
+"""
+import argparse
+import asyncio
+import time
+
+from app.services.canvas_hub import CanvasHub
+
+
+async def drain(subscriber, counts, index: int) -> None:
+    while True:
+        await subscriber.queue.get()
+        counts[index] += 1
+
+
+async def run(subscribers: int, messages: int, max_queue: int):
+    hub = CanvasHub(max_queue=max_queue)
+    counts = [0] * subscribers
+    sessions = [hub.subscribe("trip", f"user-{i}") for i in range(subscribers)]
+    consumers = [asyncio.create_task(drain(s, counts, i)) for i, s in enumerate(sessions)]
+
+    payload = {"id": "card", "position": {"x": 0.0, "y": 0.0}}
+    start = time.perf_counter()
+    for i in range(messages):
+        payload["position"]["x"] = float(i)
+        hub.publish("trip", "card.moved", payload)
+        # Yield regularly so consumers keep up, as the event loop would
+        if i % 64 == 0:
+            await asyncio.sleep(0)
+    while any(not s.queue.empty() for s in sessions):
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+
+    for consumer in consumers:
+        consumer.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+    dropped = sum(s.dropped for s in sessions)
+    return messages / elapsed, sum(counts) / elapsed, dropped
+
+
+async def main(args) -> None:
+    print(f"messages={args.messages} max_queue={args.max_queue}")
+    print(f"{'subscribers':>11} {'published/s':>12} {'delivered/s':>12} {'dropped':>8}")
+    for subscribers in args.subscribers:
+        published, delivered, dropped = await run(subscribers, args.messages, args.max_queue)
+        print(f"{subscribers:>11} {published:>12.0f} {delivered:>12.0f} {dropped:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--max-queue", type=int, default=256)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 100, 500])
+    asyncio.run(main(parser.parse_args()))
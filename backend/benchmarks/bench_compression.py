@@ -0,0 +1,143 @@
+"""Bytes on the wire and encode cost of canvas responses per encoding.
+
+Builds the /trips/{trip_id}/full body for synthetic trips shaped like real
+ones (varied titles and descriptions, uuids, float positions, timestamps)
+and reports, for JSON and MessagePack bodies under each Content-Encoding the
+middleware can negotiate, the response size and the best-of-N encode time.
+The MessagePack time includes decoding the cached JSON snapshot, as
+``snapshot_response`` does on the first MessagePack request. Cached snapshots
+pay the compress cost once; other responses pay it on every request.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_compression --cards 100 500 2000
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pydantic_core import from_json, to_json
+
+from app.compression import available_encodings, compress
+from app.config import settings
+from app.models import CardList, ConnectionList, Trip
+from app.responses import msgpack
+
+WORDS = (
+    "museum morning walk old town river view lunch dinner tickets booked tram station "
+    "gallery castle market local food sunset beach hike trail guide check opening hours "
+    "reserve table near hotel coffee breakfast bridge square church garden palace tour"
+).split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_trip(cards: int, connections: int, rng: random.Random) -> dict:
+    trip_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def stamp() -> str:
+        return (start + timedelta(seconds=rng.randint(0, 90 * 86400), microseconds=rng.randint(0, 999999))).isoformat()
+
+    trip = {
+        "id": trip_id, "user_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        "title": "Summer in Italy", "destination": "Roma", "currency": "EUR", "visibility": "private",
+        "settings": {}, "metadata": {}, "created_at": stamp(), "updated_at": stamp(),
+    }
+    card_rows = [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "trip_id": trip_id,
+            "type": rng.choice(["destination", "activity", "restaurant", "note"]),
+            "title": sentence(rng, rng.randint(2, 5))[:-1],
+            "content": {
+                "description": sentence(rng, rng.randint(5, 60)),
+                "tags": rng.sample(WORDS, rng.randint(0, 4)),
+                "price": round(rng.uniform(0, 200), 2),
+            },
+            "position": {"x": rng.uniform(0, 5000), "y": rng.uniform(0, 5000)},
+            "style": {"color": rng.choice(["#ffffff", "#fde68a", "#bfdbfe", "#bbf7d0"])},
+            "created_at": stamp(),
+            "updated_at": stamp(),
+        }
+        for _ in range(cards)
+    ]
+    connection_rows = [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "trip_id": trip_id,
+            "from_card_id": a["id"],
+            "to_card_id": b["id"],
+            "type": "default",
+            "metadata": {},
+            "created_at": stamp(),
+            "updated_at": stamp(),
+        }
+        for a, b in (rng.sample(card_rows, 2) for _ in range(connections if cards > 1 else 0))
+    ]
+    return {
+        "trip": Trip(**trip),
+        "cards": CardList.validate_python(card_rows),
+        "connections": ConnectionList.validate_python(connection_rows),
+    }
+
+
+def json_body(data: dict) -> bytes:
+    return b'{"success":true,"message":"Trip data retrieved successfully","data":' + to_json(data) + b'}'
+
+
+def msgpack_body(snapshot_body: bytes) -> bytes:
+    return msgpack.packb({
+        "success": True, "message": "Trip data retrieved successfully", "data": from_json(snapshot_body)
+    })
+
+
+def encode(body: bytes, encoding: str) -> bytes:
+    return body if encoding == "identity" else compress(body, encoding)
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(args) -> None:
+    encodings = ["identity"] + available_encodings()[::-1]
+    formats = ["json"] + (["msgpack"] if msgpack is not None else [])
+    print(
+        f"gzip level={settings.compression_gzip_level} brotli quality={settings.compression_brotli_quality} "
+        f"zstd level={settings.compression_zstd_level} (best of {args.repeat})"
+    )
+    print(f"{'cards':>6} {'format':>8} {'encoding':>9} {'bytes':>10} {'ratio':>6} {'encode ms':>10} {'compress ms':>12}")
+    for cards in args.cards:
+        data = make_trip(cards, int(cards * args.connection_ratio), random.Random(args.seed))
+        snapshot_body = to_json(data)
+        baseline = len(json_body(data))
+        for name in formats:
+            if name == "json":
+                encode_seconds, body = timed(lambda: json_body(data), args.repeat)
+            else:
+                encode_seconds, body = timed(lambda: msgpack_body(snapshot_body), args.repeat)
+            for encoding in encodings:
+                compress_seconds, wire = timed(lambda: encode(body, encoding), args.repeat)
+                print(
+                    f"{cards:>6} {name:>8} {encoding:>9} {len(wire):>10} {len(wire) / baseline:>6.2f} "
+                    f"{encode_seconds * 1000:>10.2f} {compress_seconds * 1000:>12.2f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--connection-ratio", type=float, default=0.75)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
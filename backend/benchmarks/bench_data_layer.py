@@ -0,0 +1,68 @@
+"""Throughput of the service data layer as request concurrency grows.
+
+Compares the old pattern (calling the blocking ``.execute()`` inside an
+``async def``) with ``app.database.execute``, using a fake query builder that
+blocks for a fixed PostgREST round trip.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_data_layer --latency-ms 20 --queries 3
+"""
+import argparse
+import asyncio
+import time
+
+from app.database import execute
+
+
+class FakeQuery:
+    """Stands in for a supabase-py request builder with a blocking execute()"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def execute(self):
+        time.sleep(self.latency)
+        return None
+
+
+async def blocking_request(latency: float, queries: int) -> None:
+    for _ in range(queries):
+        FakeQuery(latency).execute()
+
+
+async def offloaded_request(latency: float, queries: int) -> None:
+    for _ in range(queries):
+        await execute(FakeQuery(latency))
+
+
+async def measure(handler, concurrency: int, requests: int, latency: float, queries: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler(latency, queries)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+async def main(args) -> None:
+    latency = args.latency_ms / 1000
+    print(f"latency={args.latency_ms}ms queries/request={args.queries}")
+    print(f"{'concurrency':>11} {'before req/s':>13} {'after req/s':>12} {'speedup':>8}")
+    for concurrency in args.concurrency:
+        requests = max(concurrency * args.rounds, args.rounds)
+        before = await measure(blocking_request, concurrency, requests, latency, args.queries)
+        after = await measure(offloaded_request, concurrency, requests, latency, args.queries)
+        print(f"{concurrency:>11} {before:>13.1f} {after:>12.1f} {after / before:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--queries", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32, 64])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,77 @@
+"""Serialization cost of a large canvas response.
+
+Compares the default path (per-row Card(**row), ResponseModel wrapping,
+response_model validation, jsonable_encoder, json.dumps) with the fast path
+(CardList adapter + FastJSONResponse) for a synthetic canvas.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_serialization --cards 5000
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from app.models import Card, CardList, ResponseModel
+from app.responses import success_response
+
+
+def make_rows(count: int):
+    return [
+        {
+            "id": f"00000000-0000-4000-8000-{i:012d}",
+            "trip_id": "00000000-0000-4000-8000-000000000000",
+            "type": "activity",
+            "title": f"Card {i}",
+            "content": {"description": "x" * 200, "tags": ["museum", "morning"], "price": 12.5},
+            "position": {"x": i * 1.5, "y": i * 2.0},
+            "style": {"color": "#ffffff"},
+            "created_at": "2025-01-01T00:00:00.123456+00:00",
+            "updated_at": "2025-01-01T00:00:00.123456+00:00",
+        }
+        for i in range(count)
+    ]
+
+
+def default_path(rows) -> bytes:
+    cards = [Card(**row) for row in rows]
+    response = ResponseModel(success=True, message="Cards retrieved successfully", data=cards)
+    # What FastAPI does with response_model=ResponseModel
+    content = response.model_dump()
+    ResponseModel.model_validate(content)
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False).encode()
+
+
+def fast_path(rows) -> bytes:
+    cards = CardList.validate_python(rows)
+    return success_response(message="Cards retrieved successfully", data=cards).body
+
+
+def timed(fn, rows, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(rows)
+        best = min(best, time.perf_counter() - start)
+    return best, len(body)
+
+
+def main(args) -> None:
+    rows = make_rows(args.cards)
+    print(f"cards={args.cards} (best of {args.repeat})")
+    print(f"{'path':>8} {'ms':>9} {'bytes':>10}")
+    results = {}
+    for name, fn in [("default", default_path), ("fast", fast_path)]:
+        seconds, size = timed(fn, rows, args.repeat)
+        results[name] = seconds
+        print(f"{name:>8} {seconds * 1000:>9.1f} {size:>10}")
+    print(f"speedup {results['default'] / results['fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,134 @@
+"""Cold-start cost of the API: import time and time to first response.
+
+Each run starts a fresh interpreter, so nothing is warm but the OS page
+cache. Reports, as the median over --runs:
+
+* import: ``import app.main`` in a new process (the app is built, no server)
+* first /health: from spawning uvicorn to the first 200 from /health
+* first query: from spawning uvicorn to the first 200 from an authenticated
+  trip listing against the local Supabase stand-in, which includes building
+  the Supabase clients on first use
+
+Exits 1 when a median is over its --max-*-ms budget, so CI can catch
+regressions. Run from ``backend/``:
+
+    python -m benchmarks.bench_startup --runs 5 --max-import-ms 800
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+from jose import jwt
+
+from benchmarks.fake_supabase import USER_ID
+from benchmarks.loadtest import BACKEND_DIR, JWT_SECRET, api_key, free_port
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def app_env(supabase_url: str) -> dict:
+    return {
+        **os.environ,
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_ANON_KEY": api_key("anon"),
+        "SUPABASE_SERVICE_ROLE_KEY": api_key("service_role"),
+        "JWT_SECRET_KEY": JWT_SECRET,
+        "DEBUG": "false",
+    }
+
+
+def measure_import(env: dict) -> float:
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env)
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def poll(client: httpx.Client, url: str, deadline: float, **kwargs) -> None:
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(url, **kwargs).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{url} did not respond in time")
+
+
+def measure_first_responses(env: dict, token: str, timeout: float):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+        "--log-level", "warning", "--no-access-log",
+    ], cwd=BACKEND_DIR, env=env)
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            poll(client, f"{base_url}/health", start + timeout)
+            health = time.perf_counter() - start
+            poll(
+                client, f"{base_url}/api/v1/trips/", start + timeout,
+                params={"cursor": ""}, headers={"Authorization": f"Bearer {token}"}
+            )
+            query = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    return health, query
+
+
+def main(args) -> int:
+    fake_port = free_port()
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_supabase", "--port", str(fake_port),
+        "--latency-ms", "0", "--jitter-ms", "0", "--trips", "5", "--cards", "10", "--connections", "5",
+    ], cwd=BACKEND_DIR)
+    env = app_env(f"http://127.0.0.1:{fake_port}")
+    token = jwt.encode(
+        {"sub": USER_ID, "aud": "authenticated", "role": "authenticated", "exp": int(time.time()) + 3600},
+        JWT_SECRET, algorithm="HS256"
+    )
+
+    samples = {"import": [], "first /health": [], "first query": []}
+    try:
+        with httpx.Client() as client:
+            poll(client, f"http://127.0.0.1:{fake_port}/health", time.perf_counter() + 30)
+        for _ in range(args.runs):
+            samples["import"].append(measure_import(env))
+            health, query = measure_first_responses(env, token, args.timeout)
+            samples["first /health"].append(health)
+            samples["first query"].append(query)
+    finally:
+        fake.terminate()
+        fake.wait()
+
+    budgets = {"import": args.max_import_ms, "first /health": args.max_health_ms, "first query": args.max_query_ms}
+    print(f"runs={args.runs}")
+    print(f"{'metric':<14} {'median ms':>10} {'min ms':>8} {'max ms':>8} {'budget ms':>10}")
+    failed = False
+    for name, values in samples.items():
+        median = statistics.median(values) * 1000
+        budget = budgets[name]
+        over = budget is not None and median > budget
+        failed = failed or over
+        print(
+            f"{name:<14} {median:>10.1f} {min(values) * 1000:>8.1f} {max(values) * 1000:>8.1f} "
+            f"{'-' if budget is None else budget:>10}{'  OVER BUDGET' if over else ''}"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for each server")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-health-ms", type=float, default=None)
+    parser.add_argument("--max-query-ms", type=float, default=None)
+    sys.exit(main(parser.parse_args()))
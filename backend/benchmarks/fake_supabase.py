@@ -0,0 +1,415 @@
+"""In-memory stand-in for the Supabase REST (PostgREST) and auth APIs.
+
+Implements the subset of PostgREST the services use: filters (eq, neq, gt,
+gte, lt, lte, in, is, or/and groups), order, limit/offset, single-object
+responses, one level of resource embedding, inserts / updates / deletes with
+return=representation and the RPCs behind bulk card updates and buffered
+drags. Every request sleeps for --latency-ms (+/- --jitter-ms) first, to
+stand in for the network and database round trip.
+
+The store is seeded with one user owning --trips trips of --cards cards and
+--connections connections each. Used by ``benchmarks.loadtest``; to run it
+on its own from ``backend/``:
+
+    python -m benchmarks.fake_supabase --port 54321 --latency-ms 5
+"""
+import argparse
+import asyncio
+import random
+import re
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from jose import jwt
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+USER_ID = "00000000-0000-4000-8000-000000000001"
+
+DEFAULTS = {
+    "trips": {"description": None, "destination": None, "start_date": None, "end_date": None,
+              "budget": None, "currency": "EUR", "visibility": "private", "cover_image": None,
+              "settings": {}, "metadata": {}},
+    "cards": {"content": {}, "position": {"x": 0, "y": 0}, "style": {}},
+    "connections": {"type": "default", "metadata": {}},
+    "card_versions": {"ai_generated": False, "prompt": None, "kind": "snapshot"},
+}
+# Tables without updated_at
+NO_UPDATED_AT = {"card_versions", "tombstones"}
+# Deleting a parent row deletes these (child table, foreign key) rows too
+CASCADES = {
+    "trips": [("cards", "trip_id"), ("connections", "trip_id")],
+    "cards": [("connections", "from_card_id"), ("connections", "to_card_id"), ("card_versions", "card_id")],
+}
+
+OBJECT_MEDIA_TYPE = "application/vnd.pgrst.object+json"
+
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Store:
+    """Tables as insertion-ordered {id: row} dicts, plus a per-trip index"""
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+        self.by_trip: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]] = defaultdict(lambda: defaultdict(dict))
+
+    def rows(self, table: str, params=None):
+        """Candidate rows, narrowed by an id= or trip_id= equality filter"""
+        if params is not None:
+            for column, index in (("id", None), ("trip_id", self.by_trip[table])):
+                value = params.get(column, "")
+                if value.startswith("eq."):
+                    if index is None:
+                        row = self.tables[table].get(value[3:])
+                        return [row] if row else []
+                    return list(index.get(value[3:], {}).values())
+        return list(self.tables[table].values())
+
+    def insert(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        timestamp = now()
+        row = {**DEFAULTS.get(table, {}), **row}
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", timestamp)
+        if table not in NO_UPDATED_AT:
+            row.setdefault("updated_at", timestamp)
+        self.tables[table][row["id"]] = row
+        if "trip_id" in row:
+            self.by_trip[table][row["trip_id"]][row["id"]] = row
+        return row
+
+    def delete(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        ids = {row["id"] for row in rows}
+        for row in rows:
+            self.tables[table].pop(row["id"], None)
+            if "trip_id" in row:
+                self.by_trip[table][row["trip_id"]].pop(row["id"], None)
+        for child, foreign_key in CASCADES.get(table, []):
+            self.delete(child, [r for r in self.tables[child].values() if r.get(foreign_key) in ids])
+
+    def seed(self, trips: int, cards: int, connections: int, rng: random.Random) -> None:
+        start = datetime.now(timezone.utc) - timedelta(days=trips)
+        for t in range(trips):
+            stamp = (start + timedelta(days=t)).isoformat()
+            trip = self.insert("trips", {
+                "user_id": USER_ID, "title": f"Trip {t}", "destination": "Roma",
+                "created_at": stamp, "updated_at": stamp,
+            })
+            card_ids = []
+            for c in range(cards):
+                card = self.insert("cards", {
+                    "trip_id": trip["id"], "type": rng.choice(["destination", "activity", "restaurant", "note"]),
+                    "title": f"Card {c}",
+                    "content": {"description": "x" * rng.randint(20, 400), "tags": ["museum", "morning"]},
+                    "position": {"x": rng.uniform(0, 5000), "y": rng.uniform(0, 5000)},
+                    "created_at": stamp, "updated_at": stamp,
+                })
+                card_ids.append(card["id"])
+            for _ in range(connections if len(card_ids) > 1 else 0):
+                a, b = rng.sample(card_ids, 2)
+                self.insert("connections", {
+                    "trip_id": trip["id"], "from_card_id": a, "to_card_id": b, "created_at": stamp,
+                })
+
+
+# ---------------------------------------------------------------------------
+# PostgREST query string handling
+# ---------------------------------------------------------------------------
+
+RESERVED = {"select", "order", "limit", "offset", "or", "and", "on_conflict", "columns"}
+
+
+def split_top_level(text: str) -> List[str]:
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def coerce(expected: Any, value: str) -> Any:
+    if isinstance(expected, bool):
+        return value == "true"
+    if isinstance(expected, (int, float)):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def matches(row: Dict[str, Any], column: str, op: str, value: str) -> bool:
+    negate = op.startswith("not.")
+    if negate:
+        op = op[4:]
+    if "." in column and column not in row:
+        # Filter on an embedded resource, e.g. trips.user_id
+        embedded, column = column.split(".", 1)
+        target = row.get(embedded)
+        result = isinstance(target, dict) and matches(target, column, op, value)
+        return result != negate
+    actual = row.get(column)
+    value = value[1:-1] if value.startswith('"') and value.endswith('"') else value
+    if op == "is":
+        result = actual is None if value == "null" else actual == (value == "true")
+    elif op == "in":
+        options = [option.strip('"') for option in split_top_level(value.strip("()"))]
+        result = str(actual) in options
+    elif actual is None:
+        result = False
+    else:
+        other = coerce(actual, value)
+        actual = str(actual) if isinstance(other, str) else actual
+        result = {
+            "eq": actual == other, "neq": actual != other,
+            "gt": actual > other, "gte": actual >= other,
+            "lt": actual < other, "lte": actual <= other,
+        }[op]
+    return result != negate
+
+
+def condition(expression: str):
+    """Parse one or=/and= term into a row predicate"""
+    for group in ("and", "or"):
+        if expression.startswith(group + "("):
+            terms = [condition(term) for term in split_top_level(expression[len(group) + 1:-1])]
+            combine = all if group == "and" else any
+            return lambda row: combine(term(row) for term in terms)
+    column, op, value = expression.split(".", 2)
+    if op == "not":
+        negated, value = value.split(".", 1)
+        op = "not." + negated
+    return lambda row: matches(row, column, op, value)
+
+
+def parse_select(select: str):
+    """Return (columns or None for *, [(alias, table, inner, columns)])"""
+    columns, embeds = [], []
+    for item in split_top_level(select or "*"):
+        item = item.strip()
+        embed = re.match(r"(?:(\w+):)?(\w+)(?:!(\w+))?\((.*)\)$", item)
+        if embed:
+            alias, table, hint, inner = embed.groups()
+            embeds.append((alias or table, table, hint == "inner", inner))
+        else:
+            columns.append(item)
+    return (None if "*" in columns else columns), embeds
+
+
+def project(row: Dict[str, Any], columns: Optional[List[str]]) -> Dict[str, Any]:
+    return dict(row) if columns is None else {column: row.get(column) for column in columns}
+
+
+class FakePostgrest:
+    def __init__(self, store: Store, latency: float, jitter: float):
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+
+    async def delay(self) -> None:
+        self.requests += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def embed(self, table: str, rows: List[Dict[str, Any]], embeds) -> List[Dict[str, Any]]:
+        rows = [dict(row) for row in rows]
+        for alias, child, _, inner in embeds:
+            columns, _ = parse_select(inner)
+            many_to_one = child[:-1] + "_id"
+            for row in rows:
+                if many_to_one in row:
+                    parent = self.store.tables[child].get(row[many_to_one])
+                    row[alias] = project(parent, columns) if parent else None
+                else:
+                    children = self.store.by_trip[child].get(row["id"], {}).values() if table == "trips" else [
+                        r for r in self.store.tables[child].values() if r.get(table[:-1] + "_id") == row["id"]
+                    ]
+                    row[alias] = [project(r, columns) for r in children]
+        return rows
+
+    def select(self, table: str, params) -> List[Dict[str, Any]]:
+        columns, embeds = parse_select(params.get("select"))
+        rows = self.filter(self.store.rows(table, params), params, embedded=False)
+        if embeds:
+            rows = self.filter(self.embed(table, rows, embeds), params, embedded=True)
+            for alias, _, inner, _ in embeds:
+                if inner:
+                    rows = [row for row in rows if row.get(alias)]
+        order = params.get("order")
+        if order:
+            for term in reversed(order.split(",")):
+                column, *flags = term.split(".")
+                rows.sort(key=lambda row: (row.get(column) is None, row.get(column) or ""), reverse="desc" in flags)
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        rows = rows[offset:offset + int(limit) if limit is not None else None]
+        keep = None if columns is None else columns + [alias for alias, *_ in embeds]
+        return [project(row, keep) for row in rows]
+
+    def filter(self, rows, params, embedded: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """Apply filters; embedded=False/True restricts to plain / embedded-resource filters"""
+        predicates = []
+        for key, value in params.multi_items():
+            if key in ("or", "and"):
+                if embedded is not True:
+                    predicates.append(condition(f"{key}{value}"))
+            elif key not in RESERVED and not key.endswith((".order", ".limit", ".offset")):
+                if embedded is not None and ("." in key) != embedded:
+                    continue
+                op, _, operand = value.partition(".")
+                if op == "not":
+                    negated, _, operand = operand.partition(".")
+                    op = "not." + negated
+                predicates.append(lambda row, k=key, o=op, v=operand: matches(row, k, o, v))
+        return [row for row in rows if all(predicate(row) for predicate in predicates)]
+
+    def respond(self, request: Request, rows: List[Dict[str, Any]], status_code: int = 200) -> Response:
+        if OBJECT_MEDIA_TYPE in request.headers.get("accept", ""):
+            if len(rows) != 1:
+                return JSONResponse({
+                    "code": "PGRST116",
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "details": f"The result contains {len(rows)} rows",
+                    "hint": None,
+                }, status_code=406)
+            return JSONResponse(rows[0], status_code=status_code)
+        return JSONResponse(rows, status_code=status_code)
+
+    async def table(self, request: Request) -> Response:
+        await self.delay()
+        table = request.path_params["table"]
+        params = request.query_params
+        method = request.method
+
+        if method == "GET":
+            return self.respond(request, self.select(table, params))
+
+        if method == "POST":
+            body = await request.json()
+            rows = [self.store.insert(table, row) for row in (body if isinstance(body, list) else [body])]
+            return self.respond(request, rows, 201)
+
+        rows = self.filter(self.store.rows(table, params), params)
+        if method == "PATCH":
+            body = await request.json()
+            for row in rows:
+                row.update(body)
+                if table not in NO_UPDATED_AT:
+                    row["updated_at"] = now()
+        elif method == "DELETE":
+            self.store.delete(table, rows)
+        return self.respond(request, [dict(row) for row in rows])
+
+    def update_cards(self, trip_id: str, updates: List[Dict[str, Any]]):
+        cards = self.store.by_trip["cards"].get(trip_id, {})
+        if any(update["id"] not in cards for update in updates):
+            return None
+        touched = {}
+        for update in updates:
+            card = cards[update["id"]]
+            card.update({k: v for k, v in update.items() if k != "id" and v is not None})
+            card["updated_at"] = now()
+            touched[card["id"]] = dict(card)
+        return list(touched.values())
+
+    async def rpc(self, request: Request) -> Response:
+        await self.delay()
+        function = request.path_params["function"]
+        body = await request.json()
+
+        if function in ("bulk_update_cards", "bulk_update_card_positions"):
+            key = "p_updates" if function == "bulk_update_cards" else "p_positions"
+            rows = self.update_cards(body["p_trip_id"], body[key])
+            if rows is None:
+                return JSONResponse({"code": "P0002", "message": "Card not found in trip"}, status_code=400)
+            return JSONResponse(rows)
+
+        if function == "cards_in_viewport":
+            x0, x1 = sorted((body["p_x0"], body["p_x1"]))
+            y0, y1 = sorted((body["p_y0"], body["p_y1"]))
+            return JSONResponse([
+                card for card in self.store.by_trip["cards"].get(body["p_trip_id"], {}).values()
+                if x0 <= card["position"].get("x", 0) <= x1 and y0 <= card["position"].get("y", 0) <= y1
+            ])
+
+        if function == "card_version_chains":
+            chains = []
+            for card_id in body["p_card_ids"]:
+                rows = sorted(
+                    (row for row in self.store.tables["card_versions"].values() if row["card_id"] == card_id),
+                    key=lambda row: row["version_number"]
+                )
+                if rows:
+                    chains += [row for row in rows if row["version_number"] >= rows[-1]["snapshot_version"]]
+            return JSONResponse(chains)
+
+        return JSONResponse({
+            "code": "PGRST202", "message": f"Could not find the function public.{function}",
+        }, status_code=404)
+
+    async def auth_user(self, request: Request) -> Response:
+        await self.delay()
+        token = request.headers.get("authorization", "").partition(" ")[2]
+        try:
+            claims = jwt.get_unverified_claims(token)
+        except Exception:
+            return JSONResponse({"msg": "invalid JWT"}, status_code=401)
+        # Every field gotrue's User model requires, so get_user() validates
+        return JSONResponse({
+            "id": claims.get("sub"),
+            "aud": claims.get("aud") or "authenticated",
+            "role": claims.get("role"),
+            "app_metadata": {"provider": "email", "providers": ["email"]},
+            "user_metadata": {},
+            "created_at": now(),
+        })
+
+    async def health(self, request: Request) -> Response:
+        return JSONResponse({"status": "ok", "requests": self.requests})
+
+
+def create_app(store: Store, latency: float, jitter: float) -> Starlette:
+    fake = FakePostgrest(store, latency, jitter)
+    return Starlette(routes=[
+        Route("/health", fake.health),
+        Route("/auth/v1/user", fake.auth_user),
+        Route("/rest/v1/rpc/{function}", fake.rpc, methods=["POST"]),
+        Route("/rest/v1/{table}", fake.table, methods=["GET", "POST", "PATCH", "DELETE"]),
+    ])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=1.0)
+    parser.add_argument("--trips", type=int, default=50)
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    store = Store()
+    store.seed(args.trips, args.cards, args.connections, random.Random(args.seed))
+    app = create_app(store, args.latency_ms / 1000, args.jitter_ms / 1000)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
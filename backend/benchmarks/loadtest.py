@@ -0,0 +1,331 @@
+"""End-to-end load test of the API against a local Supabase stand-in.
+
+Starts ``benchmarks.fake_supabase`` (seeded, with injected latency) and the
+FastAPI app under uvicorn as subprocesses, then runs scripted workloads with
+a pool of concurrent clients:
+
+- canvas_load:  GET /trips/{id}/full and GET /trips/{id}/cards
+- drag_storm:   PUT /trips/{id}/cards/{card_id}/position
+- bulk_update:  PUT /trips/{id}/cards/bulk-update with --bulk-size cards
+- trip_listing: GET /trips?limit=20, following next_cursor to the end
+
+Reports requests/s and p50/p95/p99 latency per endpoint and writes them to a
+JSON file named after the current commit. Pass --compare with an earlier
+file to print the deltas and exit non-zero on regressions.
+
+Run from ``backend/``:
+
+    python -m benchmarks.loadtest --duration 10 --concurrency 32 --latency-ms 5
+    python -m benchmarks.loadtest --compare benchmarks/results/loadtest-<commit>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+from jose import jwt
+
+from benchmarks.fake_supabase import USER_ID
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BACKEND_DIR / "benchmarks" / "results"
+JWT_SECRET = "loadtest-secret-with-enough-bytes-for-hs256"
+WORKLOADS = ("canvas_load", "drag_storm", "bulk_update", "trip_listing")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+            capture_output=True, text=True
+        ).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def api_key(role: str) -> str:
+    return jwt.encode({"role": role, "iss": "supabase"}, JWT_SECRET, algorithm="HS256")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+async def wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not become ready")
+            await asyncio.sleep(0.1)
+
+
+class Recorder:
+    """Latencies and errors per endpoint label"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[label] += 1
+            return None
+        self.latencies[label].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[label] += 1
+            return None
+        return response
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for label in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies[label])
+            result[label] = {
+                "requests": len(values),
+                "errors": self.errors[label],
+                "rps": round(len(values) / elapsed, 1),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            }
+        return result
+
+
+class Workloads:
+    def __init__(self, trips: List[str], cards: Dict[str, List[str]], bulk_size: int, rng: random.Random):
+        self.trips = trips
+        self.cards = cards
+        self.bulk_size = bulk_size
+        self.rng = rng
+
+    async def canvas_load(self, client, recorder: Recorder) -> None:
+        trip_id = self.rng.choice(self.trips)
+        await recorder.request(client, "GET /trips/{trip_id}/full", "GET", f"/trips/{trip_id}/full")
+        await recorder.request(client, "GET /trips/{trip_id}/cards", "GET", f"/trips/{trip_id}/cards")
+
+    async def drag_storm(self, client, recorder: Recorder) -> None:
+        # Drags concentrate on a few cards of a few trips, as on a live canvas
+        trip_id = self.trips[self.rng.randrange(min(3, len(self.trips)))]
+        card_id = self.cards[trip_id][self.rng.randrange(min(10, len(self.cards[trip_id])))]
+        await recorder.request(
+            client, "PUT /trips/{trip_id}/cards/{card_id}/position", "PUT",
+            f"/trips/{trip_id}/cards/{card_id}/position",
+            json={"position": {"x": self.rng.uniform(0, 5000), "y": self.rng.uniform(0, 5000)}}
+        )
+
+    async def bulk_update(self, client, recorder: Recorder) -> None:
+        trip_id = self.rng.choice(self.trips)
+        cards = self.rng.sample(self.cards[trip_id], min(self.bulk_size, len(self.cards[trip_id])))
+        await recorder.request(
+            client, "PUT /trips/{trip_id}/cards/bulk-update", "PUT",
+            f"/trips/{trip_id}/cards/bulk-update",
+            json={"cards": [
+                {"id": card_id, "position": {"x": self.rng.uniform(0, 5000), "y": self.rng.uniform(0, 5000)}}
+                for card_id in cards
+            ]}
+        )
+
+    async def trip_listing(self, client, recorder: Recorder) -> None:
+        # An empty cursor asks for keyset paging from the first page
+        cursor = ""
+        while True:
+            params = {"limit": 20, "cursor": cursor}
+            response = await recorder.request(client, "GET /trips", "GET", "/trips/", params=params)
+            if response is None:
+                return
+            cursor = response.json()["data"]["next_cursor"]
+            if not cursor:
+                return
+
+
+async def discover(client: httpx.AsyncClient, trips: int):
+    """Trip and card ids of the seeded data, read through the API itself"""
+    trip_ids, cursor = [], ""
+    while len(trip_ids) < trips:
+        params = {"limit": 100, "cursor": cursor}
+        page = (await client.get("/trips/", params=params)).raise_for_status().json()["data"]
+        trip_ids.extend(trip["id"] for trip in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    cards = {}
+    for trip_id in trip_ids:
+        data = (await client.get(f"/trips/{trip_id}/cards")).raise_for_status().json()["data"]
+        cards[trip_id] = [card["id"] for card in data]
+    return trip_ids, cards
+
+
+async def run_workload(base_url: str, token: str, step, concurrency: int, duration: float):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                await step(client, recorder)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return recorder.summary(time.perf_counter() - start)
+
+
+def print_results(results) -> None:
+    print(f"{'workload':<13} {'endpoint':<48} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for workload, endpoints in results.items():
+        for label, stats in endpoints.items():
+            print(
+                f"{workload:<13} {label:<48} {stats['rps']:>9.1f} {stats['p50_ms']:>8.2f} "
+                f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['errors']:>7}"
+            )
+
+
+def compare(results, baseline, threshold: float) -> bool:
+    """Print deltas against a baseline run; True if anything regressed"""
+    regressed = False
+    print(f"\ncompared with {baseline['commit']} ({baseline['timestamp']}), threshold {threshold:.0%}")
+    print(f"{'workload':<13} {'endpoint':<48} {'req/s':>9} {'p95':>9} {'p99':>9}")
+    for workload, endpoints in results.items():
+        for label, stats in endpoints.items():
+            before = baseline["results"].get(workload, {}).get(label)
+            if not before:
+                continue
+            rps = stats["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+            p95 = stats["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+            p99 = stats["p99_ms"] / before["p99_ms"] - 1 if before["p99_ms"] else 0.0
+            flag = rps < -threshold or p95 > threshold
+            regressed = regressed or flag
+            print(f"{workload:<13} {label:<48} {rps:>+9.1%} {p95:>+9.1%} {p99:>+9.1%}{'  REGRESSION' if flag else ''}")
+    return regressed
+
+
+async def main(args) -> int:
+    fake_port, app_port = free_port(), free_port()
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_supabase", "--port", str(fake_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--trips", str(args.trips), "--cards", str(args.cards), "--connections", str(args.connections),
+    ], cwd=BACKEND_DIR)
+    env = {
+        **os.environ,
+        "SUPABASE_URL": f"http://127.0.0.1:{fake_port}",
+        "SUPABASE_ANON_KEY": api_key("anon"),
+        "SUPABASE_SERVICE_ROLE_KEY": api_key("service_role"),
+        "JWT_SECRET_KEY": JWT_SECRET,
+        "DEBUG": "false",
+    }
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ], cwd=BACKEND_DIR, env=env)
+
+    try:
+        await wait_ready(f"http://127.0.0.1:{fake_port}/health")
+        await wait_ready(f"http://127.0.0.1:{app_port}/health")
+
+        base_url = f"http://127.0.0.1:{app_port}/api/v1"
+        token = jwt.encode(
+            {"sub": USER_ID, "aud": "authenticated", "role": "authenticated", "exp": int(time.time()) + 3600},
+            JWT_SECRET, algorithm="HS256"
+        )
+        async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {token}"}, timeout=60) as client:
+            trip_ids, cards = await discover(client, args.trips)
+        workloads = Workloads(trip_ids, cards, args.bulk_size, random.Random(args.seed))
+
+        print(
+            f"commit={git_commit()} latency={args.latency_ms}ms jitter={args.jitter_ms}ms "
+            f"trips={len(trip_ids)} cards/trip={args.cards} concurrency={args.concurrency} "
+            f"duration={args.duration}s workers={args.workers}\n"
+        )
+        results = {}
+        for name in args.workloads:
+            results[name] = await run_workload(
+                base_url, token, getattr(workloads, name), args.concurrency, args.duration
+            )
+        print_results(results)
+    finally:
+        for process in (app, fake):
+            process.terminate()
+        for process in (app, fake):
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            key: getattr(args, key) for key in (
+                "latency_ms", "jitter_ms", "trips", "cards", "connections",
+                "concurrency", "duration", "bulk_size", "workers", "seed"
+            )
+        },
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"loadtest-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nsaved {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if baseline.get("config") != report["config"]:
+            print("warning: baseline was recorded with a different configuration")
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per workload")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=1.0)
+    parser.add_argument("--trips", type=int, default=50)
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=150)
+    parser.add_argument("--bulk-size", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/loadtest-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed req/s drop or p95 increase")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,65 @@
+-- 07_create_bulk_update_cards_functions.sql
+-- Set-based bulk card updates used by PUT /trips/{trip_id}/cards/bulk-update
+-- Each call is a single statement, so a batch is applied completely or not at all
+
+-- General path: any subset of title/content/position/style per card
+CREATE OR REPLACE FUNCTION public.bulk_update_cards(p_trip_id UUID, p_updates JSONB)
+RETURNS SETOF public.cards AS $$
+DECLARE
+  expected integer;
+  updated integer;
+BEGIN
+  SELECT COUNT(DISTINCT u->>'id') INTO expected
+  FROM jsonb_array_elements(p_updates) AS u;
+
+  RETURN QUERY
+  WITH updated_cards AS (
+    UPDATE public.cards c
+    SET
+      title = COALESCE(u.title, c.title),
+      content = COALESCE(u.content, c.content),
+      position = COALESCE(u.position, c.position),
+      style = COALESCE(u.style, c.style)
+    FROM jsonb_to_recordset(p_updates)
+      AS u(id UUID, title TEXT, content JSONB, position JSONB, style JSONB)
+    WHERE c.id = u.id
+      AND c.trip_id = p_trip_id
+    RETURNING c.*
+  )
+  SELECT * FROM updated_cards;
+
+  -- Any card missing from the trip aborts the whole batch
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  IF updated <> expected THEN
+    RAISE EXCEPTION 'Card not found in trip' USING ERRCODE = 'P0002';
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Fast path for drag/auto-arrange: only the position column is touched
+CREATE OR REPLACE FUNCTION public.bulk_update_card_positions(p_trip_id UUID, p_positions JSONB)
+RETURNS SETOF public.cards AS $$
+DECLARE
+  expected integer;
+  updated integer;
+BEGIN
+  SELECT COUNT(DISTINCT u->>'id') INTO expected
+  FROM jsonb_array_elements(p_positions) AS u;
+
+  RETURN QUERY
+  WITH updated_cards AS (
+    UPDATE public.cards c
+    SET position = u.position
+    FROM jsonb_to_recordset(p_positions) AS u(id UUID, position JSONB)
+    WHERE c.id = u.id
+      AND c.trip_id = p_trip_id
+    RETURNING c.*
+  )
+  SELECT * FROM updated_cards;
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  IF updated <> expected THEN
+    RAISE EXCEPTION 'Card not found in trip' USING ERRCODE = 'P0002';
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,55 @@
+-- 08_create_duplicate_trip_function.sql
+-- Server-side deep copy used by POST /trips/{trip_id}/duplicate
+-- Copies the trip row, all its cards and all its connections inside the
+-- function's transaction, with three set-based INSERTs regardless of trip size
+
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+
+CREATE OR REPLACE FUNCTION public.duplicate_trip(
+  p_trip_id UUID,
+  p_user_id UUID,
+  p_new_title TEXT DEFAULT NULL
+)
+RETURNS public.trips AS $$
+DECLARE
+  new_trip public.trips;
+BEGIN
+  INSERT INTO public.trips (
+    user_id, title, description, destination, start_date, end_date,
+    budget, currency, visibility, cover_image, settings, metadata
+  )
+  SELECT
+    t.user_id, COALESCE(p_new_title, t.title || ' (Copy)'), t.description,
+    t.destination, t.start_date, t.end_date, t.budget, t.currency,
+    t.visibility, t.cover_image, t.settings, t.metadata
+  FROM public.trips t
+  WHERE t.id = p_trip_id
+    AND t.user_id = p_user_id
+  RETURNING * INTO new_trip;
+
+  IF new_trip.id IS NULL THEN
+    RAISE EXCEPTION 'Trip not found' USING ERRCODE = 'P0002';
+  END IF;
+
+  -- New card IDs are derived deterministically from (new trip, old card), so
+  -- the connection copy below can remap endpoints without a lookup table
+  INSERT INTO public.cards (id, trip_id, type, title, content, position, style)
+  SELECT
+    uuid_generate_v5(new_trip.id, c.id::text), new_trip.id,
+    c.type, c.title, c.content, c.position, c.style
+  FROM public.cards c
+  WHERE c.trip_id = p_trip_id;
+
+  -- Separate statement so the connection trigger can see the copied cards
+  INSERT INTO public.connections (trip_id, from_card_id, to_card_id, type, metadata)
+  SELECT
+    new_trip.id,
+    uuid_generate_v5(new_trip.id, x.from_card_id::text),
+    uuid_generate_v5(new_trip.id, x.to_card_id::text),
+    x.type, x.metadata
+  FROM public.connections x
+  WHERE x.trip_id = p_trip_id;
+
+  RETURN new_trip;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,71 @@
+-- 09_create_change_tracking.sql
+-- Supports GET /trips/{trip_id}/changes?since=<cursor> (delta sync)
+-- - connections gain updated_at so edits can be picked up like cards
+-- - deletes of cards and connections leave tombstones for reconnecting clients
+
+-- =========================================
+-- connections.updated_at
+-- =========================================
+
+ALTER TABLE public.connections
+  ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW();
+
+CREATE INDEX IF NOT EXISTS idx_connections_updated_at ON public.connections(updated_at);
+
+DROP TRIGGER IF EXISTS trg_connections_set_updated_at ON public.connections;
+CREATE TRIGGER trg_connections_set_updated_at
+BEFORE UPDATE ON public.connections
+FOR EACH ROW
+EXECUTE FUNCTION public.set_timestamp_updated_at();
+
+-- =========================================
+-- Tombstones for deleted cards and connections
+-- =========================================
+
+-- No FK to trips: rows are also written while a trip delete cascades
+CREATE TABLE IF NOT EXISTS public.tombstones (
+  id UUID NOT NULL,
+  trip_id UUID NOT NULL,
+  record_type TEXT NOT NULL CHECK (record_type IN ('card', 'connection')),
+  deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_tombstones_trip_id_deleted_at
+  ON public.tombstones(trip_id, deleted_at);
+
+CREATE OR REPLACE FUNCTION public.record_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO public.tombstones (id, trip_id, record_type)
+  VALUES (OLD.id, OLD.trip_id, TG_ARGV[0]);
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_cards_record_tombstone ON public.cards;
+CREATE TRIGGER trg_cards_record_tombstone
+AFTER DELETE ON public.cards
+FOR EACH ROW
+EXECUTE FUNCTION public.record_tombstone('card');
+
+DROP TRIGGER IF EXISTS trg_connections_record_tombstone ON public.connections;
+CREATE TRIGGER trg_connections_record_tombstone
+AFTER DELETE ON public.connections
+FOR EACH ROW
+EXECUTE FUNCTION public.record_tombstone('connection');
+
+-- Tombstones only need to outlive the longest client disconnect; prune with e.g.
+-- DELETE FROM public.tombstones WHERE deleted_at < NOW() - INTERVAL '30 days';
+
+ALTER TABLE public.tombstones ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS tombstones_select_by_trip_owner ON public.tombstones;
+CREATE POLICY tombstones_select_by_trip_owner ON public.tombstones
+FOR SELECT
+USING (
+  EXISTS (
+    SELECT 1 FROM public.trips t
+    WHERE t.id = tombstones.trip_id
+      AND t.user_id = auth.uid()
+  )
+);
@@ -0,0 +1,7 @@
+-- 10_create_trips_keyset_index.sql
+-- Supports keyset pagination of GET /trips/?cursor=...
+-- The trip list is ordered by (updated_at DESC, id) per user; this index lets
+-- each page start directly at the cursor instead of scanning skipped rows
+
+CREATE INDEX IF NOT EXISTS idx_trips_user_id_updated_at_id
+  ON public.trips(user_id, updated_at DESC, id);
@@ -0,0 +1,30 @@
+-- 11_create_cards_viewport_index.sql
+-- Supports GET /trips/{trip_id}/cards?bbox=x0,y0,x1,y1 (viewport queries)
+-- Cards keep position as {x, y} JSONB; a GiST index over (trip_id, point)
+-- lets a viewport lookup touch only the cards inside the box
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+CREATE OR REPLACE FUNCTION public.card_point(position JSONB)
+RETURNS point AS $$
+  SELECT point((position->>'x')::float8, (position->>'y')::float8);
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE INDEX IF NOT EXISTS idx_cards_trip_id_position
+  ON public.cards USING gist (trip_id, public.card_point(position));
+
+-- Cards whose position (top-left corner) lies inside the box, edges included
+CREATE OR REPLACE FUNCTION public.cards_in_viewport(
+  p_trip_id UUID,
+  p_x0 float8,
+  p_y0 float8,
+  p_x1 float8,
+  p_y1 float8
+)
+RETURNS SETOF public.cards AS $$
+  SELECT *
+  FROM public.cards c
+  WHERE c.trip_id = p_trip_id
+    AND public.card_point(c.position) <@ box(point(p_x0, p_y0), point(p_x1, p_y1))
+  ORDER BY c.created_at;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,46 @@
+-- 12_create_card_version_deltas.sql
+-- Delta-compressed card history written by the API (GET/POST /trips/cards/{card_id}/versions)
+-- - 'snapshot' rows hold the full versioned document {title, content, style}
+-- - 'delta' rows hold a JSON Patch (RFC 6902) against the previous version
+-- - snapshot_version points at the snapshot a row's chain starts from, so any
+--   version is rebuilt from one range read of at most N rows
+
+ALTER TABLE public.card_versions
+  ADD COLUMN IF NOT EXISTS kind TEXT NOT NULL DEFAULT 'snapshot' CHECK (kind IN ('snapshot', 'delta')),
+  ADD COLUMN IF NOT EXISTS snapshot_version INTEGER;
+
+-- Existing rows are full copies
+UPDATE public.card_versions
+SET snapshot_version = version_number
+WHERE snapshot_version IS NULL;
+
+ALTER TABLE public.card_versions
+  ALTER COLUMN snapshot_version SET NOT NULL;
+
+-- (card_id, version_number) lookups and ranges are served by
+-- uq_card_versions_card_id_version; the single-column index is redundant
+DROP INDEX IF EXISTS public.idx_card_versions_card_id;
+
+-- The API always supplies version_number (next after the head it diffed
+-- against, conflicts surface through the unique index), so the trigger only
+-- numbers manual inserts. Take the next number from the unique index's last
+-- entry rather than aggregating over the card's history.
+CREATE OR REPLACE FUNCTION public.card_versions_assign_next_version()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.version_number IS NULL THEN
+    SELECT COALESCE((
+      SELECT version_number
+      FROM public.card_versions
+      WHERE card_id = NEW.card_id
+      ORDER BY version_number DESC
+      LIMIT 1
+    ), 0) + 1
+    INTO NEW.version_number;
+  END IF;
+  IF NEW.snapshot_version IS NULL THEN
+    NEW.snapshot_version = NEW.version_number;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
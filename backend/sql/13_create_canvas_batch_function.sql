@@ -0,0 +1,108 @@
+-- 13_create_canvas_batch_function.sql
+-- Mixed card/connection batch used by POST /trips/{trip_id}/batch
+-- Operations run in order inside the function's transaction: the first
+-- failure rolls back the whole batch. The API assigns ids to created records
+-- and resolves client temporary ids before calling.
+
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+
+CREATE OR REPLACE FUNCTION public.apply_canvas_batch(p_trip_id UUID, p_operations JSONB)
+RETURNS JSONB AS $$
+DECLARE
+  op JSONB;
+  d JSONB;
+  idx integer := 0;
+  results JSONB := '[]'::jsonb;
+  card_row public.cards;
+  connection_row public.connections;
+BEGIN
+  BEGIN
+    FOR op IN SELECT value FROM jsonb_array_elements(p_operations) LOOP
+      d := COALESCE(op->'data', '{}'::jsonb);
+
+      CASE op->>'op'
+        WHEN 'card.create' THEN
+          INSERT INTO public.cards (id, trip_id, type, title, content, position, style)
+          VALUES (
+            COALESCE((op->>'id')::uuid, uuid_generate_v4()), p_trip_id,
+            d->>'type', d->>'title',
+            COALESCE(d->'content', '{}'::jsonb),
+            COALESCE(d->'position', '{"x": 0, "y": 0}'::jsonb),
+            COALESCE(d->'style', '{}'::jsonb)
+          )
+          RETURNING * INTO card_row;
+          results := results || jsonb_build_array(to_jsonb(card_row));
+
+        WHEN 'card.update' THEN
+          UPDATE public.cards c
+          SET
+            title = COALESCE(d->>'title', c.title),
+            content = COALESCE(d->'content', c.content),
+            position = COALESCE(d->'position', c.position),
+            style = COALESCE(d->'style', c.style)
+          WHERE c.id = (op->>'id')::uuid
+            AND c.trip_id = p_trip_id
+          RETURNING c.* INTO card_row;
+          IF NOT FOUND THEN
+            RAISE EXCEPTION 'Card not found in trip' USING ERRCODE = 'P0002';
+          END IF;
+          results := results || jsonb_build_array(to_jsonb(card_row));
+
+        WHEN 'card.delete' THEN
+          DELETE FROM public.cards c
+          WHERE c.id = (op->>'id')::uuid
+            AND c.trip_id = p_trip_id
+          RETURNING c.* INTO card_row;
+          IF NOT FOUND THEN
+            RAISE EXCEPTION 'Card not found in trip' USING ERRCODE = 'P0002';
+          END IF;
+          results := results || jsonb_build_array(to_jsonb(card_row));
+
+        WHEN 'connection.create' THEN
+          INSERT INTO public.connections (id, trip_id, from_card_id, to_card_id, type, metadata)
+          VALUES (
+            COALESCE((op->>'id')::uuid, uuid_generate_v4()), p_trip_id,
+            (d->>'from_card_id')::uuid, (d->>'to_card_id')::uuid,
+            COALESCE(d->>'type', 'default'),
+            COALESCE(d->'metadata', '{}'::jsonb)
+          )
+          RETURNING * INTO connection_row;
+          results := results || jsonb_build_array(to_jsonb(connection_row));
+
+        WHEN 'connection.update' THEN
+          UPDATE public.connections x
+          SET
+            type = COALESCE(d->>'type', x.type),
+            metadata = COALESCE(d->'metadata', x.metadata)
+          WHERE x.id = (op->>'id')::uuid
+            AND x.trip_id = p_trip_id
+          RETURNING x.* INTO connection_row;
+          IF NOT FOUND THEN
+            RAISE EXCEPTION 'Connection not found in trip' USING ERRCODE = 'P0002';
+          END IF;
+          results := results || jsonb_build_array(to_jsonb(connection_row));
+
+        WHEN 'connection.delete' THEN
+          DELETE FROM public.connections x
+          WHERE x.id = (op->>'id')::uuid
+            AND x.trip_id = p_trip_id
+          RETURNING x.* INTO connection_row;
+          IF NOT FOUND THEN
+            RAISE EXCEPTION 'Connection not found in trip' USING ERRCODE = 'P0002';
+          END IF;
+          results := results || jsonb_build_array(to_jsonb(connection_row));
+
+        ELSE
+          RAISE EXCEPTION 'Unknown operation %', op->>'op' USING ERRCODE = '22023';
+      END CASE;
+
+      idx := idx + 1;
+    END LOOP;
+  EXCEPTION WHEN OTHERS THEN
+    -- Name the failing operation; the batch is rolled back either way
+    RAISE EXCEPTION 'Operation %: %', idx, SQLERRM USING ERRCODE = SQLSTATE;
+  END;
+
+  RETURN results;
+END;
+$$ LANGUAGE plpgsql;
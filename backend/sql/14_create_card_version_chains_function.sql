@@ -0,0 +1,28 @@
+-- 14_create_card_version_chains_function.sql
+-- Loads the version heads of many cards in one call when the API records
+-- versions for a bulk update or a canvas batch
+-- - returns, per card, the rows from its latest snapshot to its latest version
+--   (at most snapshot_interval rows), ordered by card and version number
+-- - cards without history return no rows
+
+CREATE OR REPLACE FUNCTION public.card_version_chains(p_card_ids UUID[])
+RETURNS TABLE (
+  card_id UUID,
+  version_number INTEGER,
+  snapshot_version INTEGER,
+  kind TEXT,
+  content JSONB
+) AS $$
+  WITH heads AS (
+    SELECT DISTINCT ON (v.card_id) v.card_id, v.version_number, v.snapshot_version
+    FROM public.card_versions v
+    WHERE v.card_id = ANY(p_card_ids)
+    ORDER BY v.card_id, v.version_number DESC
+  )
+  SELECT v.card_id, v.version_number, v.snapshot_version, v.kind, v.content
+  FROM heads h
+  JOIN public.card_versions v
+    ON v.card_id = h.card_id
+   AND v.version_number BETWEEN h.snapshot_version AND h.version_number
+  ORDER BY v.card_id, v.version_number;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from app.admission import HEAVY, READ, WRITE, AdmissionController, AdmissionRejected
+
+def test_admits_up_to_the_limit_then_queues():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=2)
+        await controller.acquire(READ)
+        await controller.acquire(READ)
+        waiter = asyncio.ensure_future(controller.acquire(READ))
+        await asyncio.sleep(0)
+        assert not waiter.done() and controller.queued() == 1
+
+        controller.release(READ)
+        await waiter
+        assert controller.active == 2 and controller.queued() == 0
+
+    asyncio.run(scenario())
+
+def test_rejects_when_the_queue_is_full():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, retry_after=7)
+        await controller.acquire(WRITE)
+        waiter = asyncio.ensure_future(controller.acquire(WRITE))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire(WRITE)
+        assert excinfo.value.status_code == 503
+        assert excinfo.value.headers == {"Retry-After": "7"}
+        assert controller.rejected == 1
+        waiter.cancel()
+
+    asyncio.run(scenario())
+
+def test_times_out_waiting_for_a_slot():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, queue_timeout=0.01)
+        await controller.acquire(READ)
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire(READ)
+        assert controller.timed_out == 1 and controller.queued() == 0
+
+        controller.release(READ)
+        await controller.acquire(READ)
+
+    asyncio.run(scenario())
+
+def test_reads_are_granted_before_writes_and_heavy_operations():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1)
+        await controller.acquire(READ)
+        granted = []
+
+        async def wait(priority):
+            await controller.acquire(priority)
+            granted.append(priority)
+
+        waiters = [asyncio.ensure_future(wait(priority)) for priority in (HEAVY, WRITE, READ)]
+        await asyncio.sleep(0)
+        for _ in range(3):
+            controller.release(granted[-1] if granted else READ)
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+        assert granted == [READ, WRITE, HEAVY]
+
+    asyncio.run(scenario())
+
+def test_per_user_limit_does_not_block_other_users():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=4, per_user_concurrency=1)
+        await controller.acquire(READ, "alice")
+        blocked = asyncio.ensure_future(controller.acquire(READ, "alice"))
+        await asyncio.sleep(0)
+        await controller.acquire(READ, "bob")
+        assert not blocked.done()
+
+        controller.release(READ, "alice")
+        await blocked
+        assert controller.stats()["active"] == 2
+
+    asyncio.run(scenario())
+
+def test_heavy_operations_have_their_own_limit():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=4, max_heavy=1)
+        await controller.acquire(HEAVY)
+        heavy = asyncio.ensure_future(controller.acquire(HEAVY))
+        await asyncio.sleep(0)
+        await controller.acquire(WRITE)
+        assert not heavy.done()
+
+        controller.release(HEAVY)
+        await heavy
+        assert controller.active_heavy == 1
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1)
+        await controller.acquire(READ)
+        waiter = asyncio.ensure_future(controller.acquire(READ))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.queued() == 0
+
+        controller.release(READ)
+        assert controller.active == 0
+
+    asyncio.run(scenario())
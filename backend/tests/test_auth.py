@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+
+from app.admission import _admission_user
+from app.auth import AuthService, TokenCache, get_current_user_optional, token_cache
+from app.config import settings
+
+def token(sub="user-1", exp_in=3600, secret=None, **claims):
+    return jwt.encode(
+        {"sub": sub, "aud": "authenticated", "exp": int(time.time()) + exp_in, **claims},
+        secret or settings.jwt_secret_key, algorithm=settings.jwt_algorithm
+    )
+
+class RemoteAuth(AuthService):
+    """AuthService recording the tokens sent to the Supabase Auth fallback"""
+
+    def __init__(self, user_id=None):
+        super().__init__(supabase=None)
+        self.user_id = user_id
+        self.remote_calls = []
+
+    async def _verify_token_remote(self, token):
+        self.remote_calls.append(token)
+        return self.user_id
+
+@pytest.fixture(autouse=True)
+def empty_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+def test_cache_evicts_least_recently_used():
+    cache = TokenCache(max_size=2)
+    expires_at = time.time() + 60
+    cache.set("a", "user-a", expires_at)
+    cache.set("b", "user-b", expires_at)
+    assert cache.get("a") == "user-a"
+    cache.set("c", "user-c", expires_at)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("user-a", "user-c")
+
+def test_cache_entries_expire_at_exp():
+    cache = TokenCache()
+    cache.set("expired", "user", time.time() - 1)
+    assert cache.get("expired") is None
+    cache.set("short", "user", time.time() + 0.05)
+    assert cache.get("short") == "user"
+    time.sleep(0.06)
+    assert cache.get("short") is None
+    assert cache.stats()["size"] == 0
+
+def test_verified_tokens_are_cached_until_exp():
+    async def scenario():
+        auth = RemoteAuth()
+        valid = token()
+        assert await auth.verify_token(valid) == "user-1"
+        assert token_cache.get(valid) == "user-1"
+        assert auth.remote_calls == []
+
+    asyncio.run(scenario())
+
+def test_expired_tokens_never_reach_the_remote_fallback():
+    async def scenario():
+        auth = RemoteAuth(user_id="user-1")
+        assert await auth.verify_token(token(exp_in=-60)) is None
+        assert auth.remote_calls == []
+
+    asyncio.run(scenario())
+
+def test_tokens_not_verifiable_locally_fall_back_to_supabase_auth(monkeypatch):
+    async def scenario():
+        foreign = token(secret="another-secret")
+        auth = RemoteAuth(user_id="user-1")
+        assert await auth.verify_token(foreign) == "user-1"
+        assert auth.remote_calls == [foreign]
+
+        monkeypatch.setattr(settings, "jwt_remote_fallback", False)
+        assert await RemoteAuth(user_id="user-1").verify_token(foreign) is None
+
+    asyncio.run(scenario())
+
+def test_optional_authentication_charges_the_user():
+    async def scenario():
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token(sub="user-2"))
+        assert await get_current_user_optional(credentials, supabase=None) == "user-2"
+        assert _admission_user.get() == "user-2"
+
+    asyncio.run(scenario())
@@ -0,0 +1,73 @@
+import pytest
+from fastapi import HTTPException
+
+from app.models import BatchOperation
+from app.services.batch_service import BatchService
+
+def prepare(*operations):
+    return BatchService(supabase=None, user_id="user")._prepare(
+        [BatchOperation(**operation) for operation in operations]
+    )
+
+def card(title="Colosseum", **extra):
+    return {"type": "activity", "title": title, **extra}
+
+def rejected(*operations) -> str:
+    with pytest.raises(HTTPException) as excinfo:
+        prepare(*operations)
+    assert excinfo.value.status_code == 400
+    return excinfo.value.detail
+
+def test_creates_get_ids_and_refs_resolve_in_later_operations():
+    payload = prepare(
+        {"op": "card.create", "ref": "tmp-a", "data": card()},
+        {"op": "card.create", "ref": "tmp-b", "data": card("Forum")},
+        {"op": "card.update", "id": "tmp-a", "data": {"title": "Colosseum tour"}},
+        {"op": "card.delete", "id": "tmp-b"},
+    )
+    created_a, created_b = payload[0]["id"], payload[1]["id"]
+    assert created_a != created_b and "tmp" not in created_a + created_b
+    assert payload[2] == {"op": "card.update", "id": created_a, "data": {"title": "Colosseum tour"}}
+    assert payload[3] == {"op": "card.delete", "id": created_b, "data": {}}
+
+def test_connection_endpoints_may_be_refs_or_real_ids():
+    payload = prepare(
+        {"op": "card.create", "ref": "tmp-a", "data": card()},
+        {"op": "connection.create", "ref": "tmp-c", "data": {"from_card_id": "tmp-a", "to_card_id": "card-9"}},
+        {"op": "connection.delete", "id": "tmp-c"},
+    )
+    connection = payload[1]
+    assert connection["data"]["from_card_id"] == payload[0]["id"]
+    assert connection["data"]["to_card_id"] == "card-9"
+    assert payload[2]["id"] == connection["id"]
+
+def test_client_supplied_ids_are_kept():
+    payload = prepare({"op": "card.create", "ref": "tmp-a", "data": card(id="card-1")})
+    assert payload[0]["id"] == "card-1"
+    assert prepare({"op": "card.update", "id": "tmp-a", "data": {"title": "x"}})[0]["id"] == "tmp-a"
+
+def test_duplicate_refs_are_rejected():
+    detail = rejected(
+        {"op": "card.create", "ref": "tmp-a", "data": card()},
+        {"op": "card.create", "ref": "tmp-a", "data": card()},
+    )
+    assert detail == "Operation 1: duplicate ref tmp-a"
+
+@pytest.mark.parametrize("op", ["card.update", "card.delete", "connection.update", "connection.delete"])
+def test_updates_and_deletes_need_an_id(op):
+    assert rejected({"op": op, "data": {"title": "x"}}) == f"Operation 0: id is required for {op}"
+
+def test_invalid_data_is_rejected_with_the_operation_index():
+    assert rejected(
+        {"op": "card.create", "data": card()},
+        {"op": "card.create", "data": {"title": "missing type"}},
+    ).startswith("Operation 1: invalid data")
+    assert rejected({"op": "connection.create", "data": {"from_card_id": "a"}}).startswith("Operation 0: invalid data")
+
+def test_updates_without_fields_are_rejected():
+    assert rejected({"op": "card.update", "id": "card-1", "data": {}}) == "Operation 0: no valid fields to update"
+
+def test_collapsed_canvases_are_rejected():
+    stub = {"childCount": 2, "collapsed": True}
+    detail = rejected({"op": "card.update", "id": "card-1", "data": {"content": stub}})
+    assert detail == "Operation 0: expand collapsed nested canvases before saving content"
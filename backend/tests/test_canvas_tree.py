@@ -0,0 +1,55 @@
+from app.services.canvas_tree import collapse_canvas, find_nested_canvas, has_collapsed_canvas
+
+def canvas(node_id, *children):
+    return {
+        "id": node_id,
+        "type": "nestedCanvas",
+        "data": {"title": node_id, "childNodes": list(children), "childEdges": []},
+    }
+
+def note(node_id):
+    return {"id": node_id, "type": "note", "data": {"text": node_id}}
+
+CONTENT = {
+    "title": "root",
+    "childNodes": [note("n1"), canvas("c1", note("n2"), canvas("c2", note("n3")))],
+    "childEdges": [{"id": "e1", "source": "n1", "target": "c1"}],
+}
+
+def test_depth_zero_stubs_the_root():
+    stub = collapse_canvas(CONTENT, 0)
+    assert stub == {"title": "root", "childCount": 2, "collapsed": True}
+
+def test_collapse_keeps_depth_levels():
+    collapsed = collapse_canvas(CONTENT, 1)
+    assert collapsed["childEdges"] == CONTENT["childEdges"]
+    nested = collapsed["childNodes"][1]["data"]
+    assert nested == {"title": "c1", "childCount": 2, "collapsed": True}
+    assert collapsed["childNodes"][0] == note("n1")
+
+    collapsed = collapse_canvas(CONTENT, 2)
+    inner = find_nested_canvas(collapsed, ["c1", "c2"])
+    assert inner == {"title": "c2", "childCount": 1, "collapsed": True}
+
+def test_collapse_deeper_than_the_tree_is_unchanged():
+    assert collapse_canvas(CONTENT, 10) == CONTENT
+    assert not has_collapsed_canvas(collapse_canvas(CONTENT, 10))
+
+def test_collapse_does_not_mutate_the_input():
+    before = repr(CONTENT)
+    collapse_canvas(CONTENT, 1)
+    assert repr(CONTENT) == before
+
+def test_content_without_children_is_returned_as_is():
+    content = {"text": "plain note"}
+    assert collapse_canvas(content, 0) is content
+
+def test_has_collapsed_canvas():
+    assert has_collapsed_canvas(collapse_canvas(CONTENT, 0))
+    assert has_collapsed_canvas(collapse_canvas(CONTENT, 2))
+
+def test_find_nested_canvas():
+    assert find_nested_canvas(CONTENT, [])["title"] == "root"
+    assert find_nested_canvas(CONTENT, ["c1", "c2"])["childNodes"] == [note("n3")]
+    assert find_nested_canvas(CONTENT, ["n1"]) is None
+    assert find_nested_canvas(CONTENT, ["c1", "missing"]) is None
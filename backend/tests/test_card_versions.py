@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+
+from app.models import Card
+from app.services import card_versions
+from app.services.card_versions import CardVersionStore, version_head_cache
+
+class FakeQuery:
+    def __init__(self, table, action, payload=None):
+        self.table = table
+        self.action = action
+        self.payload = payload
+        self.filters = []
+
+    def select(self, columns):
+        self.action = "select"
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row[column] <= value)
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def limit(self, count):
+        return self
+
+class FakeSupabase:
+    def table(self, name):
+        return FakeQuery(name, None)
+
+    def rpc(self, name, params):
+        return FakeQuery(name, "rpc", params)
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+class FakeDatabase:
+    """card_versions in memory, serving the queries CardVersionStore makes"""
+
+    def __init__(self):
+        self.rows = []
+        self.queries = []
+
+    async def execute(self, query):
+        self.queries.append(query.action)
+        if query.action == "insert":
+            self.rows += [dict(row) for row in query.payload]
+            return FakeResponse(query.payload)
+        if query.action == "rpc":
+            chains = []
+            for card_id in query.payload["p_card_ids"]:
+                rows = sorted((r for r in self.rows if r["card_id"] == card_id), key=lambda r: r["version_number"])
+                if rows:
+                    chains += [r for r in rows if r["version_number"] >= rows[-1]["snapshot_version"]]
+            return FakeResponse(chains)
+        rows = [r for r in self.rows if all(match(r) for match in query.filters)]
+        return FakeResponse(sorted(rows, key=lambda r: r["version_number"]))
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(card_versions, "execute", database.execute)
+    version_head_cache._entries.clear()
+    yield database
+    version_head_cache._entries.clear()
+
+def card(card_id, title, **content):
+    return Card(
+        id=card_id, trip_id="trip", type="note", title=title, content=content,
+        position={"x": 0, "y": 0}, style={}, created_at="2025-01-01T00:00:00+00:00",
+        updated_at="2025-01-01T00:00:00+00:00"
+    )
+
+def test_snapshots_every_interval_and_deltas_in_between(database):
+    async def scenario():
+        store = CardVersionStore(FakeSupabase(), snapshot_interval=3)
+        for step in range(7):
+            assert await store.record(card("c", f"title {step}"), "user") == step + 1
+        assert await store.record(card("c", "title 6"), "user") is None
+
+        kinds = [(row["version_number"], row["kind"], row["snapshot_version"]) for row in database.rows]
+        assert kinds == [
+            (1, "snapshot", 1), (2, "delta", 1), (3, "delta", 1),
+            (4, "snapshot", 4), (5, "delta", 4), (6, "delta", 4),
+            (7, "snapshot", 7),
+        ]
+
+        version_head_cache._entries.clear()
+        for step in range(7):
+            document = await store.get_document("c", step + 1)
+            assert document["title"] == f"title {step}"
+        assert await store.get_document("c", 8) is None
+
+    asyncio.run(scenario())
+
+def test_record_many_writes_one_insert_and_loads_heads_once(database):
+    async def scenario():
+        store = CardVersionStore(FakeSupabase())
+        await store.record_many([card("a", "a1"), card("b", "b1")], "user")
+        version_head_cache._entries.clear()
+        database.queries.clear()
+
+        versions = await store.record_many([card("a", "a2"), card("b", "b1"), card("c", "c1")], "user")
+        assert versions == {"a": 2, "c": 1}
+        assert database.queries == ["rpc", "insert"]
+
+        # Heads are cached, so the next write needs no reads
+        database.queries.clear()
+        await store.record_many([card("a", "a3"), card("c", "c2")], "user")
+        assert database.queries == ["insert"]
+
+    asyncio.run(scenario())
+
+def test_continues_from_a_legacy_full_content_row(database):
+    async def scenario():
+        # Written before versions held {title, content, style}
+        database.rows.append({
+            "card_id": "c", "version_number": 1, "snapshot_version": 1,
+            "kind": "snapshot", "content": {"description": "old"}
+        })
+        store = CardVersionStore(FakeSupabase())
+        assert await store.get_document("c", 1) == {"content": {"description": "old"}}
+
+        assert await store.record(card("c", "new", description="new"), "user") == 2
+        version_head_cache._entries.clear()
+        document = await store.get_document("c", 2)
+        assert document["title"] == "new"
+        assert document["content"] == {"description": "new"}
+
+    asyncio.run(scenario())
+
+def test_record_quietly_logs_failures(database, monkeypatch, caplog):
+    async def fail(query):
+        raise RuntimeError("connection reset")
+
+    async def scenario():
+        monkeypatch.setattr(card_versions, "execute", fail)
+        await CardVersionStore(FakeSupabase()).record_quietly([card("a", "a1")], "user")
+
+    asyncio.run(scenario())
+    assert "Failed to record versions of cards a" in caplog.text
@@ -0,0 +1,28 @@
+import pytest
+
+from app.compression import negotiate_encoding
+
+SERVER = ["zstd", "br", "gzip"]
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "br"),
+    ("gzip, deflate, br, zstd", "zstd"),
+    ("GZIP", "gzip"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("br;q=1.0, gzip;q=1.0", "br"),
+    ("zstd;q=0, br", "br"),
+    ("*", "zstd"),
+    ("*;q=0.1, gzip;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;q=invalid", None),
+    ("gzip ; q=0.3 , br ; q=0.2", "gzip"),
+])
+def test_negotiate_encoding(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding, SERVER) == expected
+
+def test_only_server_supported_encodings_are_picked():
+    assert negotiate_encoding("zstd, br", ["gzip"]) is None
+    assert negotiate_encoding("zstd, gzip;q=0.1", ["gzip"]) == "gzip"
@@ -0,0 +1,65 @@
+from app.services.connection_graph import ConnectionGraphCache, TripGraph
+
+def make_graph(*edges):
+    return TripGraph((f"{a}-{b}", a, b) for a, b in edges)
+
+def test_topological_order_of_a_dag():
+    graph = make_graph(("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"))
+    order, blocked = graph.topological_order()
+    assert blocked == []
+    assert order.index("a") < order.index("b") < order.index("d")
+    assert order.index("a") < order.index("c") < order.index("d")
+
+def test_topological_order_reports_cards_on_or_behind_a_cycle():
+    graph = make_graph(("a", "b"), ("b", "c"), ("c", "b"), ("c", "d"))
+    order, blocked = graph.topological_order()
+    assert order == ["a"]
+    assert sorted(blocked) == ["b", "c", "d"]
+
+def test_find_cycle():
+    assert make_graph(("a", "b"), ("b", "c")).find_cycle() is None
+    cycle = make_graph(("a", "b"), ("b", "c"), ("c", "a")).find_cycle()
+    assert cycle[0] == cycle[-1]
+    assert sorted(cycle[:-1]) == ["a", "b", "c"]
+
+def test_self_loop_is_a_cycle():
+    assert make_graph(("a", "a")).find_cycle() == ["a", "a"]
+
+def test_reachable_in_breadth_first_order():
+    graph = make_graph(("a", "b"), ("a", "c"), ("b", "d"), ("d", "a"), ("e", "a"))
+    assert graph.reachable("a") == ["b", "c", "d"]
+    assert graph.reachable("c") == []
+    assert graph.reachable("missing") == []
+
+def test_shortest_path():
+    graph = make_graph(("a", "b"), ("b", "c"), ("c", "d"), ("a", "d"))
+    assert graph.shortest_path("a", "d") == ["a", "d"]
+    assert graph.shortest_path("b", "d") == ["b", "c", "d"]
+    assert graph.shortest_path("d", "a") is None
+    assert graph.shortest_path("a", "a") == ["a"]
+
+def test_parallel_connections_count_once_until_all_are_removed():
+    graph = TripGraph([("c1", "a", "b"), ("c2", "a", "b")])
+    assert graph.reachable("a") == ["b"]
+    graph.remove_edge("c1")
+    assert graph.reachable("a") == ["b"]
+    graph.remove_edge("c2")
+    assert graph.card_ids == []
+
+def test_remove_card_drops_its_connections():
+    graph = make_graph(("a", "b"), ("b", "c"), ("a", "c"))
+    graph.remove_card("b")
+    assert sorted(graph.card_ids) == ["a", "c"]
+    assert graph.shortest_path("a", "c") == ["a", "c"]
+
+def test_cache_skips_a_graph_built_across_a_mutation():
+    cache = ConnectionGraphCache()
+    generation = cache.generation("trip")
+    cache.add_connection("trip", "c1", "a", "b")
+    cache.put("trip", make_graph(), generation)
+    assert cache.get("trip") is None
+
+    graph = cache.put("trip", make_graph(("a", "b")), cache.generation("trip"))
+    assert cache.get("trip") is graph
+    cache.add_connection("trip", "c2", "b", "c")
+    assert graph.reachable("a") == ["b", "c"]
@@ -0,0 +1,18 @@
+import pytest
+
+from app.services.cursors import decode_cursor, encode_cursor
+
+def test_round_trip():
+    values = ["2025-01-01T00:00:00+00:00", "0b7a6c1e-2f5d-4b8e-9c3a-1d2e3f4a5b6c", 3]
+    assert decode_cursor(encode_cursor(*values)) == values
+
+def test_cursor_is_url_safe_and_unpadded():
+    cursor = encode_cursor("??>>", "~~~")
+    assert "=" not in cursor
+    assert "+" not in cursor and "/" not in cursor
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "e30", "!!!!"])
+def test_malformed_cursors_raise_value_error(cursor):
+    # "e30" is {} encoded, which is valid JSON but not a list
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,45 @@
+import pytest
+
+from app.services.json_patch import apply_patch, make_patch
+
+@pytest.mark.parametrize("old, new", [
+    ({"a": 1}, {"a": 2}),
+    ({"a": 1, "b": 2}, {"a": 1}),
+    ({"a": 1}, {"a": 1, "b": {"c": [1, 2]}}),
+    ({"a": {"b": {"c": 1}}}, {"a": {"b": {"c": 2, "d": 3}}}),
+    ({"items": [1, 2, 3]}, {"items": [1, 5, 3]}),
+    ({"items": [1, 2, 3]}, {"items": [1, 2]}),
+    ({"a": [1]}, {"a": {"b": 1}}),
+    ({"a/b": 1, "c~d": 2}, {"a/b": 3, "c~d": 4}),
+    ([1, 2], {"a": 1}),
+])
+def test_round_trip(old, new):
+    assert apply_patch(old, make_patch(old, new)) == new
+
+def test_no_changes_is_an_empty_patch():
+    document = {"title": "Rome", "content": {"tags": ["food"]}}
+    assert make_patch(document, dict(document)) == []
+
+def test_patch_is_minimal_for_nested_changes():
+    assert make_patch({"a": {"b": 1, "c": 2}}, {"a": {"b": 1, "c": 3}}) == [
+        {"op": "replace", "path": "/a/c", "value": 3}
+    ]
+
+def test_keys_are_escaped():
+    assert make_patch({}, {"a/b~c": 1}) == [{"op": "add", "path": "/a~1b~0c", "value": 1}]
+
+def test_apply_does_not_mutate_the_document():
+    document = {"a": {"b": [1, 2]}}
+    apply_patch(document, [
+        {"op": "add", "path": "/a/b/-", "value": 3},
+        {"op": "remove", "path": "/a/b/0"},
+    ])
+    assert document == {"a": {"b": [1, 2]}}
+
+def test_apply_list_operations():
+    patched = apply_patch([1, 2, 3], [
+        {"op": "add", "path": "/1", "value": 9},
+        {"op": "remove", "path": "/0"},
+        {"op": "replace", "path": "/2", "value": 7},
+    ])
+    assert patched == [9, 2, 7]
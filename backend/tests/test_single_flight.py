@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from app.admission import _admission_user, bind_user
+from app.services.single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_flight():
+    async def scenario():
+        flights = SingleFlight()
+        calls = 0
+
+        async def read():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*(flights.do(("trip", "full", "user"), read) for _ in range(5)))
+        assert results == [1] * 5
+        assert (calls, flights.calls, flights.joined) == (1, 1, 4)
+        assert flights.stats()["in_flight"] == 0
+
+        # A finished flight is not reused
+        assert await flights.do(("trip", "full", "user"), read) == 2
+
+    asyncio.run(scenario())
+
+def test_errors_are_shared():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            flights.do(("key",), fail), flights.do(("key",), fail), return_exceptions=True
+        )
+        assert [str(result) for result in results] == ["boom", "boom"]
+
+    asyncio.run(scenario())
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def read():
+            await asyncio.sleep(0.01)
+            return "done"
+
+        first = asyncio.ensure_future(flights.do(("key",), read))
+        second = asyncio.ensure_future(flights.do(("key",), read))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+def test_forget_starts_a_new_flight_for_later_reads():
+    async def scenario():
+        flights = SingleFlight()
+        calls = 0
+
+        async def read():
+            nonlocal calls
+            calls += 1
+            value = calls
+            await asyncio.sleep(0.01)
+            return value
+
+        before = asyncio.ensure_future(flights.do(("trip", "full", "user"), read))
+        other = asyncio.ensure_future(flights.do(("other", "full", "user"), read))
+        await asyncio.sleep(0)
+        flights.forget(("trip",))
+        joined = asyncio.ensure_future(flights.do(("other", "full", "user"), read))
+        after = await flights.do(("trip", "full", "user"), read)
+        assert await joined == 2
+        # Only flights of the forgotten trip are detached
+        assert (await before, await other, after) == (1, 2, 3)
+
+    asyncio.run(scenario())
+
+def test_flights_are_charged_to_the_calling_user():
+    async def scenario():
+        bind_user("alice")
+
+        async def read():
+            return _admission_user.get()
+
+        assert await SingleFlight().do(("trip", "full", "alice"), read) == "alice"
+
+    asyncio.run(scenario())
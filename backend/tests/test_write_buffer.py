@@ -0,0 +1,183 @@
+from types import SimpleNamespace
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+
+from app.services import write_buffer
+from app.services.card_service import CardService
+from app.services.ownership_cache import card_trip_cache, trip_ownership_cache
+from app.services.write_buffer import PositionWriteBuffer, position_write_buffer
+
+class FakeQuery:
+    def __init__(self, kind, params=None):
+        self.kind = kind
+        self.params = params
+        self.ids = []
+
+    def select(self, *columns):
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def in_(self, column, values):
+        self.ids = values
+        return self
+
+class FakeSupabase:
+    def rpc(self, name, params):
+        return FakeQuery("rpc", params)
+
+    def table(self, name):
+        return FakeQuery("select")
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+class FakeDatabase:
+    """Serves execute(): card "gone" does not exist, failing makes RPCs time out"""
+
+    def __init__(self):
+        self.failing = False
+        self.written = {}
+        self.release = None
+
+    async def execute(self, query):
+        if query.kind == "select":
+            return FakeResponse([{"id": card_id} for card_id in query.ids if card_id != "gone"])
+        if self.release is not None:
+            await self.release.wait()
+        if self.failing:
+            raise TimeoutError("read timed out")
+        positions = query.params["p_positions"]
+        if any(position["id"] == "gone" for position in positions):
+            raise APIError({"code": "P0002", "message": "Card not found in trip"})
+        self.written.update((position["id"], position["position"]) for position in positions)
+        return FakeResponse([])
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(write_buffer, "execute", database.execute)
+    monkeypatch.setattr(write_buffer, "get_supabase_admin", FakeSupabase)
+    return database
+
+def test_flush_writes_the_latest_position(database):
+    async def scenario():
+        buffer = PositionWriteBuffer()
+        buffer.add("trip", "a", {"x": 1})
+        buffer.add("trip", "a", {"x": 2})
+        await buffer.flush()
+        assert database.written == {"a": {"x": 2}}
+        assert buffer.stats()["coalesced_writes"] == 1
+
+    asyncio.run(scenario())
+
+def test_missing_cards_are_dropped_and_the_rest_retried(database):
+    async def scenario():
+        buffer = PositionWriteBuffer()
+        buffer.add("trip", "a", {"x": 1})
+        buffer.add("trip", "gone", {"x": 2})
+        await buffer.flush()
+        assert buffer.dropped_writes == 1
+        await buffer.flush()
+        assert database.written == {"a": {"x": 1}}
+        assert buffer.stats()["pending"] == 0
+
+    asyncio.run(scenario())
+
+def test_transient_failures_keep_positions_and_back_off(database):
+    async def scenario():
+        buffer = PositionWriteBuffer(flush_interval=0.01)
+        database.failing = True
+        buffer.add("trip", "a", {"x": 1})
+        await buffer.flush()
+        assert buffer.get_position("a", "trip") == {"x": 1}
+        assert not buffer._may_flush()
+
+        database.failing = False
+        buffer.add("trip", "a", {"x": 2})
+        await asyncio.sleep(0.02)
+        await buffer.flush()
+        assert database.written == {"a": {"x": 2}}
+
+    asyncio.run(scenario())
+
+def test_discard_skips_an_in_flight_position(database):
+    async def scenario():
+        buffer = PositionWriteBuffer()
+        database.release = asyncio.Event()
+        buffer.add("trip", "a", {"x": 1})
+        buffer.add("other", "b", {"x": 1})
+        flush = asyncio.ensure_future(buffer.flush())
+        await asyncio.sleep(0)
+        buffer.discard("b")
+        assert buffer.get_position("b", "other") is None
+        database.release.set()
+        await flush
+        assert database.written == {"a": {"x": 1}}
+
+    asyncio.run(scenario())
+
+def test_stop_writes_positions_of_a_cancelled_flush(database):
+    async def scenario():
+        buffer = PositionWriteBuffer(flush_interval=0.001)
+        database.release = asyncio.Event()
+        buffer.start()
+        buffer.add("trip", "a", {"x": 1})
+        await asyncio.sleep(0.01)
+        assert buffer._inflight
+
+        stopping = asyncio.ensure_future(buffer.stop())
+        await asyncio.sleep(0)
+        database.release.set()
+        await stopping
+        assert database.written == {"a": {"x": 1}}
+
+    asyncio.run(scenario())
+
+def test_positions_are_only_overlaid_on_cards_of_the_buffered_trip():
+    buffer = PositionWriteBuffer()
+    buffer.add("trip-a", "card", {"x": 999, "y": 999})
+    card = SimpleNamespace(id="card", trip_id="trip-b", position={"x": 1, "y": 1})
+    buffer.apply([card])
+    assert card.position == {"x": 1, "y": 1}
+    assert buffer.get_position("card", "trip-b") is None
+
+    card.trip_id = "trip-a"
+    buffer.apply([card])
+    assert card.position == {"x": 999, "y": 999}
+
+def test_positions_for_cards_of_another_trip_are_rejected():
+    async def scenario():
+        trip_ownership_cache.set("alice", "trip-a")
+        card_trip_cache.set("bobs-card", "trip-b")
+        service = CardService(supabase=None, user_id="alice")
+        with pytest.raises(HTTPException) as excinfo:
+            await service.buffer_card_position("trip-a", "bobs-card", {"x": 999, "y": 999})
+        assert excinfo.value.status_code == 404
+        assert position_write_buffer.trip_positions("trip-a") == {}
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        trip_ownership_cache.clear()
+        card_trip_cache.clear()
+
+def test_positions_taken_for_a_failed_direct_write_are_restored():
+    buffer = PositionWriteBuffer()
+    buffer.add("trip", "a", {"x": 1})
+    buffer.add("trip", "b", {"x": 2})
+    taken = buffer.take(["a", "missing"])
+    assert taken == {"a": ("trip", {"x": 1})}
+    assert buffer.get_position("a", "trip") is None
+
+    buffer.add("trip", "b", {"x": 3})
+    buffer.restore(taken)
+    buffer.restore({"b": ("trip", {"x": 2})})
+    assert buffer.get_position("a", "trip") == {"x": 1}
+    # A newer buffered position wins over a restored one
+    assert buffer.get_position("b", "trip") == {"x": 3}
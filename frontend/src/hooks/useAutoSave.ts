@@ -38,6 +38,7 @@ export const useAutoSave = (tripId?: string) => {
   const { 
     createCard, 
     updateCard, 
+    updateCardPosition,
     deleteCard,
     createConnection,
     deleteConnection,
@@ -114,12 +115,19 @@ export const useAutoSave = (tripId?: string) => {
         }
       } else {
         // Update existing card if changed
+        const positionChanged = JSON.stringify(existingCard.position) !== JSON.stringify(node.position);
         const hasChanged = 
-          JSON.stringify(existingCard.position) !== JSON.stringify(node.position) ||
           JSON.stringify(existingCard.content) !== JSON.stringify(node.data) ||
           existingCard.title !== (node.data.title || 'Untitled');
           
-        if (hasChanged) {
+        if (positionChanged && !hasChanged) {
+          // Drags go through the coalescing position buffer
+          try {
+            await updateCardPosition({ tripId, cardId: node.id, position: node.position });
+          } catch (error) {
+            console.error('Failed to update card position:', error, { cardId: node.id, position: node.position });
+          }
+        } else if (hasChanged) {
           try {
             console.log('Updating card:', { cardId: node.id, cardData });
             await updateCard({ cardId: node.id, cardData });
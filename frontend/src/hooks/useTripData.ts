@@ -87,6 +87,14 @@ export const useTripData = (tripId?: string) => {
     },
   });
 
+  // Mutation for moving cards; positions are buffered and batched server-side
+  const updateCardPositionMutation = useMutation({
+    mutationFn: async ({ tripId, cardId, position }: { tripId: string; cardId: string; position: { x: number; y: number } }) => {
+      const response = await apiClient.updateCardPosition(tripId, cardId, position);
+      return response.data;
+    },
+  });
+
   // Mutation for deleting cards
   const deleteCardMutation = useMutation({
     mutationFn: async (cardId: string) => {
@@ -126,6 +134,7 @@ export const useTripData = (tripId?: string) => {
     // Mutations
     createCard: createCardMutation.mutateAsync,
     updateCard: updateCardMutation.mutateAsync,
+    updateCardPosition: updateCardPositionMutation.mutateAsync,
     deleteCard: deleteCardMutation.mutateAsync,
     createConnection: createConnectionMutation.mutateAsync,
     deleteConnection: deleteConnectionMutation.mutateAsync,
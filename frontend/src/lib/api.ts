@@ -106,12 +106,12 @@ class ApiClient {
     return this.request<Trip>(`/trips/${tripId}`);
   }
 
-  async getTripFullData(tripId: string): Promise<ApiResponse<{
+  async getTripFullData(tripId: string, depth?: number): Promise<ApiResponse<{
     trip: Trip;
     cards: Card[];
     connections: Connection[];
   }>> {
-    return this.request(`/trips/${tripId}/full`);
+    return this.request(depth === undefined ? `/trips/${tripId}/full` : `/trips/${tripId}/full?depth=${depth}`);
   }
 
   async createTrip(tripData: Partial<Trip>): Promise<ApiResponse<Trip>> {
@@ -134,6 +134,18 @@ class ApiClient {
     });
   }
 
+  async applyBatch(tripId: string, operations: Array<{
+    op: 'card.create' | 'card.update' | 'card.delete' | 'connection.create' | 'connection.update' | 'connection.delete';
+    id?: string;
+    ref?: string;
+    data?: Record<string, any>;
+  }>): Promise<ApiResponse<Array<{index: number; op: string; ref?: string; id: string; record: Card | Connection}>>> {
+    return this.request(`/trips/${tripId}/batch`, {
+      method: 'POST',
+      body: JSON.stringify({ operations }),
+    });
+  }
+
   // Card endpoints
   async getTripCards(tripId: string): Promise<ApiResponse<Card[]>> {
     return this.request<Card[]>(`/trips/${tripId}/cards`);
@@ -153,16 +165,34 @@ class ApiClient {
     });
   }
 
+  async updateCardPosition(tripId: string, cardId: string, position: {x: number; y: number}): Promise<ApiResponse<{id: string; position: {x: number; y: number}}>> {
+    return this.request(`/trips/${tripId}/cards/${cardId}/position`, {
+      method: 'PUT',
+      body: JSON.stringify({ position }),
+    });
+  }
+
+  async expandNestedCanvas(cardId: string, path: string[] = [], depth = 0): Promise<ApiResponse<{
+    card_id: string;
+    path: string[];
+    nodes: any[];
+    edges: any[];
+  }>> {
+    const query = new URLSearchParams({ depth: String(depth) });
+    if (path.length) query.set('path', path.join(','));
+    return this.request(`/trips/cards/${cardId}/canvas?${query}`);
+  }
+
   async deleteCard(cardId: string): Promise<ApiResponse> {
     return this.request(`/trips/cards/${cardId}`, {
       method: 'DELETE',
     });
   }
 
-  async bulkUpdateCards(updates: Array<{id: string} & Partial<Card>>): Promise<ApiResponse<Card[]>> {
-    return this.request<Card[]>('/trips/cards/bulk-update', {
+  async bulkUpdateCards(tripId: string, updates: Array<{id: string} & Partial<Card>>): Promise<ApiResponse<Card[]>> {
+    return this.request<Card[]>(`/trips/${tripId}/cards/bulk-update`, {
       method: 'PUT',
-      body: JSON.stringify(updates),
+      body: JSON.stringify({ cards: updates }),
     });
   }
 